@@ -1,5 +1,38 @@
 from django.contrib import admin
-from .models import ChatSession, ChatMessage
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count
+from django.utils.functional import cached_property
+
+from .models import ChatSession, ChatMessage, ChatUsageDaily
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Filtrsiz ro'yxatda COUNT(*) o'rniga Postgres statistikasi (pg_class.reltuples).
+    Katta jadvalda aniq COUNT butun jadvalni o'qiydi; filtr bo'lsa yoki jadval kichik bo'lsa - oddiy COUNT.
+    """
+    ESTIMATE_THRESHOLD = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.ESTIMATE_THRESHOLD:
+                return row[0]
+        return super().count
+
+
+def _short(text, length=50):
+    text = text or ''
+    return text[:length] + '...' if len(text) > length else text
 
 
 @admin.register(ChatSession)
@@ -8,27 +41,98 @@ class ChatSessionAdmin(admin.ModelAdmin):
     list_filter = ('created_at', 'updated_at')
     search_fields = ('session_id',)
     readonly_fields = ('created_at', 'updated_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Har bir qator uchun alohida COUNT o'rniga bitta GROUP BY
+        return super().get_queryset(request).annotate(message_count=Count('messages'))
 
     def message_count(self, obj):
-        return obj.messages.count()
+        return obj.message_count
 
     message_count.short_description = 'Xabarlar soni'
+    message_count.admin_order_field = 'message_count'
+
+
+class ChatModelFilter(admin.SimpleListFilter):
+    """Modellar ro'yxati kichik ChatUsageDaily dan - katta xabarlar jadvalida DISTINCT qilinmaydi"""
+    title = 'Model'
+    parameter_name = 'model'
+
+    def lookups(self, request, model_admin):
+        models = ChatUsageDaily.objects.exclude(model='').order_by('model').values_list('model', flat=True).distinct()
+        return [(model, model) for model in models]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(model=self.value())
+        return queryset
 
 
 @admin.register(ChatMessage)
 class ChatMessageAdmin(admin.ModelAdmin):
-    list_display = ('session', 'user_message_short', 'ai_response_short', 'created_at')
-    list_filter = ('created_at', 'session')
+    list_display = ('session', 'user_message_short', 'ai_response_short', 'model', 'latency_ms', 'cached', 'created_at')
+    list_filter = ('created_at', ChatModelFilter, 'cached')
+    list_select_related = ('session',)
     search_fields = ('user_message', 'ai_response', 'session__session_id')
-    readonly_fields = ('created_at',)
+    readonly_fields = ('created_at', 'model', 'prompt_tokens', 'completion_tokens', 'latency_ms', 'cached')
+    raw_id_fields = ('session',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def user_message_short(self, obj):
-        return obj.user_message[:50] + '...' if len(obj.user_message) > 50 else obj.user_message
+        return _short(obj.user_message)
 
     user_message_short.short_description = 'Foydalanuvchi xabari'
 
     def ai_response_short(self, obj):
-        return obj.ai_response[:50] + '...' if len(obj.ai_response) > 50 else obj.ai_response
+        return _short(obj.ai_response)
 
     ai_response_short.short_description = 'AI javobi'
 
+
+@admin.register(ChatUsageDaily)
+class ChatUsageDailyAdmin(admin.ModelAdmin):
+    """Kunlik, model bo'yicha sarf: so'rovlar, tokenlar va latency (p50/p95 gistogrammadan)"""
+    list_display = (
+        'date', 'model_name', 'requests', 'cached_requests', 'prompt_tokens', 'completion_tokens',
+        'average_latency', 'p50_latency', 'p95_latency'
+    )
+    list_filter = ('model',)
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def model_name(self, obj):
+        return obj.model or 'kesh'
+
+    model_name.short_description = 'Model'
+
+    def average_latency(self, obj):
+        return obj.average_latency_ms
+
+    average_latency.short_description = "O'rtacha (ms)"
+
+    def p50_latency(self, obj):
+        return self._format_percentile(obj, 50)
+
+    p50_latency.short_description = 'p50 (ms)'
+
+    def p95_latency(self, obj):
+        return self._format_percentile(obj, 95)
+
+    p95_latency.short_description = 'p95 (ms)'
+
+    def _format_percentile(self, obj, percentile):
+        if not obj.latency_count:
+            return '-'
+        value = obj.latency_percentile(percentile)
+        if value is None:
+            # Oxirgi bo'lakning yuqori chegarasi yo'q
+            return f'> {obj.LATENCY_BUCKETS[-2][0]}'
+        return f'<= {value}'
@@ -0,0 +1,185 @@
+# chatai/backends.py
+"""
+AI model backendlari.
+
+chat_api model bilan to'g'ridan-to'g'ri emas, shu yerdagi backend orqali ishlaydi:
+- GeminiBackend - haqiqiy Gemini, jarayon bo'yicha bitta async client (HTTP ulanishlar qayta ishlatiladi).
+                  Client o'z fon threadidagi event loopda ishlaydi: WSGI da har so'rov o'z loopida
+                  (async_to_sync) bo'lsa ham client va connection pool bitta
+- StubBackend   - tarmoqqa chiqmaydi, testlar va offline benchmark uchun
+
+Qaysi backend ishlatilishi settings.CHATAI_MODEL_BACKEND da ko'rsatiladi.
+"""
+import asyncio
+import os
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from google import genai
+
+
+class ModelReply:
+    """Model javobi va model qaytargan token soni (bo'lmasa None - servis taxminan hisoblaydi)"""
+
+    def __init__(self, text, prompt_tokens=None, completion_tokens=None):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+class BackgroundLoop:
+    """
+    Jarayon bo'yicha bitta event loop (daemon threadda).
+    httpx async ulanishlari loopga bog'langan - client shu loopda ishlasa, chaqiruvchi qaysi
+    loopda bo'lishidan qat'i nazar (ASGI, WSGI dagi async_to_sync, Celery) pool bitta bo'ladi.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get_loop(self):
+        with self._lock:
+            # fork dan keyin (gunicorn, celery prefork) ota jarayon threadi yo'q - yangi loop
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._pid = os.getpid()
+                threading.Thread(
+                    target=self._loop.run_forever, name='chatai-model-loop', daemon=True
+                ).start()
+            return self._loop
+
+    async def run(self, coro):
+        """coro ni fon loopda bajarish; chaqiruvchi bekor qilinsa (timeout, uzilish) u ham bekor qilinadi"""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.get_loop()))
+
+    async def iterate(self, agen):
+        """Fon loopdagi async generatorni joriy loopdan bo'lakma-bo'lak o'qish"""
+        try:
+            while True:
+                item = await self.run(_next_or_none(agen))
+                if item is None:
+                    return
+                yield item
+        finally:
+            await self.run(agen.aclose())
+
+    def iterate_sync(self, agen):
+        """Sinxron koddan (WSGI) fon loopdagi async generatorni o'qish; yopilsa agen ham yopiladi"""
+        try:
+            while True:
+                item = asyncio.run_coroutine_threadsafe(_next_or_none(agen), self.get_loop()).result()
+                if item is None:
+                    return
+                yield item
+        finally:
+            asyncio.run_coroutine_threadsafe(agen.aclose(), self.get_loop()).result()
+
+
+# Model chaqiruvlari va WSGI dagi SSE oqimi uchun umumiy fon loop
+model_loop = BackgroundLoop()
+
+
+async def _next_or_none(agen):
+    return await anext(agen, None)
+
+
+class GeminiBackend:
+    """Google Gemini (google-genai async API)"""
+
+    def __init__(self):
+        self.api_key = settings.GEMINI_API_KEY
+        self._client = None
+        self._loop = model_loop
+
+    def is_configured(self):
+        return bool(self.api_key)
+
+    def get_client(self):
+        """Jarayon bo'yicha bitta async client (birinchi chaqiruvda yaratiladi, faqat fon loopda ishlatiladi)"""
+        if self._client is None:
+            self._client = genai.Client(api_key=self.api_key)
+        return self._client.aio
+
+    async def generate(self, model, prompt):
+        return await self._loop.run(self._generate(model, prompt))
+
+    def stream(self, model, prompt):
+        """Javobni bo'laklab qaytarish. Generator yopilsa upstream so'rov ham yopiladi."""
+        return self._loop.iterate(self._stream(model, prompt))
+
+    async def _generate(self, model, prompt):
+        response = await self.get_client().models.generate_content(
+            model=model,
+            contents=prompt
+        )
+        usage = response.usage_metadata
+        return ModelReply(
+            response.text.strip(),
+            prompt_tokens=usage.prompt_token_count if usage else None,
+            completion_tokens=usage.candidates_token_count if usage else None,
+        )
+
+    async def _stream(self, model, prompt):
+        response = await self.get_client().models.generate_content_stream(
+            model=model,
+            contents=prompt
+        )
+        try:
+            async for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            await response.aclose()
+
+
+class StubBackend:
+    """Soxta model - testlar va 200+ parallel sessiyali offline benchmark uchun"""
+
+    def __init__(self, delay=None):
+        self.delay = settings.CHATAI_STUB_DELAY if delay is None else delay
+
+    def is_configured(self):
+        return True
+
+    async def generate(self, model, prompt):
+        # Haqiqiy model kabi kutish (tarmoq + generatsiya vaqti)
+        await asyncio.sleep(self.delay)
+        return ModelReply(self._reply(model, prompt))
+
+    async def stream(self, model, prompt):
+        words = self._reply(model, prompt).split(' ')
+        for index, word in enumerate(words):
+            await asyncio.sleep(self.delay / len(words))
+            yield word if index == 0 else f' {word}'
+
+    def _reply(self, model, prompt):
+        return f"Stub javob ({model}): so'rov {len(prompt)} belgidan iborat."
+
+
+_backend = None
+
+
+def get_backend():
+    """Jarayon bo'yicha yagona backend (birinchi chaqiruvda yaratiladi)"""
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.CHATAI_MODEL_BACKEND)()
+    return _backend
+
+
+def set_backend(backend):
+    """Backendni almashtirish (benchmark va testlar uchun)"""
+    global _backend
+    _backend = backend
+
+
+@receiver(setting_changed)
+def reset_backend(sender, setting, **kwargs):
+    # override_settings(CHATAI_MODEL_BACKEND=...) testlarda darhol ishlashi uchun
+    if setting.startswith('CHATAI_') or setting == 'GEMINI_API_KEY':
+        set_backend(None)
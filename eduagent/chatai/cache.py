@@ -0,0 +1,145 @@
+# chatai/cache.py
+"""
+Takroriy savollar uchun javob keshi.
+
+Kalit = model nomi + normallashtirilgan prompt (kichik harf, bo'shliqlar bittaga,
+o'zbek kirill harflari lotinchaga). Shunda "Python nima?" va "  python  НИМА? "
+bitta yozuvga tushadi. Prompt savol bilan birga suhbat kontekstini (xulosa va oxirgi
+xabarlar) ham o'z ichiga oladi - "davom et" kabi savolga boshqa suhbatning javobi
+berilmaydi; kontekstsiz (yangi suhbatdagi) savollar sessiyalar o'rtasida umumiy.
+
+Backendlar (settings.CHATAI_RESPONSE_CACHE['BACKEND']):
+- LocMemResponseCache     - jarayon ichida, TTL + LRU (MAX_ENTRIES)
+- DjangoCacheResponseCache - settings.CACHES dagi kesh (masalan django-redis), TTL = timeout,
+                             LRU ni Redis o'zi bajaradi (maxmemory-policy allkeys-lru)
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+# O'zbek kirill -> lotin (rasmiy imlo bo'yicha, kalit uchun yetarli darajada)
+CYRILLIC_TO_LATIN = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo',
+    'ж': 'j', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'x', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sh', 'ъ': "'",
+    'ь': '', 'ы': 'i', 'э': 'e', 'ю': 'yu', 'я': 'ya', 'ў': "o'", 'қ': 'q',
+    'ғ': "g'", 'ҳ': 'h',
+    # o‘, g‘ va tutuq belgisining turli yozilishlari
+    'ʻ': "'", 'ʼ': "'", '‘': "'", '’': "'", '`': "'",
+})
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_prompt(text):
+    """Promptni kesh kaliti uchun normallashtirish"""
+    text = text.lower().translate(CYRILLIC_TO_LATIN)
+    return WHITESPACE_RE.sub(' ', text).strip()
+
+
+def make_cache_key(model, prompt):
+    digest = hashlib.sha256(f"{model}\n{normalize_prompt(prompt)}".encode('utf-8')).hexdigest()
+    return f"chatai:response:{digest}"
+
+
+class LocMemResponseCache:
+    """Jarayon ichidagi kesh: TTL + LRU"""
+
+    def __init__(self, ttl, max_entries=1000, **kwargs):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # kalit -> (muddati, javob)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, model, prompt):
+        key = make_cache_key(model, prompt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    async def set(self, model, prompt, response):
+        key = make_cache_key(model, prompt)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+class DjangoCacheResponseCache:
+    """settings.CACHES dagi kesh orqali (django-redis bilan barcha workerlar uchun umumiy)"""
+
+    HITS_KEY = 'chatai:response:hits'
+    MISSES_KEY = 'chatai:response:misses'
+
+    def __init__(self, ttl, cache_alias='default', **kwargs):
+        self.ttl = ttl
+        self.cache = caches[cache_alias]
+
+    async def get(self, model, prompt):
+        response = await self.cache.aget(make_cache_key(model, prompt))
+        await self._incr(self.HITS_KEY if response is not None else self.MISSES_KEY)
+        return response
+
+    async def set(self, model, prompt, response):
+        await self.cache.aset(make_cache_key(model, prompt), response, timeout=self.ttl)
+
+    async def stats(self):
+        counters = await self.cache.aget_many([self.HITS_KEY, self.MISSES_KEY])
+        return {
+            'hits': counters.get(self.HITS_KEY, 0),
+            'misses': counters.get(self.MISSES_KEY, 0),
+        }
+
+    async def _incr(self, key):
+        try:
+            await self.cache.aincr(key)
+        except ValueError:
+            # Hisoblagich hali yo'q (yoki muddati o'tgan)
+            await self.cache.aset(key, 1, timeout=None)
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """Jarayon bo'yicha yagona javob keshi"""
+    global _response_cache
+    if _response_cache is None:
+        config = settings.CHATAI_RESPONSE_CACHE
+        _response_cache = import_string(config['BACKEND'])(
+            ttl=config.get('TTL', 60 * 60),
+            max_entries=config.get('MAX_ENTRIES', 1000),
+            cache_alias=config.get('CACHE_ALIAS', 'default'),
+        )
+    return _response_cache
+
+
+@receiver(setting_changed)
+def reset_response_cache(sender, setting, **kwargs):
+    global _response_cache
+    if setting == 'CHATAI_RESPONSE_CACHE':
+        _response_cache = None
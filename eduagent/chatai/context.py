@@ -0,0 +1,130 @@
+# chatai/context.py
+"""
+Model uchun suhbat konteksti.
+
+Prompt hajmi sessiya uzunligiga bog'liq emas:
+- ChatSession.summary - summarized_until gacha bo'lgan barcha xabarlarning qisqa xulosasi
+- undan keyingi oxirgi xabarlar ((session, created_at) indeksi orqali), token byudjetigacha qirqiladi
+
+Xulosaga qo'shilmagan xabarlar SUMMARY_EVERY + KEEP_RECENT_TURNS ga yetganda, oxirgi
+KEEP_RECENT_TURNS tadan eskilari model yordamida xulosaga qo'shiladi (har N xabarda bitta qo'shimcha so'rov).
+"""
+from django.conf import settings
+
+from .models import ChatSession, ChatMessage
+
+
+def estimate_tokens(text, chars_per_token=4):
+    """Taxminiy token soni (tokenizer chaqirmasdan)"""
+    return len(text or '') // chars_per_token + 1
+
+
+class ChatContext:
+    """Bitta so'rov uchun kontekst"""
+
+    def __init__(self, summary, turns, pending):
+        self.summary = summary
+        self.turns = turns      # promptga kiradigan xabarlar (eskidan yangiga)
+        self.pending = pending  # xulosaga hali qo'shilmagan xabarlar (eskidan yangiga)
+
+
+class ContextBuilder:
+    """Kontekstni token byudjeti ichida yig'ish va sessiya xulosasini yangilash"""
+
+    def __init__(self, token_budget=2000, chars_per_token=4, max_turns=20,
+                 keep_recent_turns=4, summary_every=8, summary_max_chars=2000):
+        self.token_budget = token_budget
+        self.chars_per_token = chars_per_token
+        self.keep_recent_turns = keep_recent_turns
+        self.summary_every = summary_every
+        self.summary_max_chars = summary_max_chars
+        # Xulosaga qo'shiladigan xabarlar ham bazadan olinishi kerak
+        self.max_turns = max(max_turns, summary_every + keep_recent_turns)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(**{key.lower(): value for key, value in settings.CHATAI_CONTEXT.items()})
+
+    def count_tokens(self, text):
+        return estimate_tokens(text, self.chars_per_token)
+
+    def turn_tokens(self, msg):
+        return self.count_tokens(msg.user_message) + self.count_tokens(msg.ai_response)
+
+    def build(self, session):
+        """Xulosa + byudjetga sig'adigan oxirgi xabarlar (bitta query)"""
+        messages = ChatMessage.objects.filter(session=session)
+        if session.summarized_until is not None:
+            messages = messages.filter(created_at__gt=session.summarized_until)
+
+        pending = list(messages.order_by('-created_at')[:self.max_turns])
+        pending.reverse()
+
+        budget = self.token_budget - self.count_tokens(session.summary)
+        turns = []
+        for msg in reversed(pending):
+            budget -= self.turn_tokens(msg)
+            if budget < 0:
+                break
+            turns.append(msg)
+        turns.reverse()
+
+        return ChatContext(session.summary, turns, pending)
+
+    def turns_to_summarize(self, context):
+        """Xulosaga qo'shilish vaqti kelgan xabarlar (vaqti kelmagan bo'lsa - bo'sh ro'yxat)"""
+        if len(context.pending) < self.summary_every + self.keep_recent_turns:
+            return []
+        return context.pending[:len(context.pending) - self.keep_recent_turns]
+
+    def summary_prompt(self, summary, turns):
+        lines = []
+        for msg in turns:
+            lines.append(f"User: {msg.user_message}")
+            lines.append(f"AI: {msg.ai_response}")
+        dialog = "\n".join(lines)
+
+        return f"""
+            Avvalgi xulosa: {summary or "yo'q"}
+
+            Yangi xabarlar:
+            {dialog}
+
+            Avvalgi xulosa va yangi xabarlarni bitta qisqa xulosaga birlashtiring.
+            Foydalanuvchi maqsadi va muhim faktlarni saqlang. Faqat o'zbek tilida,
+            {self.summary_max_chars} belgidan oshmasin.
+            """
+
+    def store_summary(self, session, summary, turns):
+        """
+        Yangi xulosani saqlash. Parallel so'rov xulosani allaqachon yangilagan bo'lsa
+        (summarized_until o'zgargan) hech narsa yozilmaydi.
+        """
+        summarized_until = turns[-1].created_at
+        updated = ChatSession.objects.filter(
+            pk=session.pk, summarized_until=session.summarized_until
+        ).update(summary=summary[:self.summary_max_chars], summarized_until=summarized_until)
+
+        if updated:
+            session.summary = summary[:self.summary_max_chars]
+            session.summarized_until = summarized_until
+        return bool(updated)
+
+
+def build_prompt(message, context):
+    context_lines = []
+    if context.summary:
+        context_lines.append(f"Suhbat xulosasi: {context.summary}")
+    for msg in context.turns:
+        context_lines.append(f"User: {msg.user_message}")
+        context_lines.append(f"AI: {msg.ai_response}")
+
+    context = "\n".join(context_lines) if context_lines else "Yangi suhbat."
+
+    return f"""
+            {context}
+
+            Yangi savol: {message}
+
+            Javobni faqat o'zbek tilida bering. Qisqa va aniq bo'lsin.
+            """
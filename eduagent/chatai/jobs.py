@@ -0,0 +1,186 @@
+# chatai/jobs.py
+"""
+Fon rejimi: so'rov ChatJob sifatida navbatga qo'yiladi, Celery worker bajaradi.
+
+Worker bir martada BATCH_SIZE tagacha navbatdagi jobni oladi (SELECT ... FOR UPDATE SKIP LOCKED -
+bir nechta worker bir jobni ikki marta olmaydi), javoblarni parallel oladi va ChatMessage larni
+bitta bulk_create bilan yozadi. STALE_AFTER sekunddan beri 'running' bo'lib qolgan job
+(worker o'lgan yoki model osilib qolgan) qayta navbatga olinadi; eski worker keyinroq
+javob olsa ham uning natijasi yozilmaydi.
+
+chat_api bilan bir xil: javob keshi, model slotlari (MAX_CONCURRENT) va xulosa yangilanishi (Celery).
+Sessiya limiti (SESSION_RATE) submit_chat_job da tekshiriladi.
+"""
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import get_response_cache
+from .context import ContextBuilder, build_prompt
+from .limits import get_limiter
+from .models import ChatSession, ChatMessage, ChatJob, ChatUsageDaily
+from .service import get_ai_service
+
+
+def claim_jobs(batch_size, stale_after):
+    """
+    Navbatdagi (va osilib qolgan) joblarni olish va 'running' deb belgilash.
+    job.started_at - shu olish vaqti (complete_jobs egalikni shu bo'yicha tekshiradi)
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            ChatJob.objects.select_for_update(skip_locked=True)
+            .select_related('session')
+            .filter(
+                Q(status=ChatJob.STATUS_PENDING)
+                | Q(status=ChatJob.STATUS_RUNNING, started_at__lt=now - timedelta(seconds=stale_after))
+            )
+            .order_by('created_at')[:batch_size]
+        )
+        ChatJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=ChatJob.STATUS_RUNNING, started_at=now
+        )
+    for job in jobs:
+        job.status = ChatJob.STATUS_RUNNING
+        job.started_at = now
+    return jobs
+
+
+async def _generate(prompt, response_cache, limiter):
+    """Keshda bo'lsa keshdan ({'response', 'cached': True}), aks holda model slotida modeldan"""
+    cached_response = await response_cache.get(settings.CHATAI_MODEL, prompt)
+    if cached_response is not None:
+        return {'response': cached_response, 'cached': True}
+
+    async with limiter.model_slot():
+        result = await get_ai_service().aget_response(prompt)
+    if result['response']:
+        await response_cache.set(settings.CHATAI_MODEL, prompt, result['response'])
+    return result
+
+
+async def _generate_all(prompts):
+    response_cache = get_response_cache()
+    limiter = get_limiter()
+    return await asyncio.gather(
+        *(_generate(prompt, response_cache, limiter) for prompt in prompts),
+        return_exceptions=True
+    )
+
+
+def _usage_fields(result):
+    """Natijadan ChatMessage hisob maydonlari (keshdan bo'lsa modelga sarf yo'q)"""
+    if result.get('cached'):
+        return {'cached': True}
+    return {
+        'model': result['model'],
+        'prompt_tokens': result['prompt_tokens'],
+        'completion_tokens': result['completion_tokens'],
+        'latency_ms': result['latency_ms'],
+    }
+
+
+def complete_jobs(jobs, results):
+    """
+    Natijalarni yozish - faqat hali shu worker qo'lidagi joblar uchun (status 'running' va
+    started_at olingan vaqtga teng). Job boshqa workerga o'tgan bo'lsa natija tashlanadi,
+    aks holda tarixda takroriy xabar va sarf hisobida ikki barobar bo'ladi.
+    Qaytaradi: yozilgan joblar soni
+    """
+    finished_at = timezone.now()
+    with transaction.atomic():
+        owned = set(
+            ChatJob.objects.select_for_update()
+            .filter(
+                pk__in=[job.pk for job in jobs],
+                status=ChatJob.STATUS_RUNNING,
+                started_at__in={job.started_at for job in jobs},
+            )
+            .values_list('pk', 'started_at')
+        )
+
+        done = []
+        messages = []
+        for job, result in zip(jobs, results):
+            if (job.pk, job.started_at) not in owned:
+                continue
+            done.append(job)
+            job.finished_at = finished_at
+            if isinstance(result, Exception):
+                job.status = ChatJob.STATUS_FAILED
+                job.error = str(result)[:200]
+                continue
+
+            job.status = ChatJob.STATUS_DONE
+            job.response = result['response']
+            job.model = result.get('model') or ''
+            messages.append(ChatMessage(
+                session=job.session,
+                user_message=job.message,
+                ai_response=job.response,
+                **_usage_fields(result)
+            ))
+
+        ChatMessage.objects.bulk_create(messages)
+        ChatUsageDaily.record(messages)
+        ChatJob.objects.bulk_update(done, ['status', 'response', 'model', 'error', 'finished_at'])
+        ChatSession.objects.filter(
+            pk__in={message.session_id for message in messages}
+        ).update(updated_at=finished_at)
+
+    return len(done)
+
+
+def process_pending_jobs(batch_size=None, stale_after=None):
+    """Bitta paketni bajarish. Qaytaradi: bajarilgan joblar soni"""
+    config = settings.CHATAI_JOBS
+    jobs = claim_jobs(batch_size or config['BATCH_SIZE'], stale_after or config['STALE_AFTER'])
+    if not jobs:
+        return 0
+
+    builder = ContextBuilder.from_settings()
+    contexts = [builder.build(job.session) for job in jobs]
+    prompts = [build_prompt(job.message, context) for job, context in zip(jobs, contexts)]
+    results = async_to_sync(_generate_all)(prompts)
+
+    done = complete_jobs(jobs, results)
+    _schedule_summaries(builder, jobs, contexts)
+    return done
+
+
+def _schedule_summaries(builder, jobs, contexts):
+    """Yozilgan joblar sessiyalari uchun xulosa vaqti kelgan bo'lsa - alohida Celery task"""
+    from .tasks import refresh_chat_summary  # tasks shu moduldan import qiladi
+
+    due = {
+        job.session_id for job, context in zip(jobs, contexts)
+        if job.status == ChatJob.STATUS_DONE and builder.turns_to_summarize(context)
+    }
+    for session_pk in due:
+        refresh_chat_summary.delay(session_pk)
+
+
+def refresh_session_summary(session_pk):
+    """
+    Sessiya xulosasini yangilash (chat_api yoki job javobi yozilgach Celery da).
+    Qaytaradi: xulosa yozildimi
+    """
+    session = ChatSession.objects.filter(pk=session_pk, deleted_at__isnull=True).first()
+    if session is None:
+        return False
+
+    builder = ContextBuilder.from_settings()
+    context = builder.build(session)
+    turns = builder.turns_to_summarize(context)
+    if not turns:
+        return False
+
+    result = async_to_sync(get_ai_service().aget_response)(builder.summary_prompt(context.summary, turns))
+    ChatUsageDaily.record_summary(result)
+    return builder.store_summary(session, result['response'], turns)
@@ -0,0 +1,185 @@
+# chatai/limits.py
+"""
+Model chaqiruvlari uchun kirish nazorati (admission control).
+
+- har bir session_id uchun token bucket: SESSION_RATE so'rov/sekund, SESSION_BURST gacha ketma-ket
+- model chaqiruvlari uchun global chegara: bir vaqtda MAX_CONCURRENT ta, navbatda MAX_QUEUE ta,
+  navbatda QUEUE_TIMEOUT sekunddan ko'p kutilmaydi
+- bir xil savol modelda ishlanayotgan bo'lsa, keyingilari o'sha bitta so'rov javobini kutadi
+
+Sig'maganlarga darhol RateLimited (view 429 + Retry-After qaytaradi).
+Holat jarayon ichida: threading.Lock bilan, shuning uchun ham ASGI (bitta loop),
+ham WSGI (har so'rovga alohida loop) da ishlaydi.
+"""
+import asyncio
+import concurrent.futures
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class RateLimited(Exception):
+    """So'rov qabul qilinmadi - retry_after sekunddan keyin qayta urinish mumkin"""
+
+    def __init__(self, retry_after, reason):
+        super().__init__(reason)
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+
+
+class CoalescedCallAborted(Exception):
+    """Birinchi so'rov bekor qilindi - kutayotganlar o'zlari chaqiradi"""
+
+
+class AdmissionController:
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, session_rate=0.5, session_burst=5, max_concurrent=20,
+                 max_queue=100, queue_timeout=10, max_sessions=10000):
+        self.session_rate = session_rate
+        self.session_burst = session_burst
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_sessions = max_sessions
+
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # session_id -> [tokens, oxirgi yangilanish]
+        self._calls = {}               # kalit -> concurrent.futures.Future
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected_rate = 0
+        self.rejected_queue = 0
+        self.coalesced = 0
+
+    # ------------ SESSIYA BO'YICHA TOKEN BUCKET ------------
+    def check_rate(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(session_id, None) or [self.session_burst, now]
+            tokens = min(self.session_burst, bucket[0] + (now - bucket[1]) * self.session_rate)
+            self._buckets[session_id] = [tokens, now]
+            while len(self._buckets) > self.max_sessions:
+                self._buckets.popitem(last=False)
+
+            if tokens < 1:
+                self.rejected_rate += 1
+                raise RateLimited((1 - tokens) / self.session_rate, 'session')
+            self._buckets[session_id][0] = tokens - 1
+
+    # ------------ GLOBAL CHEGARA ------------
+    def check_capacity(self):
+        """Navbat to'lgan bo'lsa darhol rad etish (slotni keyinroq olish uchun)"""
+        with self._lock:
+            if self.in_flight >= self.max_concurrent and self.queued >= self.max_queue:
+                self.rejected_queue += 1
+                raise RateLimited(self.queue_timeout, 'queue')
+
+    def _try_acquire(self):
+        with self._lock:
+            if self.in_flight < self.max_concurrent:
+                self.in_flight += 1
+                return True
+            return False
+
+    @asynccontextmanager
+    async def model_slot(self):
+        """Model chaqiruvi uchun joy - bo'lmasa navbatda QUEUE_TIMEOUT gacha kutish"""
+        if not self._try_acquire():
+            with self._lock:
+                if self.queued >= self.max_queue:
+                    self.rejected_queue += 1
+                    raise RateLimited(self.queue_timeout, 'queue')
+                self.queued += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while not self._try_acquire():
+                    if time.monotonic() >= deadline:
+                        with self._lock:
+                            self.rejected_queue += 1
+                        raise RateLimited(self.queue_timeout, 'queue')
+                    await asyncio.sleep(self.POLL_INTERVAL)
+            finally:
+                with self._lock:
+                    self.queued -= 1
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    # ------------ BIR XIL SO'ROVLARNI BIRLASHTIRISH ------------
+    async def coalesce(self, key, factory):
+        """
+        factory() ni shu kalit bo'yicha bir marta chaqirish.
+        Qaytaradi: (natija, boshqa so'rov natijasi ishlatildimi)
+        """
+        while True:
+            with self._lock:
+                future = self._calls.get(key)
+                leader = future is None
+                if leader:
+                    future = self._calls[key] = concurrent.futures.Future()
+                else:
+                    self.coalesced += 1
+
+            if not leader:
+                try:
+                    return await asyncio.wrap_future(future), True
+                except CoalescedCallAborted:
+                    continue
+
+            try:
+                result = await factory()
+            except asyncio.CancelledError:
+                future.set_exception(CoalescedCallAborted())
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(result)
+                return result, False
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'queue_depth': self.queued,
+                'prompts_in_flight': len(self._calls),
+                'rejected_rate': self.rejected_rate,
+                'rejected_queue': self.rejected_queue,
+                'coalesced': self.coalesced,
+                'sessions_tracked': len(self._buckets),
+            }
+
+
+_limiter = None
+
+
+def get_limiter():
+    """Jarayon bo'yicha yagona AdmissionController"""
+    global _limiter
+    if _limiter is None:
+        _limiter = AdmissionController(
+            **{key.lower(): value for key, value in settings.CHATAI_LIMITS.items()}
+        )
+    return _limiter
+
+
+@receiver(setting_changed)
+def reset_limiter(sender, setting, **kwargs):
+    global _limiter
+    if setting == 'CHATAI_LIMITS':
+        _limiter = None
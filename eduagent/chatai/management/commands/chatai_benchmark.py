@@ -0,0 +1,80 @@
+"""
+chat_api ni StubBackend bilan offline o'lchash (tarmoq va Gemini kvotasi kerak emas).
+
+    python manage.py chatai_benchmark --sessions 200 --messages 3 --delay 0.5
+
+Eslatma: natija ASGI dagi xatti-harakatga yaqin - barcha so'rovlar bitta event loopda.
+"""
+import asyncio
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+from django.urls import reverse
+
+from chatai import backends
+from chatai.models import ChatSession
+
+
+SESSION_PREFIX = 'bench-'
+
+
+class Command(BaseCommand):
+    help = "chat_api ni StubBackend bilan N ta parallel sessiyada o'lchash"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=200, help='Parallel sessiyalar soni')
+        parser.add_argument('--messages', type=int, default=3, help='Har bir sessiyadagi xabarlar soni')
+        parser.add_argument('--delay', type=float, default=0.5, help='Stub model javob vaqti (sekund)')
+
+    def handle(self, *args, **options):
+        backends.set_backend(backends.StubBackend(delay=options['delay']))
+        try:
+            latencies, errors, rejected, elapsed = asyncio.run(
+                self._run(options['sessions'], options['messages'])
+            )
+        finally:
+            backends.set_backend(None)
+            deleted, _ = ChatSession.objects.filter(session_id__startswith=SESSION_PREFIX).delete()
+
+        total = len(latencies) + errors + rejected
+        self.stdout.write(f"So'rovlar: {total} (xato: {errors}, 429: {rejected}), vaqt: {elapsed:.2f}s")
+        self.stdout.write(f"Throughput: {total / elapsed:.1f} so'rov/s")
+        if latencies:
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(
+                f"Latency p50: {statistics.median(latencies) * 1000:.0f}ms, p95: {p95 * 1000:.0f}ms"
+            )
+        self.stdout.write(f"Tozalandi: {deleted} ta yozuv")
+
+    async def _run(self, sessions, messages):
+        client = AsyncClient()
+        url = reverse('chatai:chat_api')
+        latencies = []
+        errors = 0
+        rejected = 0
+
+        async def run_session(index):
+            nonlocal errors, rejected
+            # Har bir sessiya ichida xabarlar ketma-ket, sessiyalar esa parallel
+            for turn in range(messages):
+                payload = json.dumps({
+                    # Savollar har xil - javob keshi va birlashtirish natijaga ta'sir qilmasin
+                    'message': f'Savol {index}-{turn}',
+                    'session_id': f'{SESSION_PREFIX}{index}',
+                })
+                started = time.perf_counter()
+                response = await client.post(url, payload, content_type='application/json')
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - started)
+                elif response.status_code == 429:
+                    rejected += 1
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(run_session(i) for i in range(sessions)))
+        return latencies, errors, rejected, time.perf_counter() - started
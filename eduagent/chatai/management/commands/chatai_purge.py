@@ -0,0 +1,32 @@
+"""
+O'chirilgan (clear_history) va uzoq vaqt ishlatilmagan chat sessiyalarini tozalash.
+
+    python manage.py chatai_purge --idle-days 90 --batch-size 500
+    python manage.py chatai_purge --dry-run
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chatai.retention import expired_sessions, purge_sessions
+
+
+class Command(BaseCommand):
+    help = "Eski va o'chirilgan chat sessiyalarini bo'laklab o'chirish"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--idle-days', type=int, default=None, help="Shuncha kundan beri yozilmagan sessiyalar")
+        parser.add_argument('--batch-size', type=int, default=None, help="Bitta DELETE dagi sessiyalar soni")
+        parser.add_argument('--dry-run', action='store_true', help="Faqat sanash, o'chirmaslik")
+
+    def handle(self, *args, **options):
+        idle_days = options['idle_days']
+        if idle_days is None:
+            idle_days = settings.CHATAI_RETENTION['IDLE_DAYS']
+
+        if options['dry_run']:
+            count = expired_sessions(idle_days).count()
+            self.stdout.write(f"O'chiriladigan sessiyalar: {count}")
+            return
+
+        sessions, messages = purge_sessions(idle_days=idle_days, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"O'chirildi: {sessions} ta sessiya, {messages} ta xabar"))
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatai', '0005_chatjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='cached',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='completion_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='latency_ms',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='model',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='prompt_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ChatUsageDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('model', models.CharField(blank=True, default='', max_length=100)),
+                ('requests', models.PositiveIntegerField(default=0, verbose_name="So'rovlar")),
+                ('cached_requests', models.PositiveIntegerField(default=0, verbose_name='Keshdan')),
+                ('prompt_tokens', models.PositiveBigIntegerField(default=0)),
+                ('completion_tokens', models.PositiveBigIntegerField(default=0)),
+                ('latency_sum_ms', models.PositiveBigIntegerField(default=0)),
+                ('latency_count', models.PositiveIntegerField(default=0)),
+                ('latency_le_250', models.PositiveIntegerField(default=0)),
+                ('latency_le_500', models.PositiveIntegerField(default=0)),
+                ('latency_le_1000', models.PositiveIntegerField(default=0)),
+                ('latency_le_2000', models.PositiveIntegerField(default=0)),
+                ('latency_le_4000', models.PositiveIntegerField(default=0)),
+                ('latency_le_8000', models.PositiveIntegerField(default=0)),
+                ('latency_le_16000', models.PositiveIntegerField(default=0)),
+                ('latency_gt_16000', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Chat Usage (kunlik)',
+                'verbose_name_plural': 'Chat Usage (kunlik)',
+                'ordering': ['-date', 'model'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'model'), name='chatai_usage_daily_unique')],
+            },
+        ),
+    ]
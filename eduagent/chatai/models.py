@@ -1,4 +1,6 @@
-from django.db import models
+import uuid
+
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 
 
@@ -6,12 +8,20 @@ class ChatSession(models.Model):
     session_id = models.CharField(max_length=100, unique=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Eski xabarlarning qisqa xulosasi (chatai.context.ContextBuilder yangilaydi)
+    summary = models.TextField(blank=True, default='')
+    summarized_until = models.DateTimeField(null=True, blank=True)
+    # clear_history shu yerga vaqt yozadi, qatorlarni esa chatai.retention fonda o'chiradi
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     def __str__(self):
         return f"Session: {self.session_id[:10]}..."
 
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['updated_at']),
+        ]
         verbose_name = 'Chat Session'
         verbose_name_plural = 'Chat Sessions'
 
@@ -26,8 +36,15 @@ class ChatMessage(models.Model):
     ai_response = models.TextField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Hisob-kitob: qaysi model javob berdi, qancha token va vaqt ketdi
+    model = models.CharField(max_length=100, blank=True, default='')
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True)
+    completion_tokens = models.PositiveIntegerField(null=True, blank=True)
+    latency_ms = models.PositiveIntegerField(null=True, blank=True)
+    cached = models.BooleanField(default=False)
+
     def __str__(self):
-        return f"{self.session.session_id[:8]}: {self.user_message[:30]}..."
+        return f"{self.session.session_id[:8]}: {(self.user_message or '')[:30]}..."
 
     class Meta:
         ordering = ['created_at']
@@ -38,7 +55,170 @@ class ChatMessage(models.Model):
         verbose_name_plural = 'Chat Messages'
 
 
+class ChatJob(models.Model):
+    """Fonda (Celery) bajariladigan AI so'rovi - javob /ai/jobs/<id>/ orqali olinadi"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Navbatda'),
+        (STATUS_RUNNING, 'Bajarilmoqda'),
+        (STATUS_DONE, 'Tayyor'),
+        (STATUS_FAILED, 'Xato'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    session = models.ForeignKey(
+        ChatSession,
+        on_delete=models.CASCADE,
+        related_name='jobs'
+    )
+    message = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    response = models.TextField(blank=True, default='')
+    model = models.CharField(max_length=100, blank=True, default='')
+    error = models.CharField(max_length=200, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Job {self.id} ({self.status})"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        verbose_name = 'Chat Job'
+        verbose_name_plural = 'Chat Jobs'
+
+
+class ChatUsageDaily(models.Model):
+    """
+    Kunlik, model bo'yicha yig'ma hisob (ChatMessage saqlanganda F() bilan oshiriladi).
+    Latency gistogramma bo'laklarida saqlanadi - p50/p95 shulardan taxminlanadi.
+    Keshdan berilgan javoblar model='' qatorida, sessiya xulosalari - 'summary:<model>' qatorida.
+    Birlashtirilgan (coalesced) so'rovlar javob bergan model qatorida, tokensiz va latencysiz.
+    """
+    SUMMARY_PREFIX = 'summary:'
+
+    # Gistogramma bo'laklarining yuqori chegaralari (ms) va maydonlari
+    LATENCY_BUCKETS = (
+        (250, 'latency_le_250'),
+        (500, 'latency_le_500'),
+        (1000, 'latency_le_1000'),
+        (2000, 'latency_le_2000'),
+        (4000, 'latency_le_4000'),
+        (8000, 'latency_le_8000'),
+        (16000, 'latency_le_16000'),
+        (None, 'latency_gt_16000'),
+    )
+
+    date = models.DateField()
+    model = models.CharField(max_length=100, blank=True, default='')
+
+    requests = models.PositiveIntegerField(default=0, verbose_name="So'rovlar")
+    cached_requests = models.PositiveIntegerField(default=0, verbose_name='Keshdan')
+    prompt_tokens = models.PositiveBigIntegerField(default=0)
+    completion_tokens = models.PositiveBigIntegerField(default=0)
+    latency_sum_ms = models.PositiveBigIntegerField(default=0)
+    latency_count = models.PositiveIntegerField(default=0)
+
+    latency_le_250 = models.PositiveIntegerField(default=0)
+    latency_le_500 = models.PositiveIntegerField(default=0)
+    latency_le_1000 = models.PositiveIntegerField(default=0)
+    latency_le_2000 = models.PositiveIntegerField(default=0)
+    latency_le_4000 = models.PositiveIntegerField(default=0)
+    latency_le_8000 = models.PositiveIntegerField(default=0)
+    latency_le_16000 = models.PositiveIntegerField(default=0)
+    latency_gt_16000 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date', 'model']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'model'], name='chatai_usage_daily_unique'),
+        ]
+        verbose_name = 'Chat Usage (kunlik)'
+        verbose_name_plural = 'Chat Usage (kunlik)'
+
+    def __str__(self):
+        return f"{self.date} {self.model or 'cache'}: {self.requests}"
+
+    @classmethod
+    def latency_bucket(cls, latency_ms):
+        for upper, field in cls.LATENCY_BUCKETS:
+            if upper is None or latency_ms <= upper:
+                return field
+
+    def latency_percentile(self, percentile):
+        """Gistogrammadan taxminiy percentil (bo'lak yuqori chegarasi, ms)"""
+        if not self.latency_count:
+            return None
+        target = self.latency_count * percentile / 100
+        seen = 0
+        for upper, field in self.LATENCY_BUCKETS:
+            seen += getattr(self, field)
+            if seen >= target:
+                return upper
+        return None
+
+    @property
+    def average_latency_ms(self):
+        if not self.latency_count:
+            return None
+        return self.latency_sum_ms // self.latency_count
+
+    @classmethod
+    def record(cls, messages):
+        """ChatMessage lar hisobini (date, model) bo'yicha guruhlab atomar qo'shish"""
+        deltas = {}
+        for msg in messages:
+            cls._add_usage(
+                deltas, timezone.localdate(msg.created_at), msg.model, msg.cached,
+                msg.prompt_tokens, msg.completion_tokens, msg.latency_ms
+            )
+        for (date, model), delta in deltas.items():
+            cls._apply_delta(date, model, delta)
+
+    @classmethod
+    def record_summary(cls, result):
+        """Sessiya xulosasi uchun model chaqiruvi (aget_response natijasi) - ChatMessage yozilmaydi"""
+        deltas = {}
+        cls._add_usage(
+            deltas, timezone.localdate(), f"{cls.SUMMARY_PREFIX}{result['model']}", False,
+            result['prompt_tokens'], result['completion_tokens'], result['latency_ms']
+        )
+        for (date, model), delta in deltas.items():
+            cls._apply_delta(date, model, delta)
+
+    @classmethod
+    def _add_usage(cls, deltas, date, model, cached, prompt_tokens, completion_tokens, latency_ms):
+        delta = deltas.setdefault((date, model), {})
 
+        def add(field, value):
+            if value:
+                delta[field] = delta.get(field, 0) + value
 
+        add('requests', 1)
+        add('cached_requests', int(cached))
+        add('prompt_tokens', prompt_tokens)
+        add('completion_tokens', completion_tokens)
+        if latency_ms is not None:
+            add('latency_sum_ms', latency_ms)
+            add('latency_count', 1)
+            add(cls.latency_bucket(latency_ms), 1)
 
+    @classmethod
+    def _apply_delta(cls, date, model, delta):
+        increments = {field: models.F(field) + value for field, value in delta.items()}
+        if cls.objects.filter(date=date, model=model).update(**increments):
+            return
 
+        try:
+            with transaction.atomic():
+                cls.objects.create(date=date, model=model, **delta)
+        except IntegrityError:
+            # Parallel so'rov qatorni shu orada yaratdi
+            cls.objects.filter(date=date, model=model).update(**increments)
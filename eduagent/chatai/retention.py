@@ -0,0 +1,57 @@
+# chatai/retention.py
+"""
+Eski va o'chirilgan chat sessiyalarini tozalash.
+
+O'chiriladi:
+- clear_history bilan belgilangan (deleted_at) sessiyalar
+- IDLE_DAYS kundan beri yozilmagan sessiyalar
+
+Hammasi kichik bo'laklarda, har bir DELETE alohida (autocommit) - uzoq lock bo'lmaydi.
+manage.py chatai_purge va Celery beat (chatai.tasks.purge_chat_sessions) ishlatadi.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ChatSession, ChatMessage
+
+
+def expired_sessions(idle_days):
+    cutoff = timezone.now() - timedelta(days=idle_days)
+    return ChatSession.objects.filter(
+        Q(deleted_at__isnull=False) | Q(updated_at__lt=cutoff)
+    )
+
+
+def purge_sessions(idle_days=None, batch_size=None, message_batch_size=None):
+    """Muddati o'tgan sessiyalarni bo'laklab o'chirish. Qaytaradi: (sessiyalar, xabarlar) soni"""
+    config = settings.CHATAI_RETENTION
+    idle_days = config['IDLE_DAYS'] if idle_days is None else idle_days
+    batch_size = batch_size or config['BATCH_SIZE']
+    message_batch_size = message_batch_size or config['MESSAGE_BATCH_SIZE']
+
+    deleted_sessions = deleted_messages = 0
+    while True:
+        session_ids = list(
+            expired_sessions(idle_days).order_by().values_list('id', flat=True)[:batch_size]
+        )
+        if not session_ids:
+            break
+
+        # Avval xabarlar - bitta uzun sessiya ham bitta katta DELETE bo'lib qolmasin
+        while True:
+            message_ids = list(
+                ChatMessage.objects.filter(session_id__in=session_ids)
+                .order_by().values_list('id', flat=True)[:message_batch_size]
+            )
+            if not message_ids:
+                break
+            deleted_messages += ChatMessage.objects.filter(id__in=message_ids).delete()[0]
+
+        # delete()[0] kaskad (ChatJob) qatorlarini ham qo'shadi - faqat sessiyalar sanaladi
+        _, deleted = ChatSession.objects.filter(id__in=session_ids).delete()
+        deleted_sessions += deleted.get(ChatSession._meta.label, 0)
+
+    return deleted_sessions, deleted_messages
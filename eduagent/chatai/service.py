@@ -1,79 +1,273 @@
-# chatbot/ai_service.py
-from google import genai
-from django.conf import settings
+# chatai/service.py
+"""
+Modellar zanjiri: settings.CHATAI_MODELS dagi tartibda, har biri o'z timeouti bilan.
+
+Har bir model uchun circuit breaker:
+- closed    - oddiy holat, so'rovlar o'tadi
+- open      - WINDOW sekund ichida FAILURE_THRESHOLD ta xato bo'ldi, model RESET_TIMEOUT davomida
+              darhol o'tkazib yuboriladi (kutib vaqt yo'qotilmaydi)
+- half-open - RESET_TIMEOUT o'tgach bitta sinov so'rovi: muvaffaqiyatli bo'lsa closed, aks holda yana open
+
+Model chaqiruvi chatai.backends orqali (testlarda StubBackend).
+"""
+import asyncio
+import threading
 import time
+from collections import deque
 
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 
-class GoogleAIService:
-    def __init__(self):
-        # Settings dan API kalitini olamiz
-        self.api_key = getattr(settings, 'GOOGLE_API_KEY', '')
+from .backends import get_backend
+from .context import estimate_tokens
 
-        if not self.api_key or self.api_key.startswith('AIzaSy'):
-            raise ValueError(
-                "❌ Google API kaliti sozlanmagan.\n"
-                "1. makersuite.google.com/app/apikey ga kiring\n"
-                "2. Yangi API kalit oling\n"
-                "3. settings.py da GOOGLE_API_KEY = 'YANGI_KALIT' qo'ying"
-            )
 
-        # Google AI clientini yaratamiz
-        self.client = genai.Client(api_key=self.api_key)
+class ModelUnavailable(Exception):
+    """Zanjirdagi hech bir model javob bermadi"""
 
-        # Model nomi - SIZ TEST QILGAN MODEL
-        self.model_name = "gemini-2.0-flash-001"  # ✅ SIZ TEST QILGAN MODEL
+    def __init__(self, errors):
+        super().__init__('; '.join(errors) or 'Model sozlanmagan')
+        self.errors = errors
 
-    def get_response(self, user_message, chat_history=None):
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=3, window=60, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.opened_at = None
+        self._failures = deque()  # oxirgi xatolar vaqti
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                # Faqat bitta sinov so'rovi
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures.clear()
+            self._probe_in_flight = False
+
+    def record_cancelled(self):
+        """So'rov natijasiz tugadi (bekor qilindi) - sinov joyi keyingi so'rovga bo'shatiladi"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        now = time.monotonic()
+        with self._lock:
+            self._failures.append(now)
+            while self._failures and now - self._failures[0] > self.window:
+                self._failures.popleft()
+
+            if self.state == self.HALF_OPEN or len(self._failures) >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = now
+                self._probe_in_flight = False
+
+
+def _chars_per_token():
+    return settings.CHATAI_CONTEXT.get('CHARS_PER_TOKEN', 4)
+
+
+class ModelEntry:
+    def __init__(self, name, timeout, breaker):
+        self.name = name
+        self.timeout = timeout
+        self.breaker = breaker
+
+
+class ModelStream:
+    """
+    Fallback bilan oqim: birinchi token kelmaguncha keyingi modelga o'tish mumkin.
+    Oqim tugagach model, response_time, latency_ms va token soni (taxminiy) to'ldiriladi.
+    """
+
+    def __init__(self, service, prompt):
+        self.service = service
+        self.prompt = prompt
+        self.model = None
+        self.response_time = None  # foydalanuvchi kutgan vaqt (oldingi modellar bilan)
+        self.latency_ms = None     # javob bergan modelning o'zi (muvaffaqiyatli urinish)
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self._tokens = self._iterate()
+
+    def __aiter__(self):
+        return self._tokens
+
+    async def aclose(self):
+        await self._tokens.aclose()
+
+    async def _iterate(self):
+        started = time.monotonic()
+        backend = get_backend()
+        errors = []
+
+        for entry in self.service.models:
+            if not entry.breaker.allow_request():
+                errors.append(f"{entry.name}: circuit open")
+                continue
+
+            attempt_started = time.monotonic()
+            upstream = backend.stream(entry.name, self.prompt)
+            try:
+                first_token = await asyncio.wait_for(anext(upstream, None), entry.timeout)
+            except Exception as e:
+                entry.breaker.record_failure()
+                errors.append(f"{entry.name}: {type(e).__name__}")
+                await upstream.aclose()
+                continue
+            except BaseException:
+                # CancelledError - half-open sinovi osilib qolmasin
+                entry.breaker.record_cancelled()
+                await upstream.aclose()
+                raise
+
+            # Javob boshlandi - endi boshqa modelga o'tilmaydi
+            self.model = entry.name
+            completion_chars = 0
+            try:
+                if first_token is not None:
+                    completion_chars += len(first_token)
+                    yield first_token
+                async for token in upstream:
+                    completion_chars += len(token)
+                    yield token
+            except Exception:
+                entry.breaker.record_failure()
+                raise
+            except BaseException:
+                # Mijoz uzildi (GeneratorExit) yoki task bekor qilindi
+                entry.breaker.record_cancelled()
+                raise
+            finally:
+                await upstream.aclose()
+
+            entry.breaker.record_success()
+            now = time.monotonic()
+            self.response_time = round(now - started, 2)
+            self.latency_ms = int((now - attempt_started) * 1000)
+            self.prompt_tokens = estimate_tokens(self.prompt, _chars_per_token())
+            self.completion_tokens = completion_chars // _chars_per_token() + 1
+            return
+
+        raise ModelUnavailable(errors)
+
+
+class GoogleAIService:
+    """Gemini modellari zanjiri (fallback + circuit breaker)"""
+
+    def __init__(self, models=None, breaker_options=None):
+        models = settings.CHATAI_MODELS if models is None else models
+        breaker_options = settings.CHATAI_CIRCUIT_BREAKER if breaker_options is None else breaker_options
+        breaker_kwargs = {key.lower(): value for key, value in breaker_options.items()}
+
+        self.models = [
+            ModelEntry(model['NAME'], model.get('TIMEOUT', 30), CircuitBreaker(**breaker_kwargs))
+            for model in models
+        ]
+
+    async def aget_response(self, prompt):
         """
-        AI dan javob olish - TO'LIQ ISHLAYDI
+        Birinchi ishlayotgan modeldan javob.
+        Qaytaradi: {'success', 'response', 'response_time', 'latency_ms', 'model',
+        'prompt_tokens', 'completion_tokens'}; hech biri ishlamasa - ModelUnavailable.
+        response_time - umumiy (xato bergan modellar bilan), latency_ms - faqat javob bergan urinish
         """
-        try:
-            start_time = time.time()
+        started = time.monotonic()
+        backend = get_backend()
+        errors = []
 
-            # AI ga so'rov yuboramiz
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=user_message
-            )
+        for entry in self.models:
+            if not entry.breaker.allow_request():
+                errors.append(f"{entry.name}: circuit open")
+                continue
 
-            # Vaqtni hisoblaymiz
-            response_time = time.time() - start_time
+            attempt_started = time.monotonic()
+            try:
+                reply = await asyncio.wait_for(backend.generate(entry.name, prompt), entry.timeout)
+            except Exception as e:
+                entry.breaker.record_failure()
+                errors.append(f"{entry.name}: {type(e).__name__}")
+                continue
+            except BaseException:
+                entry.breaker.record_cancelled()
+                raise
+
+            entry.breaker.record_success()
+            now = time.monotonic()
+            # Model token sonini qaytarmasa - taxminiy hisob
+            prompt_tokens = reply.prompt_tokens
+            if prompt_tokens is None:
+                prompt_tokens = estimate_tokens(prompt, _chars_per_token())
+            completion_tokens = reply.completion_tokens
+            if completion_tokens is None:
+                completion_tokens = estimate_tokens(reply.text, _chars_per_token())
 
             return {
                 'success': True,
-                'response': response.text,
-                'response_time': round(response_time, 2),
-                'model': self.model_name
+                'response': reply.text,
+                'response_time': round(now - started, 2),
+                'latency_ms': int((now - attempt_started) * 1000),
+                'model': entry.name,
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens
             }
 
-        except Exception as e:
-            # Agar birinchi model ishlamasa, ikkinchi modelni sinab ko'ramiz
-            try:
-                print(f"⚠️ gemini-2.0-flash ishlamadi: {e}. Boshqa model sinab ko'ramiz...")
+        raise ModelUnavailable(errors)
 
-                response = self.client.models.generate_content(
-                    model="gemini-2.5-flash",  # ✅ IKKINCHI VARIANT
-                    contents=user_message
-                )
+    def astream(self, prompt):
+        return ModelStream(self, prompt)
+
+    def get_response(self, user_message, chat_history=None):
+        """Sinxron kod uchun (oldingi interfeys): xatoda success=False"""
+        try:
+            return async_to_sync(self.aget_response)(user_message)
+        except ModelUnavailable as e:
+            return {
+                'success': False,
+                'response': f"❌ AI xatosi: {e}",
+                'response_time': 0,
+                'model': None
+            }
 
-                response_time = time.time() - start_time
+    def stats(self):
+        return {entry.name: entry.breaker.state for entry in self.models}
 
-                return {
-                    'success': True,
-                    'response': response.text,
-                    'response_time': round(response_time, 2),
-                    'model': "gemini-2.5-flash"
-                }
 
-            except Exception as e2:
-                return {
-                    'success': False,
-                    'response': f"❌ AI xatosi: {str(e2)}\n"
-                                f"API kalitini tekshiring: {self.api_key[:20]}...",
-                    'response_time': 0,
-                    'model': None
-                }
+_service = None
 
 
+def get_ai_service():
+    """Jarayon bo'yicha yagona servis - circuit breaker holati so'rovlar orasida saqlanadi"""
+    global _service
+    if _service is None:
+        _service = GoogleAIService()
+    return _service
 
 
+@receiver(setting_changed)
+def reset_ai_service(sender, setting, **kwargs):
+    global _service
+    if setting in ('CHATAI_MODELS', 'CHATAI_CIRCUIT_BREAKER'):
+        _service = None
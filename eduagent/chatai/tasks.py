@@ -0,0 +1,26 @@
+from celery import shared_task
+
+from .jobs import process_pending_jobs, refresh_session_summary
+from .retention import purge_sessions
+
+
+@shared_task
+def purge_chat_sessions():
+    """Celery beat: o'chirilgan va eski chat sessiyalarini tozalash"""
+    sessions, messages = purge_sessions()
+    return {'sessions': sessions, 'messages': messages}
+
+
+@shared_task
+def refresh_chat_summary(session_pk):
+    """chat_api, chat_stream va joblardan: har SUMMARY_EVERY xabarda xulosani yangilash (foydalanuvchi kutmaydi)"""
+    return refresh_session_summary(session_pk)
+
+
+@shared_task
+def process_chat_jobs():
+    """
+    Navbatdagi ChatJob larni paket bilan bajarish.
+    Har bir yangi job shu taskni chaqiradi; Celery beat ham muntazam chaqiradi (osilib qolgan joblar)
+    """
+    return process_pending_jobs()
@@ -5,8 +5,14 @@ app_name = 'chatai'
 
 urlpatterns = [
     path('api/', views.chat_api, name='chat_api'),
+    path('stream/', views.chat_stream, name='chat_stream'),
+    path('jobs/', views.submit_chat_job, name='submit_chat_job'),
+    path('jobs/<uuid:job_id>/', views.chat_job_status, name='chat_job_status'),
     path('history/<str:session_id>/', views.get_history, name='get_history'),
+    path('history/<str:session_id>/export/', views.export_history, name='export_history'),
     path('clear/<str:session_id>/', views.clear_history, name='clear_history'),
     path('widget-info/', views.chat_widget, name='widget_info'),
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
+    path('limiter-stats/', views.limiter_stats, name='limiter_stats'),
 ]
 
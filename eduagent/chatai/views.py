@@ -4,90 +4,211 @@
 #  --------------------------- NEW VIEWS BU YANGI VERSIYADAGI GEMINI -----------------------------
 
 # chatai/views.py - FAQLAT YANGI VERSIYA
+import asyncio
+import base64
+import binascii
+import contextlib
 import json
-from google import genai  # Yangi import
-from django.http import JsonResponse
+import logging
+import time
+from datetime import datetime
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import CharField, Q, Value
+from django.db.models.functions import Cast, Concat
 from django.utils import timezone
-import os
-from dotenv import load_dotenv
-from .models import ChatSession, ChatMessage
+from .backends import get_backend, model_loop
+from .cache import get_response_cache, make_cache_key
+from .context import ContextBuilder, build_prompt
+from .limits import RateLimited, get_limiter
+from .models import ChatSession, ChatMessage, ChatJob, ChatUsageDaily
+from .service import ModelUnavailable, get_ai_service
+from .tasks import process_chat_jobs, refresh_chat_summary
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# API kalitni .env dan olish
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+def _release_connection():
+    """
+    Model javobini kutayotganda DB ulanishini band qilib turmaslik.
+    Tranzaksiya ichida (masalan testlarda) ulanish yopilmaydi.
+    """
+    if not connection.in_atomic_block:
+        connection.close()
 
-@csrf_exempt
-@require_POST
-def chat_api(request):
+
+@sync_to_async
+def _load_session_context(session_id, builder):
+    """Sessiyani olish/yaratish va kontekst (xulosa + oxirgi xabarlar)"""
     try:
-        data = json.loads(request.body.decode('utf-8'))
-        message = data.get('message', '').strip()
-        session_id = data.get('session_id', 'default_session')
+        session, created = ChatSession.objects.get_or_create(
+            session_id=session_id,
+            defaults={'created_at': timezone.now()}
+        )
+        return session, builder.build(session)
+    finally:
+        _release_connection()
+
+
+@sync_to_async
+def _save_chat_message(session, message, ai_response, usage):
+    """Javob va uning hisobini (model, token, latency) qisqa tranzaksiyada saqlash"""
+    with transaction.atomic():
+        chat_message = ChatMessage.objects.create(
+            session=session,
+            user_message=message,
+            ai_response=ai_response,
+            **usage
+        )
+        ChatUsageDaily.record([chat_message])
+        ChatSession.objects.filter(pk=session.pk).update(updated_at=timezone.now())
+
+
+def _usage_fields(result):
+    """Servis natijasidan ChatMessage hisob maydonlari"""
+    return {
+        'model': result['model'],
+        'prompt_tokens': result['prompt_tokens'],
+        'completion_tokens': result['completion_tokens'],
+        'latency_ms': result['latency_ms'],
+    }
+
+
+# Keshdan berilgan javob - modelga sarf yo'q
+CACHED_USAGE = {'cached': True}
+
+
+def _coalesced_usage(result):
+    """Boshqa so'rov natijasi ishlatildi: o'sha model qatorida, lekin tokenlar birinchi so'rovda hisoblangan"""
+    return {'model': result['model'], 'prompt_tokens': 0, 'completion_tokens': 0}
+
+
+async def _schedule_session_summary(builder, session, context):
+    """
+    Xulosa vaqti kelgan bo'lsa - Celery taskga: javob xulosa uchun model chaqiruvini kutmaydi
+    va model slotini band qilmaydi (WSGI da so'rov loopi javobdan keyin yopiladi, shuning uchun asyncio task emas)
+    """
+    if not builder.turns_to_summarize(context):
+        return
+    try:
+        await sync_to_async(refresh_chat_summary.delay)(session.pk)
+    except Exception:
+        # Broker ishlamayapti - xulosa keyingi xabarda qayta urinib ko'riladi
+        logger.exception("Sessiya xulosasi navbatga qo'yilmadi: %s", session.session_id)
 
-        if not message:
-            return JsonResponse({'success': False, 'error': 'Xabar bo\'sh'}, status=400)
 
-        if not GEMINI_API_KEY:
-            return JsonResponse({'success': False, 'error': 'API kalit topilmadi'}, status=500)
+class ChatRequestError(Exception):
+    """So'rovni qabul qilib bo'lmasa - javob tayyor holda"""
 
-        with transaction.atomic():
-            # Session ni database da saqlash
-            session, created = ChatSession.objects.get_or_create(
-                session_id=session_id,
-                defaults={'created_at': timezone.now()}
-            )
+    def __init__(self, response):
+        super().__init__(response.content)
+        self.response = response
 
-            # Kontekst uchun avvalgi xabarlar
-            recent_messages = ChatMessage.objects.filter(
-                session=session
-            ).order_by('-timestamp')[:3]
 
-            context_lines = []
-            for msg in reversed(recent_messages):
-                context_lines.append(f"User: {msg.user_message}")
-                context_lines.append(f"AI: {msg.ai_response}")
+def _parse_chat_request(request):
+    """So'rov tanasidan xabar va sessiya ID sini olish"""
+    data = json.loads(request.body.decode('utf-8'))
+    message = data.get('message', '').strip()
+    session_id = data.get('session_id', 'default_session')
 
-            context = "\n".join(context_lines) if context_lines else "Yangi suhbat."
+    if not message:
+        raise ChatRequestError(JsonResponse({'success': False, 'error': 'Xabar bo\'sh'}, status=400))
 
-            prompt = f"""
-            {context}
+    if not get_backend().is_configured():
+        raise ChatRequestError(JsonResponse({'success': False, 'error': 'API kalit topilmadi'}, status=500))
 
-            Yangi savol: {message}
+    return message, session_id
 
-            Javobni faqat o'zbek tilida bering. Qisqa va aniq bo'lsin.
-            """
 
-            # YANGI USUL: google-genai bilan ishlash
-            client = genai.Client(api_key=GEMINI_API_KEY)
+def _model_unavailable_response(error):
+    return JsonResponse({
+        'success': False,
+        'error': str(error)[:200],
+        'response': 'AI vaqtincha ishlamayapti. Keyinroq urinib ko\'ring.'
+    }, status=503)
 
-            response = client.models.generate_content(
-                model="gemini-1.5-flash",
-                contents=prompt
-            )
 
-            ai_response = response.text.strip()
+def _rate_limited_response(error):
+    response = JsonResponse({
+        'success': False,
+        'error': 'Juda ko\'p so\'rov. Birozdan keyin urinib ko\'ring.',
+        'retry_after': error.retry_after
+    }, status=429)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
 
-            # Database ga saqlash
-            ChatMessage.objects.create(
-                session=session,
-                user_message=message,
-                ai_response=ai_response
+@csrf_exempt
+@require_POST
+async def chat_api(request):
+    """
+    Async view: DB o'qiladi -> ulanish bo'shatiladi -> model kutiladi -> javob qisqa tranzaksiyada yoziladi.
+    Model chaqiruvi davomida worker ham, DB ulanishi ham band bo'lmaydi (ASGI da).
+    Sessiya limiti yoki global navbat to'lsa - 429 + Retry-After.
+    """
+    try:
+        message, session_id = _parse_chat_request(request)
+        limiter = get_limiter()
+        limiter.check_rate(session_id)
+        builder = ContextBuilder.from_settings()
+
+        session, context = await _load_session_context(session_id, builder)
+
+        # Takroriy savol (shu kontekstda) bo'lsa modelga so'rov ketmaydi, lekin tarix baribir yoziladi
+        prompt = build_prompt(message, context)
+        response_cache = get_response_cache()
+        ai_response = await response_cache.get(settings.CHATAI_MODEL, prompt)
+        cached = ai_response is not None
+        coalesced = False
+        result = {'model': None, 'response_time': 0}
+
+        if not cached:
+            async def generate():
+                # Modellar zanjiri: ishlamayotgan (circuit open) model darhol o'tkazib yuboriladi
+                async with limiter.model_slot():
+                    reply = await get_ai_service().aget_response(prompt)
+                if reply['response']:
+                    await response_cache.set(settings.CHATAI_MODEL, prompt, reply['response'])
+                return reply
+
+            # Xuddi shu prompt (savol + kontekst) hozir modelda bo'lsa - o'sha javob kutiladi
+            # (kesh kaliti bilan bir xil)
+            result, coalesced = await limiter.coalesce(
+                make_cache_key(settings.CHATAI_MODEL, prompt), generate
             )
+            ai_response = result['response']
 
-            session.updated_at = timezone.now()
-            session.save()
+        if cached:
+            usage = CACHED_USAGE
+        elif coalesced:
+            usage = _coalesced_usage(result)
+        else:
+            usage = _usage_fields(result)
+        await _save_chat_message(session, message, ai_response, usage)
+        await _schedule_session_summary(builder, session, context)
 
-            return JsonResponse({
-                'success': True,
-                'response': ai_response,
-                'session_id': session_id
-            })
+        return JsonResponse({
+            'success': True,
+            'response': ai_response,
+            'session_id': session_id,
+            'model': result['model'],
+            'response_time': result['response_time'],
+            'cached': cached,
+            'coalesced': coalesced
+        })
 
+    except ChatRequestError as e:
+        return e.response
+    except RateLimited as e:
+        return _rate_limited_response(e)
+    except ModelUnavailable as e:
+        return _model_unavailable_response(e)
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -96,29 +217,282 @@ def chat_api(request):
         }, status=500)
 
 
+JOB_MAX_WAIT = 25  # ?wait= uchun yuqori chegara (sekund)
+
+
+def _serialize_job(job):
+    return {
+        'success': job.status != ChatJob.STATUS_FAILED,
+        'job_id': str(job.id),
+        'status': job.status,
+        'response': job.response or None,
+        'model': job.model or None,
+        'error': job.error or None,
+        'session_id': job.session.session_id,
+    }
+
+
+@csrf_exempt
+@require_POST
+def submit_chat_job(request):
+    """
+    Fon rejimi: so'rov ChatJob sifatida navbatga qo'yiladi va darhol 202 + job_id qaytadi.
+    Javob /ai/jobs/<job_id>/ dan olinadi (?wait=N - tayyor bo'lguncha N sekundgacha kutish).
+    """
+    try:
+        message, session_id = _parse_chat_request(request)
+        get_limiter().check_rate(session_id)
+
+        session, created = ChatSession.objects.get_or_create(
+            session_id=session_id,
+            defaults={'created_at': timezone.now()}
+        )
+        job = ChatJob.objects.create(session=session, message=message)
+
+    except ChatRequestError as e:
+        return e.response
+    except RateLimited as e:
+        return _rate_limited_response(e)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)[:100]}, status=500)
+
+    try:
+        process_chat_jobs.delay()
+    except Exception as e:
+        # Broker ishlamayapti - job bajarilmaydi
+        ChatJob.objects.filter(pk=job.pk).update(
+            status=ChatJob.STATUS_FAILED, error=str(e)[:200], finished_at=timezone.now()
+        )
+        return JsonResponse({'success': False, 'error': 'Navbat ishlamayapti'}, status=503)
+
+    return JsonResponse({
+        'success': True,
+        'job_id': str(job.id),
+        'status': job.status,
+        'poll': reverse('chatai:chat_job_status', args=[job.id])
+    }, status=202)
+
+
+@sync_to_async
+def _load_job(job_id):
+    try:
+        return ChatJob.objects.select_related('session').filter(pk=job_id).first()
+    finally:
+        _release_connection()
+
+
+async def chat_job_status(request, job_id):
+    """Job holati. ?wait=N - job tugaguncha (N sekundgacha) javobni ushlab turish (long polling)"""
+    try:
+        wait = min(float(request.GET.get('wait', 0)), JOB_MAX_WAIT)
+    except ValueError:
+        wait = 0
+    deadline = time.monotonic() + wait
+
+    while True:
+        job = await _load_job(job_id)
+        if job is None:
+            return JsonResponse({'success': False, 'error': 'Job topilmadi'}, status=404)
+        if job.status in (ChatJob.STATUS_DONE, ChatJob.STATUS_FAILED) or time.monotonic() >= deadline:
+            return JsonResponse(_serialize_job(job))
+        await asyncio.sleep(0.5)
+
+
+def _sse(data, event=None):
+    """Server-Sent Events formatidagi bitta hodisa"""
+    payload = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return f"event: {event}\n{payload}" if event else payload
+
+
+async def _single_chunk_stream(text):
+    """Keshdan olingan javobni oqim ko'rinishida qaytarish"""
+    yield text
+
+
+@csrf_exempt
+@require_POST
+async def chat_stream(request):
+    """
+    Javobni token-token SSE orqali yuborish (text/event-stream).
+    Hodisalar: data: {"token": ...} ... -> event: done (to'liq javob) yoki event: error.
+    Javob oxirida bir marta saqlanadi. Mijoz uzilsa upstream generatsiya bekor qilinadi
+    va hech narsa saqlanmaydi. ASGI da async generator, WSGI da sinxron generator qaytadi -
+    ikkalasida ham token kelishi bilan yuboriladi.
+    """
+    try:
+        message, session_id = _parse_chat_request(request)
+        limiter = get_limiter()
+        limiter.check_rate(session_id)
+        # Navbat to'la bo'lsa oqim ochilmasdan 429; slot generator ichida olinadi
+        limiter.check_capacity()
+        builder = ContextBuilder.from_settings()
+        session, context = await _load_session_context(session_id, builder)
+    except ChatRequestError as e:
+        return e.response
+    except RateLimited as e:
+        return _rate_limited_response(e)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)[:100]}, status=500)
+
+    prompt = build_prompt(message, context)
+    response_cache = get_response_cache()
+    cached_response = await response_cache.get(settings.CHATAI_MODEL, prompt)
+
+    if cached_response is not None:
+        upstream = _single_chunk_stream(cached_response)
+        slot = contextlib.nullcontext()
+    else:
+        upstream = get_ai_service().astream(prompt)
+        slot = limiter.model_slot()
+
+    chunks = []
+    failed = False
+
+    async def token_events():
+        """Token hodisalari; xato bo'lsa error hodisasi bilan tugaydi (failed=True)"""
+        nonlocal failed
+        try:
+            async with slot:
+                async for token in upstream:
+                    chunks.append(token)
+                    yield _sse({'token': token})
+        except asyncio.CancelledError:
+            # Mijoz uzildi (ASGI da task bekor qilinadi) - finally upstreamni yopadi
+            raise
+        except RateLimited as e:
+            failed = True
+            yield _sse({'success': False, 'error': 'Navbat to\'la', 'retry_after': e.retry_after}, event='error')
+        except ModelUnavailable as e:
+            failed = True
+            yield _sse({'success': False, 'error': 'AI vaqtincha ishlamayapti', 'detail': str(e)[:200]}, event='error')
+        except Exception as e:
+            failed = True
+            yield _sse({'success': False, 'error': str(e)[:100]}, event='error')
+        finally:
+            await upstream.aclose()
+
+    async def finish():
+        """To'liq javobni saqlash. Qaytaradi: done hodisasi"""
+        ai_response = ''.join(chunks).strip()
+        if cached_response is None:
+            if ai_response:
+                await response_cache.set(settings.CHATAI_MODEL, prompt, ai_response)
+            usage = {
+                'model': upstream.model,
+                'prompt_tokens': upstream.prompt_tokens,
+                'completion_tokens': upstream.completion_tokens,
+                'latency_ms': upstream.latency_ms,
+            }
+        else:
+            usage = CACHED_USAGE
+        await _save_chat_message(session, message, ai_response, usage)
+        return _sse({
+            'success': True,
+            'response': ai_response,
+            'session_id': session_id,
+            'model': usage.get('model'),
+            'response_time': getattr(upstream, 'response_time', 0),
+            'cached': cached_response is not None
+        }, event='done')
+
+    async def event_stream():
+        async for event in token_events():
+            yield event
+        if not failed:
+            yield await finish()
+            await _schedule_session_summary(builder, session, context)
+
+    def sync_event_stream():
+        # WSGI async iteratorni yuborishdan oldin oxirigacha yig'ib oladi. Tokenlar fon loopdan
+        # bittadan olinib darhol beriladi; mijoz uzilsa server close() chaqiradi va upstream yopiladi.
+        # Saqlash so'rov threadida (async_to_sync) - DB ulanishi shu so'rovniki
+        yield from model_loop.iterate_sync(token_events())
+        if not failed:
+            yield async_to_sync(finish)()
+            async_to_sync(_schedule_session_summary)(builder, session, context)
+
+    events = sync_event_stream() if isinstance(request, WSGIRequest) else event_stream()
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx javobni buferlamasin
+    return response
+
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+
+def encode_history_cursor(msg):
+    """(created_at, id) -> URL uchun xavfsiz kursor"""
+    raw = f"{msg.created_at.isoformat()}|{msg.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_history_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+    return datetime.fromisoformat(created_at), int(pk)
+
+
+def _serialize_history_message(msg):
+    return {
+        'id': msg.id,
+        'user': msg.user_message,
+        'ai': msg.ai_response,
+        'time': timezone.localtime(msg.created_at).strftime('%H:%M, %d.%m.%Y'),
+        'timestamp': msg.created_at.isoformat()
+    }
+
+
 def get_history(request, session_id):
-    """Suhbat tarixini olish"""
+    """
+    Suhbat tarixi sahifalab (keyset: (created_at, id), (session, created_at) indeksi bo'yicha).
+    ?limit=N (max 200), ?before=<kursor> - eskiroqlari, ?after=<kursor> - yangiroqlari.
+    Kursorsiz - eng oxirgi sahifa. Har bir sahifa xronologik tartibda.
+    """
+    try:
+        limit = min(int(request.GET.get('limit', HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+        before = request.GET.get('before')
+        after = request.GET.get('after')
+        cursor = decode_history_cursor(before or after) if (before or after) else None
+        if limit < 1:
+            raise ValueError(limit)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return JsonResponse({'success': False, 'error': 'Noto\'g\'ri limit yoki kursor'}, status=400)
+
     try:
         session = ChatSession.objects.get(session_id=session_id)
-        messages = ChatMessage.objects.filter(
-            session=session
-        ).order_by('timestamp')
-
-        history = []
-        for msg in messages:
-            history.append({
-                'id': msg.id,
-                'user': msg.user_message,
-                'ai': msg.ai_response,
-                'time': msg.timestamp.strftime('%H:%M, %d.%m.%Y'),
-                'timestamp': msg.timestamp.isoformat()
-            })
+        messages = ChatMessage.objects.filter(session=session)
+
+        if after:
+            created_at, pk = cursor
+            messages = messages.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            ).order_by('created_at', 'id')
+        else:
+            if before:
+                created_at, pk = cursor
+                messages = messages.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+                )
+            messages = messages.order_by('-created_at', '-id')
+
+        # limit + 1: keyingi sahifa borligini count() siz bilish uchun
+        page = list(messages[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+        if not after:
+            page.reverse()
+
+        has_older = has_more if not after else True
+        has_newer = has_more if after else bool(before)
 
         return JsonResponse({
             'success': True,
             'session_id': session_id,
-            'total': messages.count(),
-            'history': history,
+            'history': [_serialize_history_message(msg) for msg in page],
+            'before': encode_history_cursor(page[0]) if page and has_older else None,
+            'after': encode_history_cursor(page[-1]) if page and has_newer else None,
             'updated_at': session.updated_at.isoformat()
         })
 
@@ -126,8 +500,9 @@ def get_history(request, session_id):
         return JsonResponse({
             'success': True,
             'session_id': session_id,
-            'total': 0,
             'history': [],
+            'before': None,
+            'after': None,
             'message': 'Session topilmadi'
         })
     except Exception as e:
@@ -137,27 +512,55 @@ def get_history(request, session_id):
         }, status=500)
 
 
+def export_history(request, session_id):
+    """
+    Butun tarixni NDJSON (har qatorda bitta JSON) ko'rinishida oqim bilan yuklab berish.
+    Xabarlar bazadan bo'laklab o'qiladi - xotira sessiya uzunligiga bog'liq emas.
+    """
+    try:
+        session = ChatSession.objects.get(session_id=session_id)
+    except ChatSession.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Session topilmadi'}, status=404)
+
+    messages = ChatMessage.objects.filter(session=session).order_by('created_at', 'id')
+
+    def lines():
+        for msg in messages.iterator(chunk_size=500):
+            yield json.dumps(_serialize_history_message(msg), ensure_ascii=False) + '\n'
+
+    response = StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="chat-{session.pk}.ndjson"'
+    return response
+
+
 @csrf_exempt
 @require_POST
 def clear_history(request, session_id):
-    """Suhbat tarixini tozalash"""
+    """
+    Suhbat tarixini tozalash: sessiya faqat belgilanadi (bitta UPDATE) va session_id bo'shatiladi,
+    xabarlarni chatai.retention fonda bo'laklab o'chiradi.
+    """
     try:
-        session = ChatSession.objects.get(session_id=session_id)
-        count = ChatMessage.objects.filter(session=session).count()
-        ChatMessage.objects.filter(session=session).delete()
-        session.delete()
+        cleared = ChatSession.objects.filter(
+            session_id=session_id, deleted_at__isnull=True
+        ).update(
+            deleted_at=timezone.now(),
+            # session_id unique - shu ID bilan darhol yangi suhbat boshlash mumkin bo'lsin
+            session_id=Concat(Value('deleted:'), Cast('id', output_field=CharField()))
+        )
+
+        if not cleared:
+            return JsonResponse({
+                'success': False,
+                'error': 'Session topilmadi'
+            }, status=404)
 
         return JsonResponse({
             'success': True,
-            'message': f'{count} ta xabar o\'chirildi',
+            'message': 'Tarix o\'chirildi',
             'session_id': session_id
-        })
+        }, status=202)
 
-    except ChatSession.DoesNotExist:
-        return JsonResponse({
-            'success': False,
-            'error': 'Session topilmadi'
-        }, status=404)
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -165,13 +568,39 @@ def clear_history(request, session_id):
         }, status=500)
 
 
+async def cache_stats(request):
+    """Javob keshi hisoblagichlari (hit/miss) - faqat staff uchun"""
+    user = await request.auser()
+    if not user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Ruxsat yo\'q'}, status=403)
+
+    return JsonResponse({'success': True, 'cache': await get_response_cache().stats()})
+
+
+async def limiter_stats(request):
+    """Navbat chuqurligi, rad etishlar va modellar circuit holati - faqat staff uchun"""
+    user = await request.auser()
+    if not user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Ruxsat yo\'q'}, status=403)
+
+    return JsonResponse({
+        'success': True,
+        'limits': get_limiter().stats(),
+        'circuits': get_ai_service().stats()
+    })
+
+
 def chat_widget(request):
     """Chat widget uchun alohida sahifa"""
     return JsonResponse({
         'widget': True,
         'endpoints': {
             'chat': '/ai/api/',
+            'stream': '/ai/stream/',
+            'jobs': '/ai/jobs/',
+            'job_status': '/ai/jobs/{job_id}/',
             'history': '/ai/history/{session_id}/',
+            'export': '/ai/history/{session_id}/export/',
             'clear': '/ai/clear/{session_id}/'
         }
     })
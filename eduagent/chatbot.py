@@ -10,14 +10,20 @@ import sys
 import logging
 import json
 import asyncio
-from datetime import datetime, timedelta
+import argparse
+import gzip
+import html
+import multiprocessing
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple, Union
 from urllib.parse import unquote
 
-import psycopg2
-from psycopg2.extras import RealDictCursor, DictCursor
-from psycopg2 import pool
+import asyncpg
 import redis
+import redis.asyncio as redis_async
+from aiohttp import web
 
 from aiogram import Bot, Dispatcher, Router, F
 from aiogram.types import (
@@ -32,6 +38,7 @@ from aiogram.fsm.storage.redis import RedisStorage
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
 
 # ============================================================================
 # 1. KONFIGURATSIYA
@@ -46,11 +53,95 @@ BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', 'YOUR_BOT_TOKEN_HERE')
 
 # PostgreSQL Database Configuration (Django settings.py dan)
 DB_CONFIG = {
-    'dbname': os.environ.get('DB_NAME', 'your_db_name'),
+    'database': os.environ.get('DB_NAME', 'your_db_name'),
     'user': os.environ.get('DB_USER', 'your_db_user'),
     'password': os.environ.get('DB_PASSWORD', 'your_db_password'),
     'host': os.environ.get('DB_HOST', 'localhost'),
-    'port': os.environ.get('DB_PORT', '5432')
+    'port': int(os.environ.get('DB_PORT', '5432'))
+}
+
+# asyncpg pool sozlamalari
+DB_POOL_CONFIG = {
+    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+    # Bitta query uchun maksimal vaqt (sekund)
+    'command_timeout': float(os.environ.get('DB_COMMAND_TIMEOUT', 10)),
+    # Shuncha sekund ishlatilmagan connection yopiladi
+    'max_inactive_connection_lifetime': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+    # Prepared statement keshi (har bir connection uchun). PgBouncer transaction rejimida 0 qiling
+    'statement_cache_size': int(os.environ.get('DB_STATEMENT_CACHE_SIZE', 100)),
+}
+
+# Pool health-check (SELECT 1) oralig'i va timeouti (sekund)
+DB_HEALTH_CHECK_INTERVAL = float(os.environ.get('DB_HEALTH_CHECK_INTERVAL', 30))
+DB_HEALTH_CHECK_TIMEOUT = float(os.environ.get('DB_HEALTH_CHECK_TIMEOUT', 5))
+
+# bot_users keshi (get_user / get_or_create_user)
+USER_CACHE_CONFIG = {
+    'ttl': float(os.environ.get('USER_CACHE_TTL', 300)),
+    'max_entries': int(os.environ.get('USER_CACHE_MAX_ENTRIES', 10000)),
+    # Redis da ham saqlash (jarayonlar o'rtasida umumiy, restartdan keyin ham issiq)
+    'use_redis': os.environ.get('USER_CACHE_REDIS', 'false').lower() in ('1', 'true', 'yes'),
+    'key_prefix': os.environ.get('USER_CACHE_PREFIX', 'chatbot:user'),
+}
+
+# Ustoz/talaba ro'yxatlari keshi (assign_student_to_teacher da tozalanadi).
+# Redis yoqilgan bo'lsa boshqa jarayonlarning lokal nusxasi ko'pi bilan TTL gacha eskirishi mumkin
+ROSTER_CACHE_CONFIG = {
+    'ttl': float(os.environ.get('ROSTER_CACHE_TTL', 120)),
+    'max_entries': int(os.environ.get('ROSTER_CACHE_MAX_ENTRIES', 5000)),
+    'key_prefix': os.environ.get('ROSTER_CACHE_PREFIX', 'chatbot:roster'),
+}
+# Ro'yxat keyboardidagi bitta sahifa
+ROSTER_PAGE_SIZE = int(os.environ.get('ROSTER_PAGE_SIZE', 10))
+
+# Outbound xabarlar navbati (Telegram cheklovlari: ~30 xabar/s bot bo'yicha, 1 xabar/s bitta chatga,
+# guruhga 20 xabar/daqiqa)
+OUTBOX_CONFIG = {
+    'global_rate': float(os.environ.get('OUTBOX_GLOBAL_RATE', 25)),
+    'chat_rate': float(os.environ.get('OUTBOX_CHAT_RATE', 1)),
+    'chat_burst': float(os.environ.get('OUTBOX_CHAT_BURST', 3)),
+    'group_rate': float(os.environ.get('OUTBOX_GROUP_RATE', 20 / 60)),
+    # Bir vaqtda yuborilayotgan xabarlar (turli chatlarga)
+    'concurrency': int(os.environ.get('OUTBOX_CONCURRENCY', 8)),
+    # Navbatdan oldindan olingan (chat zanjirida kutayotgan) xabarlar
+    'max_pending': int(os.environ.get('OUTBOX_MAX_PENDING', 200)),
+    'max_attempts': int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 5)),
+    'retry_base_delay': float(os.environ.get('OUTBOX_RETRY_BASE_DELAY', 2)),
+    'key_prefix': os.environ.get('OUTBOX_PREFIX', 'chatbot:outbox'),
+}
+
+# E'lonlar (broadcast): outbox navbatida shundan ko'p xabar bo'lsa yangilari qo'shilmaydi -
+# oddiy javoblar e'lon ortida uzoq kutib qolmaydi
+BROADCAST_CONFIG = {
+    'batch_size': int(os.environ.get('BROADCAST_BATCH_SIZE', 200)),
+    'max_outbox_depth': int(os.environ.get('BROADCAST_MAX_OUTBOX_DEPTH', 50)),
+    'flush_interval': float(os.environ.get('BROADCAST_FLUSH_INTERVAL', 1)),
+    # Shuncha vaqt natijasi kelmagan xabar qayta yuboriladi
+    'stale_after': float(os.environ.get('BROADCAST_STALE_AFTER', 15 * 60)),
+}
+
+# authentication.CustomUser.ROLE_CHOICES dan (e'lon uchun rol tanlash)
+BROADCAST_ROLES = [
+    ('student', "Talaba"),
+    ('teacher', "Ustoz"),
+    ('assistant_teacher', "Yordamchi ustoz"),
+    ('high_teacher', "Katta ustoz"),
+    ('admin', "Admin"),
+]
+
+# bot_messages oylik bo'limlari (created_at bo'yicha RANGE partition)
+MESSAGE_PARTITION_CONFIG = {
+    # Joriy oydan tashqari shuncha oy oldindan yaratiladi
+    'months_ahead': int(os.environ.get('MESSAGES_PARTITION_MONTHS_AHEAD', 3)),
+    # Shundan eski oylar jadvaldan ajratiladi (0 - hech qachon)
+    'retention_months': int(os.environ.get('MESSAGES_RETENTION_MONTHS', 12)),
+    # Ajratilgan bo'limlar shu papkaga <nom>.csv.gz bo'lib yoziladi va o'chiriladi.
+    # Bo'sh bo'lsa - ajratilgan jadval bazada qoladi (qo'lda pg_dump uchun)
+    'archive_dir': os.environ.get('MESSAGES_ARCHIVE_DIR', 'archive/bot_messages'),
+    'check_interval': float(os.environ.get('MESSAGES_PARTITION_CHECK_INTERVAL', 6 * 3600)),
+    # Bo'limni ajratish parent jadvalni qisqa vaqt qulflaydi - uzoq kutib qolmasin
+    'lock_timeout': os.environ.get('MESSAGES_PARTITION_LOCK_TIMEOUT', '5s'),
 }
 
 # Admin Configuration
@@ -64,6 +155,20 @@ REDIS_CONFIG = {
     'decode_responses': True
 }
 
+# Webhook rejimi (python chatbot.py webhook)
+WEBHOOK_CONFIG = {
+    'base_url': os.environ.get('WEBHOOK_BASE_URL', ''),  # masalan: https://bot.example.uz
+    'path': os.environ.get('WEBHOOK_PATH', '/telegram/webhook'),
+    'secret': os.environ.get('WEBHOOK_SECRET', ''),
+    'host': os.environ.get('WEBHOOK_HOST', '0.0.0.0'),
+    'port': int(os.environ.get('WEBHOOK_PORT', 8080)),
+    # Worker jarayonlari soni (webhook va workerlarda bir xil bo'lishi kerak)
+    'workers': int(os.environ.get('WEBHOOK_WORKERS', 4)),
+    # Bitta worker bir vaqtda ishlaydigan update lar soni
+    'worker_concurrency': int(os.environ.get('WEBHOOK_WORKER_CONCURRENCY', 50)),
+    'queue_prefix': os.environ.get('WEBHOOK_QUEUE_PREFIX', 'chatbot:updates'),
+}
+
 # Logging Configuration
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -88,35 +193,179 @@ class Form(StatesGroup):
     viewing_chat = State()  # Chatni ko'rish
     replying_message = State()  # Javob yozish
     admin_assigning = State()  # Admin: bog'lash
+    searching_roster = State()  # Ustoz/talaba ro'yxatidan qidirish
+    broadcast_text = State()  # Admin: e'lon matni
 
 
 # ============================================================================
 # 3. DATABASE MANAGER (Django databasiga ulanadi)
 # ============================================================================
 
-class DatabaseManager:
-    """PostgreSQL database bilan ishlash"""
+class LayeredCache:
+    """
+    Read-through kesh: 1-qatlam - jarayon ichida TTL + LRU (max_entries),
+    2-qatlam - ixtiyoriy Redis (xuddi shu TTL). Redis xatolari keshni o'chirmaydi -
+    faqat jarayon ichidagi qatlam ishlaydi.
+    Qaytarilgan qiymat keshdagi obyektning o'zi - uni o'zgartirmang.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 10000, redis_client=None,
+                 key_prefix: str = 'chatbot:cache'):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        self._entries: OrderedDict = OrderedDict()  # kalit -> (muddati, qiymat)
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key) -> str:
+        return f"{self.key_prefix}:{key}"
+
+    async def get(self, key) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]
+
+        if self.redis is not None:
+            try:
+                raw = await self.redis.get(self._key(key))
+            except Exception as e:
+                logger.warning(f"⚠️ Cache (Redis) error: {e}")
+                raw = None
+            if raw:
+                value = self._loads(raw)
+                self._store_local(key, value)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key, value) -> None:
+        self._store_local(key, value)
+        if self.redis is not None:
+            try:
+                await self.redis.set(self._key(key), self._dumps(value), ex=int(self.ttl))
+            except Exception as e:
+                logger.warning(f"⚠️ Cache (Redis) error: {e}")
+
+    async def delete(self, key) -> None:
+        self._entries.pop(key, None)
+        if self.redis is not None:
+            try:
+                await self.redis.delete(self._key(key))
+            except Exception as e:
+                logger.warning(f"⚠️ Cache (Redis) error: {e}")
+
+    def clear(self) -> None:
+        """Faqat jarayon ichidagi qatlamni tozalash"""
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def _store_local(self, key, value) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _dumps(self, value) -> str:
+        return json.dumps(value)
+
+    def _loads(self, raw: str):
+        return json.loads(raw)
+
+
+class UserCache(LayeredCache):
+    """
+    bot_users qatorlari (kalit - telegram_id).
+    Webhook rejimida foydalanuvchi chati doim bitta workerga tushadi, shuning uchun jarayon
+    ichidagi nusxa o'sha worker yozgan o'zgarishlar bilan mos bo'ladi.
+    """
+
+    DATETIME_FIELDS = ('created_at', 'updated_at')
+
+    def _dumps(self, user: Dict) -> str:
+        return json.dumps({
+            key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in user.items()
+        })
+
+    def _loads(self, raw: str) -> Dict:
+        user = json.loads(raw)
+        for field in self.DATETIME_FIELDS:
+            if user.get(field):
+                user[field] = datetime.fromisoformat(user[field])
+        return user
+
 
-    _connection_pool = None
+class DatabaseManager:
+    """
+    PostgreSQL database bilan ishlash (asyncpg pool).
+
+    Barcha metodlar async - query paytida event loop bloklanmaydi, boshqa
+    foydalanuvchilarning update lari ham parallel ishlanadi. asyncpg har bir
+    connection da so'rovlarni prepared statement sifatida keshlaydi
+    (DB_POOL_CONFIG['statement_cache_size']).
+    """
+
+    _pool: Optional[asyncpg.Pool] = None
+    _health_task: Optional[asyncio.Task] = None
+    _partition_task: Optional[asyncio.Task] = None
+    _redis = None  # kesh uchun (USER_CACHE_REDIS)
+    user_cache = UserCache(
+        ttl=USER_CACHE_CONFIG['ttl'],
+        max_entries=USER_CACHE_CONFIG['max_entries'],
+        key_prefix=USER_CACHE_CONFIG['key_prefix'],
+    )
+    # Ro'yxatlar (kalit - "teachers:<student_id>" / "students:<teacher_id>")
+    roster_cache = LayeredCache(
+        ttl=ROSTER_CACHE_CONFIG['ttl'],
+        max_entries=ROSTER_CACHE_CONFIG['max_entries'],
+        key_prefix=ROSTER_CACHE_CONFIG['key_prefix'],
+    )
 
     @classmethod
-    def initialize(cls):
+    async def initialize(cls):
         """Database connection pool ni yaratish"""
         try:
-            if cls._connection_pool is None:
-                cls._connection_pool = psycopg2.pool.SimpleConnectionPool(
-                    1,  # min connections
-                    20,  # max connections
-                    **DB_CONFIG
-                )
+            if cls._pool is None:
+                cls._pool = await asyncpg.create_pool(**DB_CONFIG, **DB_POOL_CONFIG)
                 logger.info("✅ Database connection pool initialized")
-                cls._setup_tables()
+                await cls._setup_tables()
+                cls._health_task = asyncio.create_task(cls._health_check_loop())
+                if USER_CACHE_CONFIG['use_redis']:
+                    cls._redis = redis_async.Redis(**REDIS_CONFIG)
+                    cls.user_cache.redis = cls._redis
+                    cls.roster_cache.redis = cls._redis
         except Exception as e:
             logger.error(f"❌ Database connection failed: {e}")
             sys.exit(1)
 
     @classmethod
-    def _setup_tables(cls):
+    async def close(cls):
+        """Pool ni yopish (bot to'xtaganda)"""
+        if cls._health_task:
+            cls._health_task.cancel()
+            cls._health_task = None
+        if cls._partition_task:
+            cls._partition_task.cancel()
+            cls._partition_task = None
+        if cls._pool:
+            await cls._pool.close()
+            cls._pool = None
+        if cls._redis is not None:
+            await cls._redis.aclose()
+            cls._redis = cls.user_cache.redis = cls.roster_cache.redis = None
+
+    @classmethod
+    async def _setup_tables(cls):
         """Kerakli jadvallarni yaratish (agar mavjud bo'lmasa)"""
         queries = [
             # Bot users jadvali
@@ -147,247 +396,848 @@ class DatabaseManager:
             )
             """,
 
-            # Messages jadvali
+            # O'qilmagan xabarlar hisoblagichi: (qabul qiluvchi, yuboruvchi) -> soni.
+            # bot_messages bilan bitta statementda yangilanadi; rebuild_unread_counters() qayta hisoblaydi
             """
-            CREATE TABLE IF NOT EXISTS bot_messages (
-                id SERIAL PRIMARY KEY,
-                message_uid VARCHAR(100) UNIQUE NOT NULL,
-                sender_id BIGINT NOT NULL REFERENCES bot_users(telegram_id),
-                receiver_id BIGINT NOT NULL REFERENCES bot_users(telegram_id),
-                message_text TEXT,
-                message_type VARCHAR(20) DEFAULT 'text',
-                is_read BOOLEAN DEFAULT FALSE,
-                status VARCHAR(20) DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                read_at TIMESTAMP,
-                replied_at TIMESTAMP
+            CREATE TABLE IF NOT EXISTS bot_unread_counters (
+                receiver_id BIGINT NOT NULL,
+                sender_id BIGINT NOT NULL,
+                unread INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (receiver_id, sender_id)
             )
             """,
 
-            # Indexlar
+            # E'lonlar (broadcast)
             """
-            CREATE INDEX IF NOT EXISTS idx_messages_sender ON bot_messages(sender_id)
+            CREATE TABLE IF NOT EXISTS bot_broadcasts (
+                id SERIAL PRIMARY KEY,
+                created_by BIGINT NOT NULL,
+                target_type VARCHAR(20) NOT NULL CHECK (target_type IN ('group', 'course', 'role')),
+                target_id VARCHAR(50) NOT NULL,
+                target_label VARCHAR(255),
+                message_text TEXT NOT NULL,
+                status VARCHAR(20) DEFAULT 'draft' CHECK (status IN ('draft', 'running', 'done', 'cancelled')),
+                total_count INTEGER DEFAULT 0,
+                sent_count INTEGER DEFAULT 0,
+                failed_count INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP
+            )
             """,
             """
-            CREATE INDEX IF NOT EXISTS idx_messages_receiver ON bot_messages(receiver_id)
+            CREATE TABLE IF NOT EXISTS bot_broadcast_recipients (
+                id BIGSERIAL PRIMARY KEY,
+                broadcast_id INTEGER NOT NULL REFERENCES bot_broadcasts(id) ON DELETE CASCADE,
+                telegram_id BIGINT NOT NULL,
+                status VARCHAR(20) DEFAULT 'pending' CHECK (status IN ('pending', 'queued', 'sent', 'failed')),
+                error TEXT,
+                queued_at TIMESTAMP,
+                sent_at TIMESTAMP,
+                UNIQUE(broadcast_id, telegram_id)
+            )
             """,
+            # Navbatga qo'yilishi kerak bo'lganlar va "osilib qolgan"lar uchun kichik indexlar
             """
-            CREATE INDEX IF NOT EXISTS idx_messages_status ON bot_messages(status)
+            CREATE INDEX IF NOT EXISTS idx_broadcast_recipients_pending
+            ON bot_broadcast_recipients(broadcast_id, id) WHERE status = 'pending'
             """,
             """
-            CREATE INDEX IF NOT EXISTS idx_messages_created ON bot_messages(created_at DESC)
+            CREATE INDEX IF NOT EXISTS idx_broadcast_recipients_queued
+            ON bot_broadcast_recipients(queued_at) WHERE status = 'queued'
             """
         ]
 
-        conn = cls.get_connection()
-        cursor = conn.cursor()
         try:
-            for query in queries:
-                cursor.execute(query)
-            conn.commit()
+            async with cls._pool.acquire() as conn:
+                async with conn.transaction():
+                    # Bir vaqtda ishga tushgan workerlar jadvallarni (va bot_messages ko'chirishini)
+                    # navbat bilan tekshiradi - aks holda ikkinchisi yangi jadvalni ham "eski" deb qayta nomlaydi
+                    await conn.execute("SELECT pg_advisory_xact_lock($1)", cls.SETUP_LOCK_ID)
+                    for query in queries:
+                        await conn.execute(query)
+                    await cls._setup_messages_table(conn)
             logger.info("✅ Database tables created/verified")
         except Exception as e:
-            conn.rollback()
             logger.error(f"❌ Table creation failed: {e}")
             raise
-        finally:
-            cursor.close()
-            cls.return_connection(conn)
+
+    # ========== BOT_MESSAGES BO'LIMLARI ==========
+
+    # Bo'lim nomi: bot_messages_pYYYYMM (oyning 1-sanasidan keyingi oyning 1-sanasigacha)
+    PARTITION_PREFIX = 'bot_messages_p'
+    PARTITION_NAME_RE = '^bot_messages_p[0-9]{6}$'
+    PARTITION_LOCK_ID = 0x626F746D  # pg_advisory_lock - bir vaqtda bitta jarayon
+    # _setup_tables uchun alohida: startup uzoq davom etadigan arxivlashni kutmaydi
+    SETUP_LOCK_ID = PARTITION_LOCK_ID + 1
+
+    @staticmethod
+    def add_months(month: date, months: int) -> date:
+        """Oyning 1-sanasi + months oy"""
+        index = month.year * 12 + month.month - 1 + months
+        return date(index // 12, index % 12 + 1, 1)
+
+    @classmethod
+    def live_messages_since(cls) -> datetime:
+        """
+        Hali ulangan eng eski bo'lim boshi (retention_months). created_at >= shu chegara
+        bilan so'rov ajratilayotgan/eski bo'limlarning indexlariga kirmaydi (partition pruning).
+        retention_months = 0 - hamma bo'limlar ishlatiladi
+        """
+        retention_months = MESSAGE_PARTITION_CONFIG['retention_months']
+        if retention_months <= 0:
+            return datetime.min
+        this_month = date.today().replace(day=1)
+        return datetime.combine(cls.add_months(this_month, -retention_months), datetime.min.time())
+
+    @classmethod
+    async def _setup_messages_table(cls, conn):
+        """
+        bot_messages - created_at bo'yicha oylik partition. PRIMARY KEY va UNIQUE da
+        partition kaliti bo'lishi shart, shuning uchun (id, created_at) va (message_uid, created_at).
+        Eski (oddiy) jadval bo'lsa - bir marta shu tranzaksiyada ko'chiriladi.
+        """
+        legacy = await conn.fetchval(
+            "SELECT relkind = 'r' FROM pg_class WHERE oid = to_regclass('bot_messages')"
+        )
+        if legacy:
+            # Index/sequence nomlari schema bo'yicha yagona - yangi jadvalga bo'shatamiz
+            await conn.execute("""
+                ALTER TABLE bot_messages RENAME TO bot_messages_legacy;
+                ALTER TABLE bot_messages_legacy RENAME CONSTRAINT bot_messages_pkey TO bot_messages_legacy_pkey;
+                ALTER SEQUENCE IF EXISTS bot_messages_id_seq RENAME TO bot_messages_legacy_id_seq;
+                DROP INDEX IF EXISTS idx_messages_sender, idx_messages_receiver, idx_messages_status,
+                                     idx_messages_created, idx_messages_conversation, idx_messages_unread;
+            """)
+
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS bot_messages (
+                id SERIAL,
+                message_uid VARCHAR(100) NOT NULL,
+                sender_id BIGINT NOT NULL REFERENCES bot_users(telegram_id),
+                receiver_id BIGINT NOT NULL REFERENCES bot_users(telegram_id),
+                message_text TEXT,
+                message_type VARCHAR(20) DEFAULT 'text',
+                is_read BOOLEAN DEFAULT FALSE,
+                status VARCHAR(20) DEFAULT 'pending',
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                read_at TIMESTAMP,
+                replied_at TIMESTAMP,
+                -- Suhbat kaliti: "kichik_id:katta_id" - ikki tomonning xabarlari bitta kalitda
+                conversation_key VARCHAR(41) GENERATED ALWAYS AS (
+                    LEAST(sender_id, receiver_id)::text || ':' || GREATEST(sender_id, receiver_id)::text
+                ) STORED,
+                PRIMARY KEY (id, created_at),
+                UNIQUE (message_uid, created_at)
+            ) PARTITION BY RANGE (created_at)
+        """)
+        # Faqat so'rovlar ishlatadigan ikkita index (har bir bo'limda alohida yaratiladi):
+        # keyset pagination - (created_at, id) < kursor, teskari tartibda;
+        # o'qilmagan xabarlar - faqat kichik qism indexlanadi
+        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_messages_conversation
+            ON bot_messages(conversation_key, created_at DESC, id DESC);
+            CREATE INDEX IF NOT EXISTS idx_messages_unread
+            ON bot_messages(receiver_id, created_at DESC) WHERE is_read = FALSE AND status = 'pending';
+        """)
+
+        this_month = date.today().replace(day=1)
+        first_month = this_month
+        if legacy:
+            oldest = await conn.fetchval("SELECT MIN(created_at) FROM bot_messages_legacy")
+            if oldest is not None:
+                first_month = min(first_month, oldest.date().replace(day=1))
+        await cls._create_message_partitions(
+            conn, first_month, cls.add_months(this_month, MESSAGE_PARTITION_CONFIG['months_ahead'])
+        )
+
+        if legacy:
+            status = await conn.execute("""
+                INSERT INTO bot_messages (id, message_uid, sender_id, receiver_id, message_text, message_type,
+                                          is_read, status, created_at, read_at, replied_at)
+                SELECT id, message_uid, sender_id, receiver_id, message_text, message_type,
+                       is_read, status, COALESCE(created_at, CURRENT_TIMESTAMP), read_at, replied_at
+                FROM bot_messages_legacy
+            """)
+            await conn.execute("""
+                SELECT setval(pg_get_serial_sequence('bot_messages', 'id'), MAX(id))
+                FROM bot_messages HAVING MAX(id) IS NOT NULL
+            """)
+            await conn.execute("DROP TABLE bot_messages_legacy")
+            logger.info(f"✅ bot_messages partitioned: {status.split()[-1]} rows moved")
 
     @classmethod
-    def get_connection(cls):
-        """Connection pool dan connection olish"""
-        if cls._connection_pool is None:
-            cls.initialize()
-        return cls._connection_pool.getconn()
+    async def _create_message_partitions(cls, conn, first_month: date, last_month: date):
+        """first_month..last_month oylari uchun bo'limlar (mavjudlari o'tkazib yuboriladi)"""
+        month = first_month
+        while month <= last_month:
+            next_month = cls.add_months(month, 1)
+            await conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {cls.PARTITION_PREFIX}{month:%Y%m} PARTITION OF bot_messages
+                FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')
+            """)
+            month = next_month
 
     @classmethod
-    def return_connection(cls, connection):
-        """Connection ni pool ga qaytarish"""
-        cls._connection_pool.putconn(connection)
+    async def maintain_message_partitions(cls) -> Dict[str, int]:
+        """
+        Oldindan bo'limlar yaratish, retention_months dan eskilarini ajratish (DETACH)
+        va archive_dir ga .csv.gz qilib yozib o'chirish.
+        Arxivlash to'xtab qolsa ham ajratilgan jadval keyingi safar qayta arxivlanadi.
+        """
+        config = MESSAGE_PARTITION_CONFIG
+        this_month = date.today().replace(day=1)
+        result = {'detached': 0, 'archived': 0}
+
+        async with cls._pool.acquire() as conn:
+            if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", cls.PARTITION_LOCK_ID):
+                return result
+            try:
+                async with conn.transaction():
+                    await cls._create_message_partitions(
+                        conn, this_month, cls.add_months(this_month, config['months_ahead'])
+                    )
+
+                if config['retention_months'] > 0:
+                    cutoff = f"{cls.PARTITION_PREFIX}{cls.add_months(this_month, -config['retention_months']):%Y%m}"
+                    attached = await conn.fetch(
+                        """
+                        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                        WHERE i.inhparent = 'bot_messages'::regclass AND c.relname ~ $1
+                        ORDER BY c.relname
+                        """,
+                        cls.PARTITION_NAME_RE
+                    )
+                    for row in attached:
+                        if row['relname'] >= cutoff:
+                            break
+                        async with conn.transaction():
+                            await conn.execute(f"SET LOCAL lock_timeout = '{config['lock_timeout']}'")
+                            await conn.execute(f"ALTER TABLE bot_messages DETACH PARTITION {row['relname']}")
+                        result['detached'] += 1
+                        logger.info(f"📦 Partition detached: {row['relname']}")
+
+                if config['archive_dir']:
+                    detached = await conn.fetch(
+                        """
+                        SELECT relname FROM pg_class
+                        WHERE relnamespace = current_schema()::regnamespace
+                          AND relkind = 'r' AND NOT relispartition AND relname ~ $1
+                        ORDER BY relname
+                        """,
+                        cls.PARTITION_NAME_RE
+                    )
+                    for row in detached:
+                        await cls._archive_partition(conn, row['relname'], config['archive_dir'])
+                        result['archived'] += 1
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock($1)", cls.PARTITION_LOCK_ID)
+
+        if result['detached']:
+            # Ajratilgan bo'limlardagi o'qilmagan xabarlar hisoblagichdan chiqadi
+            await cls.rebuild_unread_counters()
+        return result
+
+    @staticmethod
+    async def _archive_partition(conn, table: str, archive_dir: str):
+        """Ajratilgan bo'limni <archive_dir>/<table>.csv.gz ga yozib, jadvalni o'chirish"""
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(archive_dir, f"{table}.csv.gz")
+        # Yarim yozilgan fayl arxiv deb hisoblanmasin
+        with gzip.open(f"{path}.part", 'wb') as archive:
+            await conn.copy_from_table(table, output=archive, format='csv', header=True)
+        os.replace(f"{path}.part", path)
+        await conn.execute(f"DROP TABLE {table}")
+        logger.info(f"📦 Partition archived: {table} -> {path}")
+
+    @classmethod
+    def start_partition_maintenance(cls):
+        """Bo'limlarni har check_interval da tekshirish (bitta jarayonda ishga tushiriladi)"""
+        if cls._partition_task is None:
+            cls._partition_task = asyncio.create_task(cls._partition_maintenance_loop())
+
+    @classmethod
+    async def _partition_maintenance_loop(cls):
+        while True:
+            try:
+                await cls.maintain_message_partitions()
+            except Exception as e:
+                logger.error(f"❌ Partition maintenance failed: {e}")
+            await asyncio.sleep(MESSAGE_PARTITION_CONFIG['check_interval'])
 
     @classmethod
-    def execute_query(cls, query: str, params: tuple = None, fetch_one: bool = False, fetch_all: bool = False):
-        """Query ni execute qilish"""
-        conn = None
-        cursor = None
+    async def health_check(cls) -> bool:
+        """Database javob beryaptimi (SELECT 1)"""
         try:
-            conn = cls.get_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            return await cls._pool.fetchval("SELECT 1", timeout=DB_HEALTH_CHECK_TIMEOUT) == 1
+        except Exception as e:
+            logger.warning(f"⚠️ Database health check failed: {e}")
+            return False
+
+    @classmethod
+    async def _health_check_loop(cls):
+        """Har DB_HEALTH_CHECK_INTERVAL sekundda tekshirish; uzilgan connectionlarni pool o'zi almashtiradi"""
+        while True:
+            await asyncio.sleep(DB_HEALTH_CHECK_INTERVAL)
+            if not await cls.health_check():
+                await cls._pool.expire_connections()
 
-            cursor.execute(query, params or ())
+    @classmethod
+    async def execute_query(cls, query: str, params: tuple = None, fetch_one: bool = False, fetch_all: bool = False):
+        """Query ni execute qilish ($1, $2 ... parametrlar bilan)"""
+        if cls._pool is None:
+            await cls.initialize()
 
+        try:
             if fetch_one:
-                result = cursor.fetchone()
-            elif fetch_all:
-                result = cursor.fetchall()
-            else:
-                conn.commit()
-                result = cursor.rowcount
+                row = await cls._pool.fetchrow(query, *(params or ()))
+                return dict(row) if row else None
+            if fetch_all:
+                rows = await cls._pool.fetch(query, *(params or ()))
+                return [dict(row) for row in rows]
 
-            return result
+            status = await cls._pool.execute(query, *(params or ()))
+            # "UPDATE 3" -> 3
+            return int(status.split()[-1]) if status.split()[-1].isdigit() else 0
 
         except Exception as e:
-            if conn:
-                conn.rollback()
             logger.error(f"❌ Query error: {e}\nQuery: {query[:100]}")
             raise
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                cls.return_connection(conn)
 
     # ========== USER OPERATIONS ==========
 
     @classmethod
-    def get_or_create_user(cls, telegram_id: int, full_name: str, username: str = None) -> Dict:
-        """User ni topish yoki yaratish"""
-        query = "SELECT * FROM bot_users WHERE telegram_id = %s"
-        user = cls.execute_query(query, (telegram_id,), fetch_one=True)
+    async def get_or_create_user(cls, telegram_id: int, full_name: str, username: str = None) -> Dict:
+        """User ni topish yoki yaratish (ism/username o'zgarmagan bo'lsa - bazaga yozilmaydi)"""
+        user = await cls.get_user(telegram_id)
 
         if user:
             if user['full_name'] != full_name or user['username'] != username:
                 query = """
                 UPDATE bot_users 
-                SET full_name = %s, username = %s, updated_at = CURRENT_TIMESTAMP
-                WHERE telegram_id = %s
+                SET full_name = $1, username = $2, updated_at = CURRENT_TIMESTAMP
+                WHERE telegram_id = $3
                 RETURNING *
                 """
-                user = cls.execute_query(query, (full_name, username, telegram_id), fetch_one=True)
+                user = await cls.execute_query(query, (full_name, username, telegram_id), fetch_one=True)
+                await cls._cache_user(telegram_id, user)
             return user
 
+        # Parallel /start bo'lsa ham bitta qator
         query = """
         INSERT INTO bot_users (telegram_id, full_name, username)
-        VALUES (%s, %s, %s)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (telegram_id)
+        DO UPDATE SET full_name = EXCLUDED.full_name, username = EXCLUDED.username,
+                      updated_at = CURRENT_TIMESTAMP
         RETURNING *
         """
-        return cls.execute_query(query, (telegram_id, full_name, username), fetch_one=True)
+        user = await cls.execute_query(query, (telegram_id, full_name, username), fetch_one=True)
+        await cls._cache_user(telegram_id, user)
+        return user
 
     @classmethod
-    def update_user_role(cls, telegram_id: int, role: str) -> Dict:
+    async def update_user_role(cls, telegram_id: int, role: str) -> Dict:
         """User role ni yangilash"""
         query = """
         UPDATE bot_users 
-        SET role = %s, updated_at = CURRENT_TIMESTAMP
-        WHERE telegram_id = %s
+        SET role = $1, updated_at = CURRENT_TIMESTAMP
+        WHERE telegram_id = $2
         RETURNING *
         """
-        return cls.execute_query(query, (role, telegram_id), fetch_one=True)
+        user = await cls.execute_query(query, (role, telegram_id), fetch_one=True)
+        await cls._cache_user(telegram_id, user)
+        return user
 
     @classmethod
-    def get_user(cls, telegram_id: int) -> Dict:
-        """User ni ID bo'yicha olish"""
-        query = "SELECT * FROM bot_users WHERE telegram_id = %s"
-        return cls.execute_query(query, (telegram_id,), fetch_one=True)
+    async def get_user(cls, telegram_id: int) -> Dict:
+        """User ni ID bo'yicha olish (avval keshdan)"""
+        user = await cls.user_cache.get(telegram_id)
+        if user is not None:
+            return user
+
+        query = "SELECT * FROM bot_users WHERE telegram_id = $1"
+        user = await cls.execute_query(query, (telegram_id,), fetch_one=True)
+        if user:
+            await cls.user_cache.set(user['telegram_id'], user)
+        return user
 
     @classmethod
-    def get_teachers_for_student(cls, student_id: int) -> List[Dict]:
-        """Talabaning ustozlarini olish"""
-        query = """
-        SELECT u.*, st.subject
-        FROM bot_users u
-        JOIN student_teacher st ON u.telegram_id = st.teacher_id
-        WHERE st.student_id = %s AND st.is_active = TRUE
-        ORDER BY u.full_name
-        """
-        return cls.execute_query(query, (student_id,), fetch_all=True)
+    async def _cache_user(cls, telegram_id: int, user: Optional[Dict]) -> None:
+        """Yozuvdan keyin keshni yangilash (qator topilmagan bo'lsa - eskisini o'chirish)"""
+        if user:
+            await cls.user_cache.set(user['telegram_id'], user)
+        else:
+            await cls.user_cache.delete(telegram_id)
 
     @classmethod
-    def get_students_for_teacher(cls, teacher_id: int) -> List[Dict]:
-        """Ustozning talabalarini olish"""
-        query = """
-        SELECT u.*, st.subject
-        FROM bot_users u
-        JOIN student_teacher st ON u.telegram_id = st.student_id
-        WHERE st.teacher_id = %s AND st.is_active = TRUE
-        ORDER BY u.full_name
-        """
-        return cls.execute_query(query, (teacher_id,), fetch_all=True)
+    async def get_teachers_for_student(cls, student_id: int) -> List[Dict]:
+        """Talabaning ustozlari (keshdan)"""
+        key = f"teachers:{student_id}"
+        teachers = await cls.roster_cache.get(key)
+        if teachers is None:
+            query = """
+            SELECT u.telegram_id, u.full_name, u.username, u.role, st.subject
+            FROM bot_users u
+            JOIN student_teacher st ON u.telegram_id = st.teacher_id
+            WHERE st.student_id = $1 AND st.is_active = TRUE
+            ORDER BY u.full_name
+            """
+            teachers = await cls.execute_query(query, (student_id,), fetch_all=True)
+            await cls.roster_cache.set(key, teachers)
+        return teachers
 
     @classmethod
-    def assign_student_to_teacher(cls, student_id: int, teacher_id: int, subject: str = None) -> Dict:
+    async def get_students_for_teacher(cls, teacher_id: int) -> List[Dict]:
+        """Ustozning talabalari (keshdan)"""
+        key = f"students:{teacher_id}"
+        students = await cls.roster_cache.get(key)
+        if students is None:
+            query = """
+            SELECT u.telegram_id, u.full_name, u.username, u.role, st.subject
+            FROM bot_users u
+            JOIN student_teacher st ON u.telegram_id = st.student_id
+            WHERE st.teacher_id = $1 AND st.is_active = TRUE
+            ORDER BY u.full_name
+            """
+            students = await cls.execute_query(query, (teacher_id,), fetch_all=True)
+            await cls.roster_cache.set(key, students)
+        return students
+
+    @classmethod
+    async def assign_student_to_teacher(cls, student_id: int, teacher_id: int, subject: str = None) -> Dict:
         """Talabani ustozga bog'lash"""
         query = """
         INSERT INTO student_teacher (student_id, teacher_id, subject)
-        VALUES (%s, %s, %s)
+        VALUES ($1, $2, $3)
         ON CONFLICT (student_id, teacher_id, subject) 
         DO UPDATE SET is_active = TRUE, assigned_at = CURRENT_TIMESTAMP
         RETURNING *
         """
-        return cls.execute_query(query, (student_id, teacher_id, subject), fetch_one=True)
+        assignment = await cls.execute_query(query, (student_id, teacher_id, subject), fetch_one=True)
+        await cls.roster_cache.delete(f"teachers:{student_id}")
+        await cls.roster_cache.delete(f"students:{teacher_id}")
+        return assignment
 
     # ========== MESSAGE OPERATIONS ==========
 
     @classmethod
-    def save_message(cls, sender_id: int, receiver_id: int, message_text: str, message_type: str = 'text') -> Dict:
+    async def save_message(cls, sender_id: int, receiver_id: int, message_text: str, message_type: str = 'text') -> Dict:
         """Xabarni saqlash"""
         message_uid = f"msg_{sender_id}_{receiver_id}_{datetime.now().timestamp()}"
 
+        # Xabar va hisoblagich bitta statementda
         query = """
-        INSERT INTO bot_messages (message_uid, sender_id, receiver_id, message_text, message_type)
-        VALUES (%s, %s, %s, %s, %s)
-        RETURNING *
+        WITH m AS (
+            INSERT INTO bot_messages (message_uid, sender_id, receiver_id, message_text, message_type)
+            VALUES ($1, $2, $3, $4, $5)
+            RETURNING *
+        ), counter AS (
+            INSERT INTO bot_unread_counters (receiver_id, sender_id, unread)
+            SELECT receiver_id, sender_id, 1 FROM m
+            ON CONFLICT (receiver_id, sender_id) DO UPDATE SET unread = bot_unread_counters.unread + 1
+        )
+        SELECT * FROM m
         """
-        return cls.execute_query(query, (message_uid, sender_id, receiver_id, message_text, message_type),
-                                 fetch_one=True)
+        return await cls.execute_query(query, (message_uid, sender_id, receiver_id, message_text, message_type),
+                                       fetch_one=True)
+
+    @staticmethod
+    def conversation_key(user1_id: int, user2_id: int) -> str:
+        """bot_messages.conversation_key bilan bir xil"""
+        return f"{min(user1_id, user2_id)}:{max(user1_id, user2_id)}"
 
     @classmethod
-    def get_chat_messages(cls, user1_id: int, user2_id: int, limit: int = 50) -> List[Dict]:
-        """Ikki user orasidagi xabarlarni olish"""
-        query = """
+    async def get_chat_messages(cls, user1_id: int, user2_id: int, limit: int = 50,
+                                before: Tuple[datetime, int] = None,
+                                after: Tuple[datetime, int] = None) -> List[Dict]:
+        """
+        Ikki user orasidagi xabarlar (eskidan yangiga).
+        before/after - kursor (created_at, id): bo'lmasa - oxirgi limit ta; before - shu xabardan
+        eskilari, after - shu xabardan yangilari. Chuqurlikdan qat'i nazar bitta index oralig'i o'qiladi.
+        Kursor callback_data da keladi, shuning uchun created_at chegarasi parametr - kursordan
+        keyingi/oldingi oylar bo'limlari kesib tashlanadi (kursor xabarini id bo'yicha qidirish yo'q);
+        kursorsiz - eng yangi bo'limdan boshlab LIMIT gacha.
+        """
+        params = [cls.conversation_key(user1_id, user2_id), limit]
+        cursor_filter = ""
+        order = "DESC"
+        if before is not None:
+            params.extend(before)
+            cursor_filter = "AND m.created_at <= $3 AND (m.created_at, m.id) < ($3, $4)"
+        elif after is not None:
+            params.extend(after)
+            cursor_filter = "AND m.created_at >= $3 AND (m.created_at, m.id) > ($3, $4)"
+            order = "ASC"
+
+        query = f"""
         SELECT m.*, 
                sender.full_name as sender_name,
                receiver.full_name as receiver_name
         FROM bot_messages m
         JOIN bot_users sender ON m.sender_id = sender.telegram_id
         JOIN bot_users receiver ON m.receiver_id = receiver.telegram_id
-        WHERE (m.sender_id = %s AND m.receiver_id = %s)
-           OR (m.sender_id = %s AND m.receiver_id = %s)
-        ORDER BY m.created_at ASC
-        LIMIT %s
+        WHERE m.conversation_key = $1 {cursor_filter}
+        ORDER BY m.created_at {order}, m.id {order}
+        LIMIT $2
         """
-        return cls.execute_query(query, (user1_id, user2_id, user2_id, user1_id, limit), fetch_all=True)
+        messages = await cls.execute_query(query, tuple(params), fetch_all=True)
+        if not messages and before is not None and before[0] < cls.live_messages_since():
+            # Kursordan eskilari arxivlangan bo'limlarda - oxirgi sahifa
+            return await cls.get_chat_messages(user1_id, user2_id, limit)
+        if order == "DESC":
+            messages.reverse()
+        return messages
 
     @classmethod
-    def get_unread_messages_for_teacher(cls, teacher_id: int) -> List[Dict]:
-        """Ustozga kelgan o'qilmagan xabarlar"""
+    async def get_unread_messages_for_teacher(cls, teacher_id: int, limit: int = None) -> List[Dict]:
+        """
+        Ustozga kelgan o'qilmagan xabarlar (yangidan eskiga, limit - faqat oxirgilari).
+        Bo'limlar eng yangisidan boshlab o'qiladi va LIMIT to'lganda to'xtaydi;
+        ulangan eng eski bo'limdan eskilari (live_messages_since) rejadan chiqariladi
+        """
         query = """
         SELECT m.*, u.full_name as sender_name
         FROM bot_messages m
         JOIN bot_users u ON m.sender_id = u.telegram_id
-        WHERE m.receiver_id = %s 
+        WHERE m.receiver_id = $1 
           AND m.is_read = FALSE
           AND m.status = 'pending'
+          AND m.created_at >= $3
         ORDER BY m.created_at DESC
+        LIMIT $2
         """
-        return cls.execute_query(query, (teacher_id,), fetch_all=True)
+        return await cls.execute_query(query, (teacher_id, limit, cls.live_messages_since()), fetch_all=True)
 
     @classmethod
-    def mark_message_as_read(cls, message_id: int) -> None:
-        """Xabarni o'qilgan deb belgilash"""
+    async def count_unread_messages(cls, receiver_id: int) -> int:
+        """O'qilmagan xabarlar soni (hisoblagichlardan)"""
+        return sum((await cls.get_unread_counters(receiver_id)).values())
+
+    @classmethod
+    async def get_unread_counters(cls, receiver_id: int) -> Dict[int, int]:
+        """Yuboruvchi bo'yicha o'qilmaganlar: {sender_id: soni} (primary key bo'yicha bitta so'rov)"""
         query = """
-        UPDATE bot_messages 
-        SET is_read = TRUE, read_at = CURRENT_TIMESTAMP
-        WHERE id = %s
+        SELECT sender_id, unread
+        FROM bot_unread_counters
+        WHERE receiver_id = $1 AND unread > 0
+        """
+        rows = await cls.execute_query(query, (receiver_id,), fetch_all=True)
+        return {row['sender_id']: row['unread'] for row in rows}
+
+    # Hisoblagichdan chiqadigan xabarlar (is_read = FALSE AND status = 'pending' bo'lganlar) ni ayirish.
+    # changed CTE: o'zgargan xabarlar, was_counted - o'zgarishdan oldin hisoblanganmi
+    DECREMENT_COUNTERS_SQL = """
+        counter AS (
+            UPDATE bot_unread_counters c
+            SET unread = GREATEST(c.unread - d.n, 0)
+            FROM (
+                SELECT receiver_id, sender_id, COUNT(*) AS n
+                FROM changed WHERE was_counted
+                GROUP BY receiver_id, sender_id
+            ) d
+            WHERE c.receiver_id = d.receiver_id AND c.sender_id = d.sender_id
+        )
+        SELECT COUNT(*) AS count FROM changed
+    """
+
+    @classmethod
+    async def mark_read(cls, message_ids: List[int], since: datetime = None) -> int:
+        """
+        Bir nechta xabarni bitta UPDATE da o'qilgan deb belgilash.
+        since - xabarlarning eng eski created_at i (ma'lum bo'lsa): undan eski bo'limlar o'qilmaydi
+        """
+        if not message_ids:
+            return 0
+        query = f"""
+        WITH changed AS (
+            UPDATE bot_messages 
+            SET is_read = TRUE, read_at = CURRENT_TIMESTAMP
+            WHERE id = ANY($1::int[]) AND created_at >= $2 AND is_read = FALSE
+            RETURNING receiver_id, sender_id, status = 'pending' AS was_counted
+        ), {cls.DECREMENT_COUNTERS_SQL}
+        """
+        row = await cls.execute_query(
+            query, (list(message_ids), since or cls.live_messages_since()), fetch_one=True
+        )
+        return row['count']
+
+    @classmethod
+    async def mark_conversation_read(cls, reader_id: int, other_id: int) -> int:
+        """other_id dan reader_id ga kelgan barcha o'qilmagan xabarlar (suhbat ochilganda, ulangan bo'limlarda)"""
+        query = f"""
+        WITH changed AS (
+            UPDATE bot_messages 
+            SET is_read = TRUE, read_at = CURRENT_TIMESTAMP
+            WHERE conversation_key = $1 AND receiver_id = $2 AND created_at >= $3 AND is_read = FALSE
+            RETURNING receiver_id, sender_id, status = 'pending' AS was_counted
+        ), {cls.DECREMENT_COUNTERS_SQL}
+        """
+        row = await cls.execute_query(
+            query, (cls.conversation_key(reader_id, other_id), reader_id, cls.live_messages_since()), fetch_one=True
+        )
+        return row['count']
+
+    @classmethod
+    async def mark_replied(cls, message_ids: List[int], since: datetime = None) -> int:
+        """Bir nechta xabarga javob berilgan deb belgilash (since - mark_read dagi kabi)"""
+        if not message_ids:
+            return 0
+        query = f"""
+        WITH changed AS (
+            UPDATE bot_messages m
+            SET status = 'replied', replied_at = CURRENT_TIMESTAMP
+            FROM (
+                SELECT id, status = 'pending' AND is_read = FALSE AS was_counted
+                FROM bot_messages
+                WHERE id = ANY($1::int[]) AND created_at >= $2 AND status <> 'replied'
+                FOR UPDATE
+            ) old
+            WHERE m.id = old.id AND m.created_at >= $2
+            RETURNING m.receiver_id, m.sender_id, old.was_counted
+        ), {cls.DECREMENT_COUNTERS_SQL}
+        """
+        row = await cls.execute_query(
+            query, (list(message_ids), since or cls.live_messages_since()), fetch_one=True
+        )
+        return row['count']
+
+    @classmethod
+    async def rebuild_unread_counters(cls) -> int:
+        """
+        Hisoblagichlarni bot_messages dan qayta qurish (qo'lda o'zgartirish/nosozlikdan keyin).
+        EXCLUSIVE lock davomida parallel xabar yozuvlari hisoblagich qismida kutadi va
+        qayta qurilgan qiymat ustiga qo'shiladi - hech narsa yo'qolmaydi.
         """
-        cls.execute_query(query, (message_id,))
+        async with cls._pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("LOCK TABLE bot_unread_counters IN EXCLUSIVE MODE")
+                await conn.execute("DELETE FROM bot_unread_counters")
+                status = await conn.execute(
+                    """
+                    INSERT INTO bot_unread_counters (receiver_id, sender_id, unread)
+                    SELECT receiver_id, sender_id, COUNT(*)
+                    FROM bot_messages
+                    WHERE is_read = FALSE AND status = 'pending'
+                    GROUP BY receiver_id, sender_id
+                    """
+                )
+        rows = int(status.split()[-1])
+        logger.info(f"✅ Unread counters rebuilt: {rows} rows")
+        return rows
+
+    @classmethod
+    async def mark_message_as_read(cls, message_id: int, created_at: datetime = None) -> None:
+        """Xabarni o'qilgan deb belgilash"""
+        await cls.mark_read([message_id], since=created_at)
 
     @classmethod
-    def mark_message_as_replied(cls, message_id: int) -> None:
+    async def mark_message_as_replied(cls, message_id: int, created_at: datetime = None) -> None:
         """Xabarga javob berilgan deb belgilash"""
+        await cls.mark_replied([message_id], since=created_at)
+
+    @classmethod
+    async def get_message_by_id(cls, message_id: int) -> Dict:
+        """Xabarni ID bo'yicha olish"""
+        query = "SELECT * FROM bot_messages WHERE id = $1"
+        return await cls.execute_query(query, (message_id,), fetch_one=True)
+
+    # ========== BROADCAST OPERATIONS ==========
+
+    # Qabul qiluvchilar Django jadvallaridan: students_student.user -> authentication_customuser.telegram_id
+    BROADCAST_RECIPIENT_QUERIES = {
+        'group': """
+            SELECT DISTINCT $1::int, u.telegram_id
+            FROM students_student s
+            JOIN authentication_customuser u ON u.id = s.user_id
+            WHERE s.assigned_group_id = $2::bigint
+              AND NOT s.is_archived AND u.is_active AND u.telegram_id IS NOT NULL
+        """,
+        'course': """
+            SELECT DISTINCT $1::int, u.telegram_id
+            FROM students_student s
+            JOIN authentication_customuser u ON u.id = s.user_id
+            LEFT JOIN course_group g ON g.id = s.assigned_group_id
+            WHERE (s.assigned_course_id = $2::bigint OR g.course_id = $2::bigint)
+              AND NOT s.is_archived AND u.is_active AND u.telegram_id IS NOT NULL
+        """,
+        'role': """
+            SELECT $1::int, u.telegram_id
+            FROM authentication_customuser u
+            WHERE u.role = $2 AND u.is_active AND u.telegram_id IS NOT NULL
+        """,
+    }
+
+    @classmethod
+    async def create_broadcast(cls, created_by: int, target_type: str, target_id: str, target_label: str,
+                               message_text: str) -> Dict:
+        """E'lon qoralamasi + qabul qiluvchilar ro'yxati (bitta INSERT ... SELECT)"""
+        async with cls._pool.acquire() as conn:
+            async with conn.transaction():
+                broadcast = await conn.fetchrow(
+                    """
+                    INSERT INTO bot_broadcasts (created_by, target_type, target_id, target_label, message_text)
+                    VALUES ($1, $2, $3, $4, $5)
+                    RETURNING *
+                    """,
+                    created_by, target_type, str(target_id), target_label, message_text
+                )
+                status = await conn.execute(
+                    f"""
+                    INSERT INTO bot_broadcast_recipients (broadcast_id, telegram_id)
+                    {cls.BROADCAST_RECIPIENT_QUERIES[target_type]}
+                    ON CONFLICT DO NOTHING
+                    """,
+                    broadcast['id'], target_id
+                )
+                total = int(status.split()[-1])
+                return dict(await conn.fetchrow(
+                    "UPDATE bot_broadcasts SET total_count = $1 WHERE id = $2 RETURNING *",
+                    total, broadcast['id']
+                ))
+
+    @classmethod
+    async def start_broadcast(cls, broadcast_id: int) -> Optional[Dict]:
+        """Qoralamani yuborishga qo'yish (bo'sh bo'lsa darhol tugaydi)"""
+        query = """
+        UPDATE bot_broadcasts
+        SET status = CASE WHEN total_count = 0 THEN 'done' ELSE 'running' END,
+            started_at = CURRENT_TIMESTAMP,
+            finished_at = CASE WHEN total_count = 0 THEN CURRENT_TIMESTAMP END
+        WHERE id = $1 AND status = 'draft'
+        RETURNING *
+        """
+        return await cls.execute_query(query, (broadcast_id,), fetch_one=True)
+
+    @classmethod
+    async def cancel_broadcast(cls, broadcast_id: int) -> Optional[Dict]:
+        """Hali navbatga qo'yilmaganlar yuborilmaydi"""
         query = """
-        UPDATE bot_messages 
-        SET status = 'replied', replied_at = CURRENT_TIMESTAMP
-        WHERE id = %s
+        UPDATE bot_broadcasts
+        SET status = 'cancelled', finished_at = CURRENT_TIMESTAMP
+        WHERE id = $1 AND status IN ('draft', 'running')
+        RETURNING *
         """
-        cls.execute_query(query, (message_id,))
+        return await cls.execute_query(query, (broadcast_id,), fetch_one=True)
 
     @classmethod
-    def get_message_by_id(cls, message_id: int) -> Dict:
-        """Xabarni ID bo'yicha olish"""
-        query = "SELECT * FROM bot_messages WHERE id = %s"
-        return cls.execute_query(query, (message_id,), fetch_one=True)
+    async def get_broadcast(cls, broadcast_id: int) -> Optional[Dict]:
+        query = "SELECT * FROM bot_broadcasts WHERE id = $1"
+        return await cls.execute_query(query, (broadcast_id,), fetch_one=True)
+
+    @classmethod
+    async def get_recent_broadcasts(cls, limit: int = 5) -> List[Dict]:
+        query = "SELECT * FROM bot_broadcasts ORDER BY id DESC LIMIT $1"
+        return await cls.execute_query(query, (limit,), fetch_all=True)
+
+    @classmethod
+    async def claim_broadcast_recipients(cls, shard: int, shards: int, limit: int) -> List[Dict]:
+        """
+        Shu shard (telegram_id % shards) ga tegishli navbatdagi qabul qiluvchilarni 'queued' qilish.
+        SKIP LOCKED - bir nechta jarayon bir xil qatorni olmaydi.
+        """
+        query = """
+        UPDATE bot_broadcast_recipients r
+        SET status = 'queued', queued_at = CURRENT_TIMESTAMP
+        WHERE r.id IN (
+            SELECT pr.id
+            FROM bot_broadcast_recipients pr
+            JOIN bot_broadcasts b ON b.id = pr.broadcast_id
+            WHERE b.status = 'running' AND pr.status = 'pending' AND abs(pr.telegram_id) % $1 = $2
+            ORDER BY pr.broadcast_id, pr.id
+            LIMIT $3
+            FOR UPDATE OF pr SKIP LOCKED
+        )
+        RETURNING r.id, r.broadcast_id, r.telegram_id
+        """
+        return await cls.execute_query(query, (shards, shard, limit), fetch_all=True)
+
+    @classmethod
+    async def save_broadcast_results(cls, results: List[Tuple[int, str, Optional[str]]]) -> None:
+        """
+        Yetkazish natijalarini bitta tranzaksiyada yozish: (recipient_id, 'sent'/'failed', xato).
+        Faqat 'queued' qatorlar yangilanadi - takroriy natija hisoblagichlarni buzmaydi.
+        """
+        async with cls._pool.acquire() as conn:
+            async with conn.transaction():
+                updated = await conn.fetch(
+                    """
+                    UPDATE bot_broadcast_recipients r
+                    SET status = v.status, error = v.error,
+                        sent_at = CASE WHEN v.status = 'sent' THEN CURRENT_TIMESTAMP END
+                    FROM unnest($1::bigint[], $2::text[], $3::text[]) AS v(id, status, error)
+                    WHERE r.id = v.id AND r.status = 'queued'
+                    RETURNING r.broadcast_id, r.status
+                    """,
+                    [result[0] for result in results],
+                    [result[1] for result in results],
+                    [result[2] for result in results]
+                )
+
+                counts: Dict[int, List[int]] = {}
+                for row in updated:
+                    counter = counts.setdefault(row['broadcast_id'], [0, 0])
+                    counter[0 if row['status'] == 'sent' else 1] += 1
+                if not counts:
+                    return
+
+                await conn.execute(
+                    """
+                    UPDATE bot_broadcasts b
+                    SET sent_count = b.sent_count + v.sent, failed_count = b.failed_count + v.failed,
+                        status = CASE WHEN b.status = 'running'
+                                       AND b.sent_count + v.sent + b.failed_count + v.failed >= b.total_count
+                                      THEN 'done' ELSE b.status END,
+                        finished_at = CASE WHEN b.status = 'running'
+                                            AND b.sent_count + v.sent + b.failed_count + v.failed >= b.total_count
+                                           THEN CURRENT_TIMESTAMP ELSE b.finished_at END
+                    FROM unnest($1::int[], $2::int[], $3::int[]) AS v(id, sent, failed)
+                    WHERE b.id = v.id
+                    """,
+                    list(counts), [counter[0] for counter in counts.values()],
+                    [counter[1] for counter in counts.values()]
+                )
+
+    @classmethod
+    async def requeue_stale_broadcast_recipients(cls, older_than_seconds: float) -> int:
+        """
+        Navbatga qo'yilgan, lekin natijasi kelmagan qatorlar (jarayon o'chib qolgan) qayta yuboriladi.
+        Natija yozilmay qolgan oxirgi xabarlar ikki marta borishi mumkin (at-least-once).
+        """
+        query = """
+        UPDATE bot_broadcast_recipients r
+        SET status = 'pending', queued_at = NULL
+        FROM bot_broadcasts b
+        WHERE b.id = r.broadcast_id AND b.status = 'running'
+          AND r.status = 'queued' AND r.queued_at < CURRENT_TIMESTAMP - make_interval(secs => $1)
+        """
+        return await cls.execute_query(query, (older_than_seconds,))
+
+    @classmethod
+    async def get_broadcast_groups(cls) -> List[Dict]:
+        """E'lon uchun guruhlar (course.Group), keshdan"""
+        groups = await cls.roster_cache.get('groups')
+        if groups is None:
+            query = """
+            SELECT g.id, g.name || ' (' || c.name || ')' AS full_name
+            FROM course_group g
+            JOIN course_course c ON c.id = g.course_id
+            WHERE g.is_active
+            ORDER BY c.name, g.name
+            """
+            groups = await cls.execute_query(query, fetch_all=True)
+            await cls.roster_cache.set('groups', groups)
+        return groups
+
+    @classmethod
+    async def get_broadcast_courses(cls) -> List[Dict]:
+        """E'lon uchun kurslar (course.Course), keshdan"""
+        courses = await cls.roster_cache.get('courses')
+        if courses is None:
+            query = "SELECT id, name AS full_name FROM course_course WHERE is_active ORDER BY name"
+            courses = await cls.execute_query(query, fetch_all=True)
+            await cls.roster_cache.set('courses', courses)
+        return courses
 
 
 # ============================================================================
@@ -415,9 +1265,10 @@ class KeyboardManager:
         return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
     @staticmethod
-    def get_main_menu(role: str, user_id: int) -> InlineKeyboardMarkup:
-        """Asosiy menu - role ga qarab"""
+    def get_main_menu(role: str, user_id: int, unread: int = 0) -> InlineKeyboardMarkup:
+        """Asosiy menu - role ga qarab (unread - o'qilmagan xabarlar soni)"""
         keyboard = []
+        badge = f" 🔴 {unread}" if unread else ""
 
         if role == 'student':
             keyboard = [
@@ -429,7 +1280,7 @@ class KeyboardManager:
 
         elif role == 'teacher':
             keyboard = [
-                [InlineKeyboardButton(text="📨 Talabalardan xabarlar", callback_data="teacher_view_messages")],
+                [InlineKeyboardButton(text=f"📨 Talabalardan xabarlar{badge}", callback_data="teacher_view_messages")],
                 [InlineKeyboardButton(text="👨‍🎓 Mening talabalarim", callback_data="teacher_my_students")],
                 [InlineKeyboardButton(text="💬 Faol chatlar", callback_data="teacher_active_chats")],
                 [InlineKeyboardButton(text="⚙️ Sozlamalar", callback_data="settings")]
@@ -460,87 +1311,173 @@ class KeyboardManager:
         return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
     @staticmethod
-    def get_teachers_for_student(student_id: int) -> Optional[InlineKeyboardMarkup]:
+    def filter_roster(rows: List[Dict], query: Optional[str]) -> List[Dict]:
+        """Ism, username yoki fan bo'yicha qidirish"""
+        if not query:
+            return rows
+        needle = query.casefold()
+        return [
+            row for row in rows
+            if needle in " ".join(filter(None, (row['full_name'], row.get('username'), row.get('subject')))).casefold()
+        ]
+
+    @staticmethod
+    def build_roster_keyboard(kind: str, rows: List[Dict], page: int, query: Optional[str],
+                              make_button) -> InlineKeyboardMarkup:
+        """
+        Ro'yxat keyboardi: ROSTER_PAGE_SIZE tadan sahifalar, ro'yxat bir sahifadan katta
+        bo'lsa - qidiruv tugmasi. Har bir sahifa Telegram cheklovlaridan ancha kichik.
+        """
+        filtered = KeyboardManager.filter_roster(rows, query)
+        pages = max(1, -(-len(filtered) // ROSTER_PAGE_SIZE))
+        page = min(max(page, 0), pages - 1)
+
+        keyboard = [[make_button(row)] for row in filtered[page * ROSTER_PAGE_SIZE:(page + 1) * ROSTER_PAGE_SIZE]]
+        if query and not filtered:
+            keyboard.append([InlineKeyboardButton(text="🤷 Hech narsa topilmadi", callback_data="noop")])
+
+        if pages > 1:
+            nav_buttons = []
+            if page > 0:
+                nav_buttons.append(InlineKeyboardButton(text="◀️", callback_data=f"roster_{kind}_{page - 1}"))
+            nav_buttons.append(InlineKeyboardButton(text=f"📄 {page + 1}/{pages}", callback_data="noop"))
+            if page < pages - 1:
+                nav_buttons.append(InlineKeyboardButton(text="▶️", callback_data=f"roster_{kind}_{page + 1}"))
+            keyboard.append(nav_buttons)
+
+        if query:
+            keyboard.append([
+                InlineKeyboardButton(text="🔎 Qidirish", callback_data=f"roster_search_{kind}"),
+                InlineKeyboardButton(text="✖️ Tozalash", callback_data=f"roster_clear_{kind}")
+            ])
+        elif len(rows) > ROSTER_PAGE_SIZE:
+            keyboard.append([InlineKeyboardButton(text="🔎 Qidirish", callback_data=f"roster_search_{kind}")])
+
+        keyboard.append([
+            InlineKeyboardButton(text="🔙 Orqaga", callback_data="back_to_main")
+        ])
+
+        return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+    @staticmethod
+    async def get_teachers_for_student(student_id: int, page: int = 0,
+                                       query: str = None) -> Optional[InlineKeyboardMarkup]:
         """Talaba uchun ustozlar ro'yxati"""
-        teachers = DatabaseManager.get_teachers_for_student(student_id)
+        teachers = await DatabaseManager.get_teachers_for_student(student_id)
 
         if not teachers:
             return None
 
-        keyboard = []
-        for teacher in teachers:
+        def make_button(teacher: Dict) -> InlineKeyboardButton:
             icon = "👨‍🏫" if teacher.get('role') == 'head_teacher' else "👩‍🏫"
             text = f"{icon} {teacher['full_name']}"
             if teacher.get('subject'):
                 text += f" ({teacher['subject']})"
+            return InlineKeyboardButton(text=text, callback_data=f"select_teacher_{teacher['telegram_id']}")
 
-            keyboard.append([
-                InlineKeyboardButton(
-                    text=text,
-                    callback_data=f"select_teacher_{teacher['telegram_id']}"
-                )
-            ])
-
-        keyboard.append([
-            InlineKeyboardButton(text="🔙 Orqaga", callback_data="back_to_main")
-        ])
-
-        return InlineKeyboardMarkup(inline_keyboard=keyboard)
+        return KeyboardManager.build_roster_keyboard('teachers', teachers, page, query, make_button)
 
     @staticmethod
-    def get_students_for_teacher(teacher_id: int) -> Optional[InlineKeyboardMarkup]:
-        """Ustoz uchun talabalar ro'yxati"""
-        students = DatabaseManager.get_students_for_teacher(teacher_id)
+    async def get_students_for_teacher(teacher_id: int, page: int = 0,
+                                       query: str = None) -> Optional[InlineKeyboardMarkup]:
+        """Ustoz uchun talabalar ro'yxati (o'qilmagan xabarlar soni bilan)"""
+        students = await DatabaseManager.get_students_for_teacher(teacher_id)
 
         if not students:
             return None
 
-        keyboard = []
-        for student in students:
+        unread = await DatabaseManager.get_unread_counters(teacher_id)
+
+        def make_button(student: Dict) -> InlineKeyboardButton:
             text = f"👨‍🎓 {student['full_name']}"
             if student.get('subject'):
                 text += f" - {student['subject']}"
+            if unread.get(student['telegram_id']):
+                text += f" 🔴 {unread[student['telegram_id']]}"
+            return InlineKeyboardButton(text=text, callback_data=f"select_student_{student['telegram_id']}")
 
-            keyboard.append([
-                InlineKeyboardButton(
-                    text=text,
-                    callback_data=f"select_student_{student['telegram_id']}"
-                )
-            ])
+        return KeyboardManager.build_roster_keyboard('students', students, page, query, make_button)
 
-        keyboard.append([
-            InlineKeyboardButton(text="🔙 Orqaga", callback_data="back_to_main")
-        ])
+    @staticmethod
+    async def get_broadcast_groups(user_id: int, page: int = 0, query: str = None) -> Optional[InlineKeyboardMarkup]:
+        """E'lon uchun guruh tanlash"""
+        groups = await DatabaseManager.get_broadcast_groups()
+        if not groups:
+            return None
 
+        return KeyboardManager.build_roster_keyboard(
+            'groups', groups, page, query,
+            lambda group: InlineKeyboardButton(text=f"👥 {group['full_name']}", callback_data=f"bc_group_{group['id']}")
+        )
+
+    @staticmethod
+    async def get_broadcast_courses(user_id: int, page: int = 0, query: str = None) -> Optional[InlineKeyboardMarkup]:
+        """E'lon uchun kurs tanlash"""
+        courses = await DatabaseManager.get_broadcast_courses()
+        if not courses:
+            return None
+
+        return KeyboardManager.build_roster_keyboard(
+            'courses', courses, page, query,
+            lambda course: InlineKeyboardButton(text=f"📚 {course['full_name']}", callback_data=f"bc_course_{course['id']}")
+        )
+
+    @staticmethod
+    def get_broadcast_target_keyboard() -> InlineKeyboardMarkup:
+        """E'lon kimga: guruh, kurs yoki rol"""
+        keyboard = [
+            [InlineKeyboardButton(text="👥 Guruh", callback_data="bc_target_group")],
+            [InlineKeyboardButton(text="📚 Kurs", callback_data="bc_target_course")],
+            [InlineKeyboardButton(text="🎭 Rol", callback_data="bc_target_role")],
+            [InlineKeyboardButton(text="❌ Bekor qilish", callback_data="cancel")]
+        ]
         return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
     @staticmethod
-    def get_chat_messages_keyboard(student_id: int, teacher_id: int, page: int = 0) -> InlineKeyboardMarkup:
-        """Chat xabarlari uchun pagination keyboard"""
+    def get_broadcast_roles_keyboard() -> InlineKeyboardMarkup:
+        keyboard = [
+            [InlineKeyboardButton(text=f"🎭 {label}", callback_data=f"bc_role_{role}")]
+            for role, label in BROADCAST_ROLES
+        ]
+        keyboard.append([InlineKeyboardButton(text="❌ Bekor qilish", callback_data="cancel")])
+        return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+    @staticmethod
+    def get_chat_messages_keyboard(student_id: int, teacher_id: int, older_than: Dict = None,
+                                   newer_than: Dict = None) -> InlineKeyboardMarkup:
+        """
+        Chat xabarlari uchun keyset pagination keyboard.
+        Kursor callback_data da: b<kursor> - shu xabardan eskilari, a<kursor> - yangilari,
+        0 - oxirgi sahifa (kursor - encode_chat_cursor)
+        """
         keyboard = []
 
         # Navigation buttons
         nav_buttons = []
-        if page > 0:
+        if older_than is not None:
             nav_buttons.append(
                 InlineKeyboardButton(
                     text="◀️ Oldingi",
-                    callback_data=f"chat_page_{student_id}_{teacher_id}_{page - 1}"
+                    callback_data=f"chat_page_{student_id}_{teacher_id}_b{encode_chat_cursor(older_than)}"
                 )
             )
 
-        nav_buttons.append(
-            InlineKeyboardButton(text=f"📄 {page + 1}", callback_data="noop")
-        )
-
-        nav_buttons.append(
-            InlineKeyboardButton(
-                text="Keyingi ▶️",
-                callback_data=f"chat_page_{student_id}_{teacher_id}_{page + 1}"
+        if newer_than is not None:
+            nav_buttons.append(
+                InlineKeyboardButton(
+                    text="Keyingi ▶️",
+                    callback_data=f"chat_page_{student_id}_{teacher_id}_a{encode_chat_cursor(newer_than)}"
+                )
+            )
+            nav_buttons.append(
+                InlineKeyboardButton(
+                    text="⏭ Oxirgi",
+                    callback_data=f"chat_page_{student_id}_{teacher_id}_0"
+                )
             )
-        )
 
-        keyboard.append(nav_buttons)
+        if nav_buttons:
+            keyboard.append(nav_buttons)
 
         # Action buttons
         keyboard.append([
@@ -592,7 +1529,7 @@ async def start_command(message: Message, state: FSMContext):
     logger.info(f"🚀 Start from user {user.id} - {user.full_name}")
 
     # User ni bazaga qo'shish
-    db_user = db.get_or_create_user(
+    db_user = await db.get_or_create_user(
         telegram_id=user.id,
         full_name=user.full_name,
         username=user.username
@@ -629,7 +1566,7 @@ async def role_selection_handler(callback: CallbackQuery, state: FSMContext):
     role = callback.data.replace('role_', '')
 
     # Role ni saqlash
-    db_user = db.update_user_role(user.id, role)
+    db_user = await db.update_user_role(user.id, role)
 
     if not db_user:
         await callback.message.edit_text("❌ Xatolik yuz berdi. Iltimos, qaytadan urunib ko'ring.")
@@ -664,7 +1601,8 @@ async def student_send_message(callback: CallbackQuery, state: FSMContext):
     student_id = callback.from_user.id
 
     # Talabaning ustozlarini olish
-    teachers_keyboard = kb.get_teachers_for_student(student_id)
+    teachers_keyboard = await kb.get_teachers_for_student(student_id)
+    await state.update_data(roster_query=None)
 
     if not teachers_keyboard:
         await callback.message.edit_text(
@@ -691,7 +1629,7 @@ async def select_teacher_handler(callback: CallbackQuery, state: FSMContext):
     student_id = callback.from_user.id
 
     if callback.data == 'back_to_main':
-        db_user = db.get_user(student_id)
+        db_user = await db.get_user(student_id)
         await show_main_menu(callback.message, db_user)
         await state.clear()
         return
@@ -708,7 +1646,7 @@ async def select_teacher_handler(callback: CallbackQuery, state: FSMContext):
     teacher_id = int(callback.data.replace('select_teacher_', ''))
 
     # Ustoz ma'lumotlarini olish
-    teacher = db.get_user(teacher_id)
+    teacher = await db.get_user(teacher_id)
 
     if not teacher:
         await callback.message.edit_text("❌ Ustoz topilmadi. Iltimos, qaytadan urunib ko'ring.")
@@ -763,7 +1701,7 @@ async def student_write_message(message: Message, state: FSMContext):
         message_type = 'media'
 
     # Xabarni bazaga saqlash
-    saved_message = db.save_message(
+    saved_message = await db.save_message(
         sender_id=student.id,
         receiver_id=teacher_id,
         message_text=message_content,
@@ -784,10 +1722,10 @@ async def student_write_message(message: Message, state: FSMContext):
             f"💬 Javob berish uchun quyidagi tugmani bosing:"
         )
 
-        # Ustozga xabarni yuborish
-        await message.bot.send_message(
-            chat_id=teacher_id,
-            text=teacher_message,
+        # Ustozga xabarni yuborish (navbat orqali)
+        await outbox.enqueue(
+            teacher_id,
+            teacher_message,
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
                 InlineKeyboardButton(
                     text="📝 Javob berish",
@@ -803,10 +1741,10 @@ async def student_write_message(message: Message, state: FSMContext):
             reply_markup=kb.get_main_menu('student', student.id)
         )
 
-        logger.info(f"📤 Message sent: Student {student.id} -> Teacher {teacher_id}")
+        logger.info(f"📤 Message queued: Student {student.id} -> Teacher {teacher_id}")
 
     except Exception as e:
-        logger.error(f"❌ Failed to send message to teacher: {e}")
+        logger.error(f"❌ Failed to queue message to teacher: {e}")
         await message.answer(
             "❌ Xabar yuborishda xatolik yuz berdi. Iltimos, keyinroq urunib ko'ring."
         )
@@ -824,7 +1762,8 @@ async def student_view_messages(callback: CallbackQuery, state: FSMContext):
     student_id = callback.from_user.id
 
     # Talabaning ustozlarini olish
-    teachers_keyboard = kb.get_teachers_for_student(student_id)
+    teachers_keyboard = await kb.get_teachers_for_student(student_id)
+    await state.update_data(roster_query=None)
 
     if not teachers_keyboard:
         await callback.message.edit_text(
@@ -842,23 +1781,89 @@ async def student_view_messages(callback: CallbackQuery, state: FSMContext):
     await state.set_state(Form.viewing_chat)
 
 
+CHAT_PAGE_SIZE = 10
+CURSOR_EPOCH = datetime(1970, 1, 1)
+BASE36_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def to_base36(number: int) -> str:
+    digits = ''
+    while True:
+        number, remainder = divmod(number, 36)
+        digits = BASE36_DIGITS[remainder] + digits
+        if not number:
+            return digits
+
+
+def encode_chat_cursor(msg: Dict) -> str:
+    """
+    Xabar -> "<id>.<created_at>" (ikkalasi base36). created_at ham kursorda - sahifa so'rovi
+    bo'limlarni shu vaqt bo'yicha kesadi. callback_data 64 baytdan oshmasligi uchun qisqa
+    """
+    micros = (msg['created_at'] - CURSOR_EPOCH) // timedelta(microseconds=1)
+    return f"{to_base36(msg['id'])}.{to_base36(micros)}"
+
+
+def decode_chat_cursor(value: str) -> Optional[Tuple[datetime, int]]:
+    """encode_chat_cursor teskarisi: (created_at, id); eski (faqat id) yoki buzilgan kursor - None"""
+    try:
+        message_id, micros = value.split('.')
+        return CURSOR_EPOCH + timedelta(microseconds=int(micros, 36)), int(message_id, 36)
+    except (ValueError, OverflowError):
+        return None
+
+
 @router.callback_query(F.data.startswith("chat_page_"))
 async def view_chat_page(callback: CallbackQuery, state: FSMContext):
     """Chat xabarlarini ko'rish (pagination)"""
-    await callback.answer()
-
     parts = callback.data.split('_')
     student_id = int(parts[2])
     teacher_id = int(parts[3])
-    page = int(parts[4])
+    cursor = parts[4]
 
-    await show_chat_page(callback, student_id, teacher_id, page)
+    # Callback data ni foydalanuvchi o'zi yasashi mumkin - faqat suhbat ishtirokchilari ko'radi
+    if callback.from_user.id not in (student_id, teacher_id):
+        await callback.answer("❌ Bu suhbat sizniki emas.", show_alert=True)
+        return
+    await callback.answer()
 
+    # Eski tugmalardagi (faqat id) kursor - oxirgi sahifa
+    position = decode_chat_cursor(cursor[1:]) if cursor[:1] in ('a', 'b') else None
+    if position and cursor.startswith('b'):
+        await show_chat_page(callback, student_id, teacher_id, before=position)
+    elif position:
+        await show_chat_page(callback, student_id, teacher_id, after=position)
+    else:
+        await show_chat_page(callback, student_id, teacher_id)
+
+
+async def show_chat_page(callback: CallbackQuery, student_id: int, teacher_id: int,
+                         before: Tuple[datetime, int] = None, after: Tuple[datetime, int] = None):
+    """Chat xabarlarini ko'rsatish (standart - oxirgi xabarlar; before/after - (created_at, id) kursor)"""
+    if before is None:
+        # Oxirgi xabarlar ko'rindi - suhbatdoshdan kelganlar o'qildi (bitta UPDATE);
+        # eski sahifalarni varaqlashda qayta yozilmaydi
+        reader_id = callback.from_user.id
+        await db.mark_conversation_read(reader_id, teacher_id if reader_id == student_id else student_id)
+
+    # Bitta ortiqcha xabar - shu yo'nalishda yana sahifa bormi
+    messages = await db.get_chat_messages(
+        student_id, teacher_id, limit=CHAT_PAGE_SIZE + 1, before=before, after=after
+    )
+
+    if after is not None:
+        has_older = True
+        has_newer = len(messages) > CHAT_PAGE_SIZE
+        messages = messages[:CHAT_PAGE_SIZE]
+    else:
+        has_older = len(messages) > CHAT_PAGE_SIZE
+        has_newer = before is not None
+        messages = messages[-CHAT_PAGE_SIZE:]
 
-async def show_chat_page(callback: CallbackQuery, student_id: int, teacher_id: int, page: int = 0):
-    """Chat xabarlarini ko'rsatish"""
-    # Xabarlarni olish
-    messages = db.get_chat_messages(student_id, teacher_id, limit=10)
+    if not messages and after is not None:
+        # Yangi xabar yo'q - oxirgi sahifani ko'rsatish
+        await show_chat_page(callback, student_id, teacher_id)
+        return
 
     if not messages:
         await callback.message.edit_text(
@@ -879,18 +1884,9 @@ async def show_chat_page(callback: CallbackQuery, student_id: int, teacher_id: i
     # Xabarlarni formatlash
     chat_text = "💬 Suhbat tarixi:\n\n"
 
-    # Pagination
-    page_size = 10
-    total_pages = (len(messages) + page_size - 1) // page_size
-    page = min(page, total_pages - 1)
-    start_idx = page * page_size
-    end_idx = min(start_idx + page_size, len(messages))
-
-    for i in range(start_idx, end_idx):
-        msg = messages[i]
-
+    for msg in messages:
         # Vaqt formatlash
-        time_str = msg['created_at'].strftime('%H:%M') if isinstance(msg['created_at'], datetime) else msg['created_at']
+        time_str = msg['created_at'].strftime('%d.%m %H:%M') if isinstance(msg['created_at'], datetime) else msg['created_at']
 
         # Xabar formatlash
         if msg['sender_id'] == student_id:
@@ -901,12 +1897,14 @@ async def show_chat_page(callback: CallbackQuery, student_id: int, teacher_id: i
             sender_name = msg.get('sender_name', 'Ustoz')
             chat_text += f"👨‍🏫 <b>{sender_name}</b> ({time_str}):\n{msg['message_text']}\n\n"
 
-    chat_text += f"\n📄 Sahifa: {page + 1}/{total_pages}"
-
     await callback.message.edit_text(
         chat_text,
         parse_mode=ParseMode.HTML,
-        reply_markup=kb.get_chat_messages_keyboard(student_id, teacher_id, page)
+        reply_markup=kb.get_chat_messages_keyboard(
+            student_id, teacher_id,
+            older_than=messages[0] if has_older else None,
+            newer_than=messages[-1] if has_newer else None
+        )
     )
 
 
@@ -919,12 +1917,14 @@ async def teacher_view_messages(callback: CallbackQuery, state: FSMContext):
 
     teacher_id = callback.from_user.id
 
-    # O'qilmagan xabarlarni olish
-    unread_messages = db.get_unread_messages_for_teacher(teacher_id)
+    # Hisoblagichdan: o'qilmagan bo'lmasa bot_messages ga umuman murojaat qilinmaydi
+    unread_count = await db.count_unread_messages(teacher_id)
+    unread_messages = await db.get_unread_messages_for_teacher(teacher_id, limit=5) if unread_count else []
 
     if not unread_messages:
         # Talabalar ro'yxatini ko'rsatish
-        students_keyboard = kb.get_students_for_teacher(teacher_id)
+        students_keyboard = await kb.get_students_for_teacher(teacher_id)
+        await state.update_data(roster_query=None)
 
         if not students_keyboard:
             await callback.message.edit_text(
@@ -946,13 +1946,13 @@ async def teacher_view_messages(callback: CallbackQuery, state: FSMContext):
     # O'qilmagan xabarlarni ko'rsatish
     message_text = "📨 Yangi kelgan xabarlar:\n\n"
 
-    for msg in unread_messages[:5]:  # Faqat 5 tasini ko'rsatish
+    for msg in unread_messages:
         time_str = msg['created_at'].strftime('%H:%M') if isinstance(msg['created_at'], datetime) else msg['created_at']
         message_text += f"👨‍🎓 {msg.get('sender_name', 'Talaba')} ({time_str}):\n"
         message_text += f"{msg['message_text'][:100]}...\n\n"
 
-    if len(unread_messages) > 5:
-        message_text += f"\n... va yana {len(unread_messages) - 5} ta xabar"
+    if unread_count > 5:
+        message_text += f"\n... va yana {unread_count - 5} ta xabar"
 
     keyboard = []
     for msg in unread_messages[:3]:  # Faqat 3 tasiga button
@@ -986,17 +1986,17 @@ async def reply_to_message(callback: CallbackQuery, state: FSMContext):
     teacher_id = callback.from_user.id
 
     # Xabarni olish
-    message = db.get_message_by_id(message_id)
+    message = await db.get_message_by_id(message_id)
 
     if not message:
         await callback.message.edit_text("❌ Xabar topilmadi.")
         return
 
     # Xabarni o'qilgan deb belgilash
-    db.mark_message_as_read(message_id)
+    await db.mark_message_as_read(message_id, message['created_at'])
 
     # Student ma'lumotlarini olish
-    student = db.get_user(message['sender_id'])
+    student = await db.get_user(message['sender_id'])
 
     # State data ga saqlash
     await state.update_data(
@@ -1035,7 +2035,7 @@ async def send_reply(message: Message, state: FSMContext):
         return
 
     # Javobni bazaga saqlash (bu yangi xabar sifatida)
-    saved_message = db.save_message(
+    saved_message = await db.save_message(
         sender_id=teacher.id,
         receiver_id=student_id,
         message_text=reply_text,
@@ -1043,7 +2043,7 @@ async def send_reply(message: Message, state: FSMContext):
     )
 
     # Original xabarni "replied" deb belgilash
-    db.mark_message_as_replied(message_id)
+    await db.mark_message_as_replied(message_id)
 
     # STUDENTGA JAVOBNI YUBORISH
     try:
@@ -1058,10 +2058,7 @@ async def send_reply(message: Message, state: FSMContext):
             f"Boshqa savolingiz bo'lsa, yozishingiz mumkin."
         )
 
-        await message.bot.send_message(
-            chat_id=student_id,
-            text=reply_message
-        )
+        await outbox.enqueue(student_id, reply_message)
 
         # Ustozga tasdiq
         await message.answer(
@@ -1069,17 +2066,255 @@ async def send_reply(message: Message, state: FSMContext):
             reply_markup=kb.get_main_menu('teacher', teacher.id)
         )
 
-        logger.info(f"📨 Reply sent: Teacher {teacher.id} -> Student {student_id}")
+        logger.info(f"📨 Reply queued: Teacher {teacher.id} -> Student {student_id}")
 
     except Exception as e:
-        logger.error(f"❌ Failed to send reply: {e}")
+        logger.error(f"❌ Failed to queue reply: {e}")
         await message.answer(
-            "❌ Javob yuborishda xatolik. Talaba botni bloklagan bo'lishi mumkin."
+            "❌ Javob yuborishda xatolik. Iltimos, keyinroq urunib ko'ring."
         )
 
     await state.clear()
 
 
+# ========== RO'YXAT SAHIFALARI VA QIDIRUV ==========
+
+ROSTER_KEYBOARDS = {
+    'teachers': kb.get_teachers_for_student,
+    'students': kb.get_students_for_teacher,
+    'groups': kb.get_broadcast_groups,
+    'courses': kb.get_broadcast_courses,
+}
+
+
+@router.callback_query(F.data.regexp(r"^roster_(teachers|students|groups|courses)_\d+$"))
+async def roster_page_handler(callback: CallbackQuery, state: FSMContext):
+    """Ro'yxatning boshqa sahifasi (qidiruv natijasi bo'yicha ham)"""
+    await callback.answer()
+
+    _, kind, page = callback.data.split('_')
+    data = await state.get_data()
+    query = data.get('roster_query') if data.get('roster_kind') == kind else None
+
+    keyboard = await ROSTER_KEYBOARDS[kind](callback.from_user.id, page=int(page), query=query)
+    if keyboard:
+        await callback.message.edit_reply_markup(reply_markup=keyboard)
+
+
+@router.callback_query(F.data.regexp(r"^roster_search_(teachers|students|groups|courses)$"))
+async def roster_search_handler(callback: CallbackQuery, state: FSMContext):
+    """Qidiruv matnini so'rash"""
+    await callback.answer()
+
+    await state.update_data(
+        roster_kind=callback.data.replace('roster_search_', ''),
+        roster_return_state=await state.get_state()
+    )
+    await state.set_state(Form.searching_roster)
+
+    await callback.message.answer(
+        "🔎 Ism, username yoki fan bo'yicha qidirish uchun matn yuboring:",
+        reply_markup=kb.get_cancel_keyboard()
+    )
+
+
+@router.message(Form.searching_roster)
+async def roster_search_input(message: Message, state: FSMContext):
+    """Qidiruv natijasini ko'rsatish"""
+    data = await state.get_data()
+    kind = data.get('roster_kind', 'teachers')
+    query = (message.text or '').strip()[:64]
+
+    await state.update_data(roster_query=query or None)
+    await state.set_state(data.get('roster_return_state'))
+
+    keyboard = await ROSTER_KEYBOARDS[kind](message.from_user.id, query=query or None)
+    if not keyboard:
+        await message.answer("❌ Ro'yxat bo'sh.")
+        return
+
+    await message.answer(f"🔎 Qidiruv: {html.escape(query)}", reply_markup=keyboard)
+
+
+@router.callback_query(F.data.regexp(r"^roster_clear_(teachers|students|groups|courses)$"))
+async def roster_clear_handler(callback: CallbackQuery, state: FSMContext):
+    """Qidiruvni bekor qilib, to'liq ro'yxatga qaytish"""
+    await callback.answer()
+
+    await state.update_data(roster_query=None)
+    keyboard = await ROSTER_KEYBOARDS[callback.data.replace('roster_clear_', '')](callback.from_user.id)
+    if keyboard:
+        await callback.message.edit_reply_markup(reply_markup=keyboard)
+
+
+# ========== ADMIN: NAVBAT HOLATI ==========
+
+@router.message(Command("outbox"))
+async def outbox_stats_command(message: Message):
+    """Outbound navbat holati (faqat ADMIN_IDS uchun)"""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+
+    stats = await outbox.stats()
+    await message.answer(
+        "📮 <b>Outbound navbat</b>\n\n" +
+        "\n".join(f"• {key}: {value}" for key, value in stats.items())
+    )
+
+
+# ========== ADMIN: E'LONLAR ==========
+
+BROADCAST_STATUS_ICONS = {'draft': "📝", 'running': "⏳", 'done': "✅", 'cancelled': "🚫"}
+
+
+def format_broadcast(broadcast: Dict) -> str:
+    done = broadcast['sent_count'] + broadcast['failed_count']
+    percent = done * 100 // broadcast['total_count'] if broadcast['total_count'] else 100
+    return (
+        f"{BROADCAST_STATUS_ICONS.get(broadcast['status'], '')} <b>#{broadcast['id']}</b> "
+        f"{html.escape(broadcast['target_label'] or '')}\n"
+        f"   {done}/{broadcast['total_count']} ({percent}%) - "
+        f"✅ {broadcast['sent_count']}, ❌ {broadcast['failed_count']}"
+    )
+
+
+@router.message(Command("broadcast"))
+async def broadcast_command(message: Message, state: FSMContext):
+    """Yangi e'lon: guruh, kurs yoki rol bo'yicha"""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+
+    await state.clear()
+    await message.answer("📢 <b>Yangi e'lon</b>\n\nKimga yuboriladi?", reply_markup=kb.get_broadcast_target_keyboard())
+
+
+@router.callback_query(F.data.startswith("bc_target_"))
+async def broadcast_target_handler(callback: CallbackQuery, state: FSMContext):
+    """Guruh/kurs/rol ro'yxatini ko'rsatish"""
+    await callback.answer()
+    if callback.from_user.id not in ADMIN_IDS:
+        return
+
+    target_type = callback.data.replace('bc_target_', '')
+    await state.update_data(roster_query=None)
+
+    if target_type == 'role':
+        keyboard = kb.get_broadcast_roles_keyboard()
+    elif target_type == 'group':
+        keyboard = await kb.get_broadcast_groups(callback.from_user.id)
+    else:
+        keyboard = await kb.get_broadcast_courses(callback.from_user.id)
+
+    if not keyboard:
+        await callback.message.edit_text("❌ Ro'yxat bo'sh.")
+        return
+
+    await callback.message.edit_text("📢 Qabul qiluvchilarni tanlang:", reply_markup=keyboard)
+
+
+@router.callback_query(F.data.regexp(r"^bc_(group|course|role)_"))
+async def broadcast_select_handler(callback: CallbackQuery, state: FSMContext):
+    """Tanlangan guruh/kurs/rol - endi e'lon matni"""
+    await callback.answer()
+    if callback.from_user.id not in ADMIN_IDS:
+        return
+
+    _, target_type, target_id = callback.data.split('_', 2)
+    if target_type == 'role':
+        target_label = f"Rol: {dict(BROADCAST_ROLES).get(target_id, target_id)}"
+    else:
+        rows = await (db.get_broadcast_groups() if target_type == 'group' else db.get_broadcast_courses())
+        target_id = int(target_id)
+        name = next((row['full_name'] for row in rows if row['id'] == target_id), target_id)
+        target_label = f"{'Guruh' if target_type == 'group' else 'Kurs'}: {name}"
+
+    await state.update_data(bc_target_type=target_type, bc_target_id=target_id, bc_target_label=target_label)
+    await state.set_state(Form.broadcast_text)
+
+    await callback.message.edit_text(
+        f"📢 {html.escape(target_label)}\n\n📝 E'lon matnini yuboring (HTML formatlash mumkin):",
+        reply_markup=kb.get_cancel_keyboard()
+    )
+
+
+@router.message(Form.broadcast_text)
+async def broadcast_text_handler(message: Message, state: FSMContext):
+    """Qoralama yaratish (qabul qiluvchilar shu yerda aniqlanadi) va tasdiqlash"""
+    data = await state.get_data()
+    await state.clear()
+
+    if message.from_user.id not in ADMIN_IDS or not message.text:
+        await message.answer("❌ Faqat matnli e'lon yuborish mumkin.")
+        return
+
+    broadcast = await db.create_broadcast(
+        created_by=message.from_user.id,
+        target_type=data['bc_target_type'],
+        target_id=data['bc_target_id'],
+        target_label=data['bc_target_label'],
+        message_text=message.html_text
+    )
+
+    await message.answer(
+        f"📢 {html.escape(broadcast['target_label'])}\n"
+        f"👥 Qabul qiluvchilar: <b>{broadcast['total_count']}</b>\n\n"
+        f"Yuborilsinmi?",
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+            InlineKeyboardButton(text="✅ Yuborish", callback_data=f"bc_start_{broadcast['id']}"),
+            InlineKeyboardButton(text="❌ Bekor qilish", callback_data=f"bc_cancel_{broadcast['id']}")
+        ]])
+    )
+
+
+@router.callback_query(F.data.startswith("bc_start_"))
+async def broadcast_start_handler(callback: CallbackQuery):
+    await callback.answer()
+    if callback.from_user.id not in ADMIN_IDS:
+        return
+
+    broadcast = await db.start_broadcast(int(callback.data.replace('bc_start_', '')))
+    if not broadcast:
+        await callback.message.edit_text("❌ E'lon allaqachon boshlangan yoki bekor qilingan.")
+        return
+
+    await callback.message.edit_text(
+        f"🚀 E'lon yuborilmoqda.\n\n{format_broadcast(broadcast)}\n\nHolatini ko'rish: /broadcasts"
+    )
+
+
+@router.callback_query(F.data.startswith("bc_cancel_"))
+async def broadcast_cancel_handler(callback: CallbackQuery):
+    await callback.answer()
+    if callback.from_user.id not in ADMIN_IDS:
+        return
+
+    broadcast = await db.cancel_broadcast(int(callback.data.replace('bc_cancel_', '')))
+    await callback.message.edit_text(
+        f"🚫 E'lon bekor qilindi.\n\n{format_broadcast(broadcast)}" if broadcast else "❌ E'lon topilmadi."
+    )
+
+
+@router.message(Command("broadcasts"))
+async def broadcasts_command(message: Message):
+    """Oxirgi e'lonlar va ularning holati"""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+
+    broadcasts = await db.get_recent_broadcasts()
+    if not broadcasts:
+        await message.answer("📭 Hali e'lonlar yo'q. Yangi e'lon: /broadcast")
+        return
+
+    keyboard = [
+        [InlineKeyboardButton(text=f"🚫 #{broadcast['id']} ni to'xtatish", callback_data=f"bc_cancel_{broadcast['id']}")]
+        for broadcast in broadcasts if broadcast['status'] == 'running'
+    ]
+    await message.answer(
+        "📢 <b>Oxirgi e'lonlar</b>\n\n" + "\n\n".join(format_broadcast(broadcast) for broadcast in broadcasts),
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard) if keyboard else None
+    )
+
+
 # ========== YORDAMCHI FUNCTIONS ==========
 
 @router.callback_query(F.data == "back_to_main")
@@ -1088,7 +2323,7 @@ async def back_to_main(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
     user_id = callback.from_user.id
-    db_user = db.get_user(user_id)
+    db_user = await db.get_user(user_id)
 
     if db_user:
         await show_main_menu(callback.message, db_user)
@@ -1107,7 +2342,7 @@ async def cancel_handler(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
     user_id = callback.from_user.id
-    db_user = db.get_user(user_id)
+    db_user = await db.get_user(user_id)
 
     if db_user:
         await show_main_menu(callback.message, db_user)
@@ -1165,7 +2400,7 @@ async def help_command(message: Message):
 async def settings_command(message: Message):
     """Settings command"""
     user = message.from_user
-    db_user = db.get_user(user.id)
+    db_user = await db.get_user(user.id)
 
     if not db_user:
         await message.answer("Iltimos, avval /start ni bosing.")
@@ -1191,7 +2426,8 @@ async def settings_command(message: Message):
 async def show_main_menu(message: Union[Message, CallbackQuery], db_user: Dict):
     """Asosiy menyuni ko'rsatish"""
     menu_text = get_main_menu_text(db_user)
-    keyboard = kb.get_main_menu(db_user['role'], db_user['telegram_id'])
+    unread = await db.count_unread_messages(db_user['telegram_id']) if db_user['role'] == 'teacher' else 0
+    keyboard = kb.get_main_menu(db_user['role'], db_user['telegram_id'], unread)
 
     if isinstance(message, CallbackQuery):
         await message.message.edit_text(menu_text, reply_markup=keyboard)
@@ -1220,37 +2456,59 @@ def get_main_menu_text(db_user: Dict) -> str:
 # 6. MAIN FUNCTION
 # ============================================================================
 
-async def main():
-    """Botni ishga tushirish"""
+def create_bot(token: str) -> Bot:
+    return Bot(
+        token=token,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+    )
+
+
+def create_dispatcher(storage) -> Dispatcher:
+    dp = Dispatcher(storage=storage)
+    dp.include_router(router)
+    return dp
+
+
+def redis_url() -> str:
+    return f"redis://{REDIS_CONFIG['host']}:{REDIS_CONFIG['port']}/{REDIS_CONFIG['db']}"
+
+
+async def main(token: str):
+    """Botni polling rejimida ishga tushirish (lokal development uchun)"""
 
     # Database initialization
-    DatabaseManager.initialize()
+    await DatabaseManager.initialize()
+    await DatabaseManager.rebuild_unread_counters()
+    DatabaseManager.start_partition_maintenance()
     logger.info("🚀 Aiogram Bot starting...")
 
     # Storage setup (Redis yoki Memory)
     try:
-        from aiogram.fsm.storage.redis import RedisStorage
-        storage = RedisStorage.from_url(f"redis://{REDIS_CONFIG['host']}:{REDIS_CONFIG['port']}/{REDIS_CONFIG['db']}")
+        storage = RedisStorage.from_url(redis_url())
         logger.info("✅ Redis storage connected")
     except Exception as e:
         logger.warning(f"⚠️ Redis not available, using memory storage: {e}")
-        from aiogram.fsm.storage.memory import MemoryStorage
         storage = MemoryStorage()
 
-    # Bot yaratish
-    bot = Bot(
-        token=BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-    )
+    # Bot va dispatcher yaratish
+    bot = create_bot(token)
+    dp = create_dispatcher(storage)
 
-    # Dispatcher yaratish
-    dp = Dispatcher(storage=storage)
-    dp.include_router(router)
+    # Outbound navbat: Redis bo'lsa unda, bo'lmasa jarayon ichida
+    outbox_redis = redis_async.Redis(**REDIS_CONFIG)
+    try:
+        await outbox_redis.ping()
+    except Exception as e:
+        logger.warning(f"⚠️ Redis not available, outbox is in memory: {e}")
+        await outbox_redis.aclose()
+        outbox_redis = None
+    await outbox.start(bot, outbox_redis)
+    await broadcasts.start(outbox)
 
     # Start message
     print("=" * 50)
     print("🤖 AIOGRAM BOT ISHGA TUSHIRILDI")
-    print(f"📊 Database: {DB_CONFIG['dbname']}")
+    print(f"📊 Database: {DB_CONFIG['database']}")
     print(f"👤 Admin IDs: {ADMIN_IDS}")
     print("=" * 50)
     print("📝 Log fayli: aiogram_bot.log")
@@ -1259,7 +2517,712 @@ async def main():
 
     # Start polling
     await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        # Avval outbox (yuborilayotganlar tugaydi), keyin natijalar yoziladi
+        await outbox.stop()
+        await broadcasts.stop()
+        if outbox_redis is not None:
+            await outbox_redis.aclose()
+        await DatabaseManager.close()
+
+
+# ============================================================================
+# 7. WEBHOOK REJIMI (update lar workerlarga taqsimlanadi)
+# ============================================================================
+#
+#   Telegram --POST--> webhook jarayoni --RPUSH--> Redis: {queue_prefix}:{i} --BLPOP--> worker i
+#
+# Update qaysi workerga tushishi chat_id bo'yicha (chat_id % workers), shuning uchun
+# bitta chatning update lari doim bitta workerga, kelgan tartibda tushadi. Worker ichida
+# turli chatlar parallel, bitta chat esa ketma-ket ishlanadi. FSM holati RedisStorage da -
+# barcha workerlar uchun umumiy. WEBHOOK_WORKERS webhook va workerlarda bir xil bo'lishi shart.
+#
+# Workerlar boshqa serverlarda ham ishga tushirilishi mumkin: python chatbot.py worker --index 3
+
+def update_chat_id(update: Dict) -> int:
+    """Update qaysi chatga tegishli (callback_query uchun - tugma turgan xabar chati)"""
+    for event in update.values():
+        if not isinstance(event, dict):
+            continue
+        chat = event.get('chat') or (event.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+        user = event.get('from') or event.get('user')
+        if user:
+            return user['id']
+    return update.get('update_id', 0)
+
+
+def update_queue(chat_id: int) -> str:
+    return f"{WEBHOOK_CONFIG['queue_prefix']}:{abs(chat_id) % WEBHOOK_CONFIG['workers']}"
+
+
+async def run_db_job(job):
+    """
+    Bitta database ishini bajarib chiqish (cron yoki nosozlikdan keyin):
+    reconcile - hisoblagichlarni qayta qurish, partitions - bo'limlarni yaratish/arxivlash
+    """
+    await DatabaseManager.initialize()
+    try:
+        logger.info(f"✅ {job.__name__}: {await job()}")
+    finally:
+        await DatabaseManager.close()
+
+
+async def run_webhook(token: str):
+    """Telegram update larini qabul qilib, Redis navbatlariga tarqatish (DB ga ulanmaydi)"""
+    redis_client = redis_async.Redis(**REDIS_CONFIG)
+    await redis_client.ping()
+
+    async def handle_update(request: web.Request) -> web.Response:
+        secret = WEBHOOK_CONFIG['secret']
+        if secret and request.headers.get('X-Telegram-Bot-Api-Secret-Token') != secret:
+            return web.Response(status=401)
+
+        raw = await request.text()
+        try:
+            update = json.loads(raw)
+        except ValueError:
+            return web.Response(status=400)
+
+        await redis_client.rpush(update_queue(update_chat_id(update)), raw)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_CONFIG['path'], handle_update)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_CONFIG['host'], WEBHOOK_CONFIG['port']).start()
+
+    bot = create_bot(token)
+    await bot.set_webhook(
+        url=WEBHOOK_CONFIG['base_url'].rstrip('/') + WEBHOOK_CONFIG['path'],
+        secret_token=WEBHOOK_CONFIG['secret'] or None
+    )
+    logger.info(f"🌐 Webhook: {WEBHOOK_CONFIG['host']}:{WEBHOOK_CONFIG['port']}{WEBHOOK_CONFIG['path']}, "
+                f"{WEBHOOK_CONFIG['workers']} ta worker navbati")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await bot.session.close()
+        await runner.cleanup()
+        await redis_client.aclose()
+
+
+class ChatTaskChain:
+    """
+    Vazifalarni chat bo'yicha zanjirlash: bitta chat ichida ketma-ket (kelgan tartibda),
+    turli chatlar parallel.
+    - max_pending - manbadan oldindan o'qilgan (tugamagan) vazifalar, acquire()/release()
+    - concurrency - bir vaqtda ishlayotganlar; slot faqat vazifa o'z chatida navbatga
+      chiqqanda olinadi - bitta "gaplashuvchan" chatning navbatdagilari boshqa chatlarni to'sib qo'ymaydi
+    """
+
+    def __init__(self, concurrency: int, max_pending: int = None):
+        self.slots = asyncio.Semaphore(concurrency)
+        self._pending = asyncio.Semaphore(max_pending or concurrency * 4)
+        self._tails: Dict[int, asyncio.Task] = {}  # chat_id -> shu chatning oxirgi vazifasi
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tails)
+
+    async def acquire(self):
+        """Yangi vazifa uchun joy (manbadan o'qishdan oldin chaqiriladi)"""
+        await self._pending.acquire()
+
+    def release(self):
+        """acquire() dan keyin vazifa berilmasa"""
+        self._pending.release()
+
+    def submit(self, chat_id: int, work, hold_slot: bool = True):
+        """
+        work() - korutina qaytaruvchi funksiya; joy acquire() orqali olingan bo'lishi kerak.
+        hold_slot=False - work slotni o'zi (self.slots) kerakli joyda oladi
+        """
+        previous = self._tails.get(chat_id)
+        self._tails[chat_id] = asyncio.create_task(self._run(chat_id, work, previous, hold_slot))
+
+    async def drain(self):
+        """Boshlangan vazifalar tugashini kutish"""
+        await asyncio.gather(*self._tails.values(), return_exceptions=True)
+
+    async def _run(self, chat_id: int, work, previous: Optional[asyncio.Task], hold_slot: bool):
+        try:
+            if previous is not None:
+                # Shu chatning oldingi vazifasi tugashini kutish (xatosi bo'lsa ham)
+                await asyncio.wait([previous])
+            if hold_slot:
+                async with self.slots:
+                    await work()
+            else:
+                await work()
+        except Exception as e:
+            logger.error(f"❌ Chat {chat_id} task error: {e}")
+        finally:
+            self._pending.release()
+            if self._tails.get(chat_id) is asyncio.current_task():
+                del self._tails[chat_id]
+
+
+class UpdateWorker:
+    """Bitta worker navbatidagi update larni ishlash: chatlar parallel, chat ichida tartib bilan"""
+
+    def __init__(self, bot: Bot, dp: Dispatcher, redis_client, queue: str, concurrency: int):
+        self.bot = bot
+        self.dp = dp
+        self.redis = redis_client
+        self.queue = queue
+        self.chain = ChatTaskChain(concurrency)
+
+    async def run(self):
+        try:
+            while True:
+                await self.chain.acquire()
+                try:
+                    item = await self.redis.blpop([self.queue], timeout=5)
+                except BaseException:
+                    self.chain.release()
+                    raise
+                if item is None:
+                    self.chain.release()
+                    continue
+
+                update = json.loads(item[1])
+                self.chain.submit(
+                    update_chat_id(update),
+                    lambda update=update: self.dp.feed_raw_update(self.bot, update)
+                )
+        finally:
+            # Olingan update larni tugatib chiqish
+            await self.chain.drain()
+
+
+async def run_worker(index: int, token: str):
+    """index-navbatdagi update larni ishlovchi worker"""
+    await DatabaseManager.initialize()
+    if index == 0:
+        # Hisoblagichlar va bo'limlarni bitta worker tekshiradi
+        await DatabaseManager.rebuild_unread_counters()
+        DatabaseManager.start_partition_maintenance()
+
+    # Webhook rejimida FSM holati faqat Redis da (workerlar orasida umumiy)
+    storage = RedisStorage.from_url(redis_url())
+    await storage.redis.ping()
+    redis_client = redis_async.Redis(**REDIS_CONFIG)
+
+    bot = create_bot(token)
+    dp = create_dispatcher(storage)
+    queue = f"{WEBHOOK_CONFIG['queue_prefix']}:{index}"
+    logger.info(f"👷 Worker {index} started: {queue}")
+
+    # Shu worker chat_id % workers == index bo'lgan chatlarga xabar yuboradi
+    await outbox.start(bot, redis_client, shard=index, shards=WEBHOOK_CONFIG['workers'])
+    await broadcasts.start(outbox)
+
+    try:
+        await UpdateWorker(bot, dp, redis_client, queue, WEBHOOK_CONFIG['worker_concurrency']).run()
+    finally:
+        # Avval outbox (yuborilayotganlar tugaydi), keyin natijalar yoziladi
+        await outbox.stop()
+        await broadcasts.stop()
+        await bot.session.close()
+        await storage.close()
+        await redis_client.aclose()
+        await DatabaseManager.close()
+
+
+def worker_process(index: int, token: str):
+    try:
+        asyncio.run(run_worker(index, token))
+    except KeyboardInterrupt:
+        pass
+
+
+def run_webhook_with_workers(token: str, spawn_workers: bool = True):
+    """Webhook jarayoni + WEBHOOK_WORKERS ta lokal worker jarayoni"""
+    processes = []
+    if spawn_workers:
+        for index in range(WEBHOOK_CONFIG['workers']):
+            process = multiprocessing.Process(target=worker_process, args=(index, token),
+                                              name=f"chatbot-worker-{index}")
+            process.start()
+            processes.append(process)
+
+    try:
+        asyncio.run(run_webhook(token))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+# ============================================================================
+# 8. OUTBOUND XABARLAR NAVBATI
+# ============================================================================
+#
+# Handlerlar boshqa foydalanuvchiga xabarni outbox.enqueue() bilan navbatga qo'yadi va darhol
+# qaytadi. Yuborish fon vazifalarida: Telegram cheklovlari (global va har bir chat uchun token
+# bucket), 429 da retry_after kutish, tarmoq/server xatolarida qayta urinish.
+# Qayta urinish shu chatning zanjirida (kutib, qayta yuborish) - chatning keyingi xabarlari
+# undan oldin ketmaydi.
+#
+# Redis bo'lsa navbat Redis da (jarayon o'chsa ham yo'qolmaydi):
+#   {prefix}:{shard}             - yuborishga tayyor
+#   {prefix}:{shard}:processing  - yuborilayotgan (restartda qayta navbat boshiga qaytadi)
+#   {prefix}:dead                - urinishlar tugagan xabarlar (oxirgi 1000 ta)
+# Shard = chat_id % shards: bitta chatga xabarlar doim bitta jarayondan, tartib bilan ketadi.
+
+class TokenBucket:
+    """rate ta/sekund, burst gacha ketma-ket. reserve() - token uchun necha sekund kutish kerak"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Token kelajakdan band qilinadi - navbatdagilar adolatli tartibda kutadi
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    @property
+    def idle(self) -> bool:
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+
+class MemoryOutbox:
+    """Redis yo'q bo'lsa (lokal development) - jarayon ichidagi navbat"""
+
+    def __init__(self):
+        self._ready: asyncio.Queue = asyncio.Queue()
+
+    async def recover(self, shard: int):
+        pass
+
+    async def push(self, shard: int, raw: str):
+        self._ready.put_nowait(raw)
+
+    async def push_many(self, items: List[Tuple[int, str]]):
+        for shard, raw in items:
+            self._ready.put_nowait(raw)
+
+    async def pop(self, shard: int, timeout: float) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self._ready.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def ack(self, shard: int, raw: str):
+        pass
+
+    async def dead(self, shard: int, raw: str, dead_raw: str):
+        pass
+
+    async def depth(self, shard: int) -> Dict:
+        return {'ready': self._ready.qsize()}
+
+
+class RedisOutbox:
+    """Redis dagi navbat (yuqoridagi kalitlar)"""
+
+    DEAD_LETTER_LIMIT = 1000
+
+    def __init__(self, redis_client, key_prefix: str):
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+
+    def _ready(self, shard: int) -> str:
+        return f"{self.key_prefix}:{shard}"
+
+    async def recover(self, shard: int):
+        """Oldingi jarayon yuborib ulgurmagan xabarlarni navbat boshiga qaytarish"""
+        processing = f"{self._ready(shard)}:processing"
+        while await self.redis.lmove(processing, self._ready(shard), 'RIGHT', 'LEFT'):
+            pass
+        # Oldingi versiyadagi kechiktirilgan qayta urinishlar (ZSET) ham navbatga
+        delayed = f"{self._ready(shard)}:delayed"
+        for raw in await self.redis.zrange(delayed, 0, -1):
+            if await self.redis.zrem(delayed, raw):
+                await self.redis.rpush(self._ready(shard), raw)
+
+    async def push(self, shard: int, raw: str):
+        await self.redis.rpush(self._ready(shard), raw)
+
+    async def push_many(self, items: List[Tuple[int, str]]):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for shard, raw in items:
+                pipe.rpush(self._ready(shard), raw)
+            await pipe.execute()
+
+    async def pop(self, shard: int, timeout: float) -> Optional[str]:
+        return await self.redis.blmove(
+            self._ready(shard), f"{self._ready(shard)}:processing", timeout, 'LEFT', 'RIGHT'
+        )
+
+    async def ack(self, shard: int, raw: str):
+        await self.redis.lrem(f"{self._ready(shard)}:processing", 1, raw)
+
+    async def dead(self, shard: int, raw: str, dead_raw: str):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lpush(f"{self.key_prefix}:dead", dead_raw)
+            pipe.ltrim(f"{self.key_prefix}:dead", 0, self.DEAD_LETTER_LIMIT - 1)
+            pipe.lrem(f"{self._ready(shard)}:processing", 1, raw)
+            await pipe.execute()
+
+    async def depth(self, shard: int) -> Dict:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.llen(self._ready(shard))
+            pipe.llen(f"{self.key_prefix}:dead")
+            ready, dead = await pipe.execute()
+        return {'ready': ready, 'dead': dead}
+
+
+class SendQueue:
+    """Outbound xabarlar navbati va uni yuboruvchi fon vazifalari"""
+
+    LATENCY_SAMPLES = 1000
+
+    def __init__(self, global_rate: float = 25, chat_rate: float = 1, chat_burst: float = 3,
+                 group_rate: float = 20 / 60, concurrency: int = 8, max_pending: int = 200,
+                 max_attempts: int = 5, retry_base_delay: float = 2, max_chat_buckets: int = 10000):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.max_chat_buckets = max_chat_buckets
+
+        self.bot: Optional[Bot] = None
+        self.backend = MemoryOutbox()
+        self.shard = 0
+        self.shards = 1
+        self._global: Optional[TokenBucket] = None
+        self._chat_buckets: OrderedDict = OrderedDict()  # chat_id -> TokenBucket
+        self._paused_until = 0.0  # 429 dan keyin barcha yuborishlar to'xtaydi
+        self._tasks: List[asyncio.Task] = []
+        self._chain: Optional[ChatTaskChain] = None
+        self._result_handlers = []
+
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.retrying = 0  # hozir qayta urinishni kutayotganlar
+        self._latencies: List[float] = []  # navbatga qo'yilgandan yuborilguncha (ms)
+
+    async def start(self, bot: Bot, redis_client=None, shard: int = 0, shards: int = 1):
+        """Yuborishni boshlash; redis_client bo'lmasa navbat jarayon ichida"""
+        self.bot = bot
+        self.shard = shard
+        self.shards = shards
+        if redis_client is not None:
+            self.backend = RedisOutbox(redis_client, OUTBOX_CONFIG['key_prefix'])
+            await self.backend.recover(shard)
+        # Telegram chegarasi bot bo'yicha - shardlar orasida teng bo'linadi
+        self._global = TokenBucket(self.global_rate / shards, max(1.0, self.global_rate / shards))
+        self._chain = ChatTaskChain(self.concurrency, self.max_pending)
+        self._tasks = [
+            asyncio.create_task(self._consume()),
+            asyncio.create_task(self._report()),
+        ]
+        logger.info(f"📮 Outbox started: shard {shard}/{shards}, {type(self.backend).__name__}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def shard_for(self, chat_id: int) -> int:
+        return abs(chat_id) % self.shards
+
+    @staticmethod
+    def make_job(chat_id: int, text: str, reply_markup: InlineKeyboardMarkup = None, meta: Dict = None,
+                 **kwargs) -> Dict:
+        """meta - natija handlerlari uchun (Telegramga yuborilmaydi)"""
+        return {
+            'chat_id': chat_id,
+            'text': text,
+            'reply_markup': reply_markup.model_dump(exclude_none=True) if reply_markup else None,
+            'kwargs': kwargs,
+            'meta': meta,
+            'attempts': 0,
+            'enqueued_at': time.time(),
+        }
+
+    async def enqueue(self, chat_id: int, text: str, reply_markup: InlineKeyboardMarkup = None,
+                      meta: Dict = None, **kwargs):
+        """Xabarni navbatga qo'yish (faqat inline keyboard qo'llab-quvvatlanadi)"""
+        job = self.make_job(chat_id, text, reply_markup, meta, **kwargs)
+        await self.backend.push(self.shard_for(chat_id), json.dumps(job))
+
+    async def enqueue_many(self, jobs: List[Dict]):
+        """make_job() bilan tayyorlangan xabarlarni bitta so'rovda navbatga qo'yish"""
+        await self.backend.push_many([(self.shard_for(job['chat_id']), json.dumps(job)) for job in jobs])
+
+    def add_result_handler(self, handler):
+        """handler(job, error) - xabar yuborilgach (error=None) yoki butunlay muvaffaqiyatsiz bo'lgach"""
+        self._result_handlers.append(handler)
+
+    def _notify(self, job: Dict, error: Optional[str]):
+        for handler in self._result_handlers:
+            try:
+                handler(job, error)
+            except Exception as e:
+                logger.error(f"❌ Outbox result handler error: {e}")
+
+    async def stats(self) -> Dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(pct):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))]) if latencies else None
+
+        return {
+            **await self.backend.depth(self.shard),
+            'in_flight': self._chain.in_flight if self._chain else 0,
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+            'retrying': self.retrying,
+            'latency_p50_ms': percentile(50),
+            'latency_p95_ms': percentile(95),
+        }
+
+    # ------------ FON VAZIFALARI ------------
+
+    async def _consume(self):
+        try:
+            while True:
+                await self._chain.acquire()
+                try:
+                    raw = await self.backend.pop(self.shard, timeout=5)
+                except asyncio.CancelledError:
+                    self._chain.release()
+                    raise
+                except Exception as e:
+                    self._chain.release()
+                    logger.error(f"❌ Outbox read error: {e}")
+                    await asyncio.sleep(1)
+                    continue
+                if raw is None:
+                    self._chain.release()
+                    continue
+
+                job = json.loads(raw)
+                self._chain.submit(job['chat_id'], lambda raw=raw, job=job: self._send(raw, job), hold_slot=False)
+        finally:
+            await self._chain.drain()
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(60)
+            try:
+                logger.info(f"📮 Outbox: {await self.stats()}")
+            except Exception as e:
+                logger.error(f"❌ Outbox stats error: {e}")
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.pop(chat_id, None)
+        if bucket is None:
+            # Guruhlarda Telegram chegarasi ancha past
+            rate = self.group_rate if chat_id < 0 else self.chat_rate
+            bucket = TokenBucket(rate, 1 if chat_id < 0 else self.chat_burst)
+        self._chat_buckets[chat_id] = bucket
+        while len(self._chat_buckets) > self.max_chat_buckets:
+            oldest_id, oldest = next(iter(self._chat_buckets.items()))
+            if not oldest.idle:
+                break
+            del self._chat_buckets[oldest_id]
+        return bucket
+
+    async def _wait_turn(self, chat_id: int):
+        await asyncio.sleep(self._chat_bucket(chat_id).reserve())
+        await asyncio.sleep(max(0.0, self._paused_until - time.monotonic()))
+        await asyncio.sleep(self._global.reserve())
+
+    async def _send(self, raw: str, job: Dict):
+        """
+        Chat zanjirida: navbat kelgach rate limit kutiladi (slotsiz), faqat Telegram so'rovi
+        slot bilan. Qayta urinishlar shu yerda - chatning keyingi xabarlari kutib turadi.
+        Xabar yuborilguncha processing ro'yxatida (jarayon o'chsa navbat boshiga qaytadi).
+        """
+        while True:
+            await self._wait_turn(job['chat_id'])
+            try:
+                async with self._chain.slots:
+                    await self.bot.send_message(
+                        chat_id=job['chat_id'],
+                        text=job['text'],
+                        reply_markup=(InlineKeyboardMarkup.model_validate(job['reply_markup'])
+                                      if job['reply_markup'] else None),
+                        **job.get('kwargs', {})
+                    )
+                break
+            except TelegramRetryAfter as e:
+                # Urinish hisoblanmaydi; Telegram aytgan vaqtgacha hamma yuborish to'xtaydi (_wait_turn)
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+                self.retried += 1
+                logger.warning(f"⚠️ Telegram flood limit, retry after {e.retry_after}s (chat {job['chat_id']})")
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # Foydalanuvchi botni bloklagan / noto'g'ri so'rov - qayta urinish foydasiz
+                self.failed += 1
+                logger.warning(f"⚠️ Message to {job['chat_id']} dropped: {e}")
+                await self.backend.dead(self.shard, raw, raw)
+                self._notify(job, str(e))
+                return
+            except Exception as e:
+                job['attempts'] += 1
+                if job['attempts'] >= self.max_attempts:
+                    self.failed += 1
+                    logger.error(f"❌ Message to {job['chat_id']} failed after {job['attempts']} attempts: {e}")
+                    await self.backend.dead(self.shard, raw, json.dumps(job))
+                    self._notify(job, str(e))
+                    return
+                self.retried += 1
+                delay = self.retry_base_delay * 2 ** (job['attempts'] - 1)
+                logger.warning(f"⚠️ Message to {job['chat_id']} failed ({e}), retry in {delay}s")
+                self.retrying += 1
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    self.retrying -= 1
+
+        await self.backend.ack(self.shard, raw)
+        self.sent += 1
+        self._notify(job, None)
+        self._latencies.append((time.time() - job['enqueued_at']) * 1000)
+        if len(self._latencies) > self.LATENCY_SAMPLES:
+            del self._latencies[:len(self._latencies) - self.LATENCY_SAMPLES]
+
+
+outbox = SendQueue(**{key: value for key, value in OUTBOX_CONFIG.items() if key != 'key_prefix'})
+
+
+# ============================================================================
+# 9. E'LONLAR (BROADCAST)
+# ============================================================================
+#
+# Admin /broadcast -> qoralama: qabul qiluvchilar bitta INSERT ... SELECT bilan
+# bot_broadcast_recipients ga yoziladi (status 'pending'). Tasdiqlangach e'lon 'running'.
+#
+# Har bir jarayondagi BroadcastEngine o'z shardidagi (telegram_id % shards) 'pending' larni
+# BATCH_SIZE tadan 'queued' qilib outbox ga qo'shadi - outbox navbati MAX_OUTBOX_DEPTH dan
+# oshmaydi, Telegram cheklovlari outbox da. Natijalar (sent/failed) xotirada yig'ilib,
+# FLUSH_INTERVAL da bitta tranzaksiyada yoziladi. Jarayon o'chsa, 'pending' lar keyingi
+# ishga tushishda davom etadi; natijasi kelmagan 'queued' lar STALE_AFTER dan keyin qayta yuboriladi.
+
+class BroadcastEngine:
+
+    def __init__(self, batch_size: int = 200, max_outbox_depth: int = 50, flush_interval: float = 1,
+                 stale_after: float = 900):
+        self.batch_size = batch_size
+        self.max_outbox_depth = max_outbox_depth
+        self.flush_interval = flush_interval
+        self.stale_after = stale_after
+
+        self.send_queue: Optional[SendQueue] = None
+        self._results: List[Tuple[int, str, Optional[str]]] = []
+        self._texts: OrderedDict = OrderedDict()  # broadcast_id -> matn
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self, send_queue: SendQueue):
+        self.send_queue = send_queue
+        send_queue.add_result_handler(self._on_result)
+        self._tasks = [
+            asyncio.create_task(self._feed()),
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._requeue_stale()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._flush()
+
+    def _on_result(self, job: Dict, error: Optional[str]):
+        recipient_id = (job.get('meta') or {}).get('broadcast_recipient_id')
+        if recipient_id is not None:
+            self._results.append((recipient_id, 'failed' if error else 'sent', error[:500] if error else None))
+
+    async def _message_text(self, broadcast_id: int) -> Optional[str]:
+        if broadcast_id not in self._texts:
+            broadcast = await DatabaseManager.get_broadcast(broadcast_id)
+            self._texts[broadcast_id] = broadcast['message_text'] if broadcast else None
+            while len(self._texts) > 100:
+                self._texts.popitem(last=False)
+        return self._texts[broadcast_id]
+
+    async def _feed(self):
+        while True:
+            try:
+                depth = await self.send_queue.backend.depth(self.send_queue.shard)
+                room = self.max_outbox_depth - depth['ready']
+                if room <= 0:
+                    await asyncio.sleep(1)
+                    continue
+
+                recipients = await DatabaseManager.claim_broadcast_recipients(
+                    self.send_queue.shard, self.send_queue.shards, min(room, self.batch_size)
+                )
+                if not recipients:
+                    await asyncio.sleep(2)
+                    continue
+
+                jobs = []
+                for recipient in recipients:
+                    text = await self._message_text(recipient['broadcast_id'])
+                    jobs.append(SendQueue.make_job(
+                        recipient['telegram_id'], text,
+                        meta={'broadcast_recipient_id': recipient['id'], 'broadcast_id': recipient['broadcast_id']}
+                    ))
+                await self.send_queue.enqueue_many(jobs)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Broadcast feed error: {e}")
+                await asyncio.sleep(5)
+
+    async def _flush(self):
+        if not self._results:
+            return
+        results, self._results = self._results, []
+        try:
+            await DatabaseManager.save_broadcast_results(results)
+        except Exception as e:
+            logger.error(f"❌ Broadcast results flush error: {e}")
+            # Keyingi urinishda qayta yoziladi
+            self._results = results + self._results
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush()
+
+    async def _requeue_stale(self):
+        while True:
+            await asyncio.sleep(60)
+            try:
+                requeued = await DatabaseManager.requeue_stale_broadcast_recipients(self.stale_after)
+                if requeued:
+                    logger.warning(f"⚠️ Broadcast: {requeued} stale recipients requeued")
+            except Exception as e:
+                logger.error(f"❌ Broadcast requeue error: {e}")
+
+
+broadcasts = BroadcastEngine(**BROADCAST_CONFIG)
 
 
 if __name__ == "__main__":
@@ -1276,8 +3239,28 @@ if __name__ == "__main__":
         print("\nToken olish uchun: @BotFather -> /newbot")
         sys.exit(1)
 
+    parser = argparse.ArgumentParser(description="Ustoz-Talaba chat boti")
+    parser.add_argument('mode', nargs='?', default=os.environ.get('BOT_MODE', 'polling'),
+                        choices=['polling', 'webhook', 'worker', 'reconcile', 'partitions'],
+                        help="polling - lokal development, webhook - update larni workerlarga tarqatish, "
+                             "worker - bitta worker jarayoni, reconcile - o'qilmaganlar hisoblagichini qayta qurish, "
+                             "partitions - bot_messages bo'limlarini yaratish va arxivlash")
+    parser.add_argument('--index', type=int, default=0, help="worker raqami (worker rejimi)")
+    parser.add_argument('--no-workers', action='store_true',
+                        help="webhook rejimida lokal workerlarni ishga tushirmaslik")
+    args = parser.parse_args()
+
     try:
-        asyncio.run(main())
+        if args.mode == 'webhook':
+            run_webhook_with_workers(BOT_TOKEN, spawn_workers=not args.no_workers)
+        elif args.mode == 'worker':
+            asyncio.run(run_worker(args.index, BOT_TOKEN))
+        elif args.mode == 'reconcile':
+            asyncio.run(run_db_job(DatabaseManager.rebuild_unread_counters))
+        elif args.mode == 'partitions':
+            asyncio.run(run_db_job(DatabaseManager.maintain_message_partitions))
+        else:
+            asyncio.run(main(BOT_TOKEN))
     except KeyboardInterrupt:
         logger.info("👋 Bot to'xtatildi.")
         print("\n👋 Bot to'xtatildi.")
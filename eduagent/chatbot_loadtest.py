@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+chatbot.py database qatlami uchun yuklama testi.
+
+USERS ta talaba bir vaqtda bot bilan ishlayotganini simulyatsiya qiladi
+(start -> ustozlar ro'yxati -> xabar yuborish -> chatni ko'rish) va TEACHERS ta
+ustoz o'qilmagan xabarlarni ko'rib javob beradi. Hammasi bitta event loop da,
+xuddi aiogram dispatcher kabi.
+
+Natija: har bir operatsiya uchun p50/p95/p99 (ms), umumiy throughput va
+event loop kechikishi (loop bloklanganmi - shu ko'rsatadi).
+
+Ishga tushirish (lokal PostgreSQL, .env dagi DB_* sozlamalari bilan):
+    python chatbot_loadtest.py --users 1000 --rounds 3
+
+Test foydalanuvchilari telegram_id >= --id-base oralig'ida yaratiladi
+va oxirida o'chiriladi (--keep bilan qoldiriladi).
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import defaultdict
+
+from chatbot import DatabaseManager as db, DB_POOL_CONFIG
+
+
+class Stats:
+    """Operatsiyalar bo'yicha kechikishlar (ms)"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def timed(self, name, coro):
+        started = time.perf_counter()
+        try:
+            return await coro
+        except Exception:
+            self.errors[name] += 1
+            raise
+        finally:
+            self.latencies[name].append((time.perf_counter() - started) * 1000)
+
+    def report(self, elapsed):
+        total = sum(len(values) for values in self.latencies.values())
+        print(f"{'operatsiya':<34}{'soni':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'xato':>7}")
+        for name, values in sorted(self.latencies.items()):
+            print(f"{name:<34}{len(values):>8}"
+                  f"{percentile(values, 50):>10.1f}{percentile(values, 95):>10.1f}"
+                  f"{percentile(values, 99):>10.1f}{self.errors[name]:>7}")
+        print(f"\nJami: {total} query, {elapsed:.1f} s, {total / elapsed:.0f} query/s")
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def monitor_loop_lag(samples, interval=0.05):
+    """Event loop bloklansa sleep kechikib uyg'onadi - shu farqni yig'amiz"""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - started - interval) * 1000)
+
+
+async def setup_users(id_base, users, teachers):
+    teacher_ids = [id_base + i for i in range(teachers)]
+    student_ids = [id_base + teachers + i for i in range(users)]
+
+    for telegram_id in teacher_ids:
+        await db.get_or_create_user(telegram_id, f"Loadtest Ustoz {telegram_id}", None)
+        await db.update_user_role(telegram_id, 'teacher')
+    for telegram_id in student_ids:
+        await db.get_or_create_user(telegram_id, f"Loadtest Talaba {telegram_id}", None)
+        await db.update_user_role(telegram_id, 'student')
+        # Har bir talabaga 1-3 ta ustoz
+        for teacher_id in random.sample(teacher_ids, k=min(len(teacher_ids), random.randint(1, 3))):
+            await db.assign_student_to_teacher(telegram_id, teacher_id, 'loadtest')
+
+    return teacher_ids, student_ids
+
+
+async def cleanup_users(id_base):
+    await db.execute_query(
+        "DELETE FROM bot_messages WHERE sender_id >= $1 OR receiver_id >= $1", (id_base,)
+    )
+    await db.execute_query(
+        "DELETE FROM student_teacher WHERE student_id >= $1 OR teacher_id >= $1", (id_base,)
+    )
+    await db.execute_query(
+        "DELETE FROM bot_unread_counters WHERE receiver_id >= $1 OR sender_id >= $1", (id_base,)
+    )
+    deleted = await db.execute_query(
+        "DELETE FROM bot_users WHERE telegram_id >= $1 RETURNING telegram_id", (id_base,), fetch_all=True
+    )
+    for user in deleted:
+        await db.user_cache.delete(user['telegram_id'])
+
+
+async def simulate_student(stats, telegram_id, rounds, think_time):
+    """Talaba: /start, ustoz tanlash, xabar yozish, chatni ko'rish"""
+    await stats.timed('get_or_create_user', db.get_or_create_user(
+        telegram_id, f"Loadtest Talaba {telegram_id}", None
+    ))
+    for i in range(rounds):
+        await asyncio.sleep(random.uniform(0, think_time))
+        await stats.timed('get_user', db.get_user(telegram_id))
+        teachers = await stats.timed('get_teachers_for_student', db.get_teachers_for_student(telegram_id))
+        if not teachers:
+            continue
+        teacher_id = random.choice(teachers)['telegram_id']
+        await stats.timed('save_message', db.save_message(
+            telegram_id, teacher_id, f"Loadtest savol #{i} ({telegram_id})"
+        ))
+        await stats.timed('get_chat_messages', db.get_chat_messages(telegram_id, teacher_id, limit=10))
+
+
+async def simulate_teacher(stats, telegram_id, rounds, think_time):
+    """Ustoz: o'qilmagan xabarlar, o'qish, javob berish"""
+    for _ in range(rounds):
+        await asyncio.sleep(random.uniform(0, think_time))
+        await stats.timed('get_students_for_teacher', db.get_students_for_teacher(telegram_id))
+        unread = await stats.timed('get_unread_messages_for_teacher',
+                                   db.get_unread_messages_for_teacher(telegram_id, limit=5))
+        await stats.timed('count_unread_messages', db.count_unread_messages(telegram_id))
+        await stats.timed('mark_read', db.mark_read([message['id'] for message in unread]))
+        for message in unread:
+            await stats.timed('get_message_by_id', db.get_message_by_id(message['id']))
+            await stats.timed('save_message', db.save_message(
+                telegram_id, message['sender_id'], "Loadtest javob"
+            ))
+        await stats.timed('mark_replied', db.mark_replied([message['id'] for message in unread]))
+
+
+async def run(args):
+    await db.initialize()
+    print(f"Pool: {DB_POOL_CONFIG}")
+
+    try:
+        print(f"Tayyorlash: {args.users} talaba, {args.teachers} ustoz...")
+        await cleanup_users(args.id_base)
+        teacher_ids, student_ids = await setup_users(args.id_base, args.users, args.teachers)
+
+        stats = Stats()
+        lag_samples = []
+        lag_monitor = asyncio.create_task(monitor_loop_lag(lag_samples))
+
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(simulate_student(stats, telegram_id, args.rounds, args.think_time) for telegram_id in student_ids),
+            *(simulate_teacher(stats, telegram_id, args.rounds, args.think_time) for telegram_id in teacher_ids),
+            return_exceptions=True
+        )
+        elapsed = time.perf_counter() - started
+        lag_monitor.cancel()
+
+        failed = [result for result in results if isinstance(result, Exception)]
+        print()
+        stats.report(elapsed)
+        if lag_samples:
+            print(f"Event loop kechikishi: o'rtacha {statistics.mean(lag_samples):.1f} ms, "
+                  f"max {max(lag_samples):.1f} ms")
+        print(f"User keshi: {db.user_cache.stats()}")
+        print(f"Muvaffaqiyatsiz foydalanuvchilar: {len(failed)}")
+        for error in failed[:5]:
+            print(f"  - {type(error).__name__}: {error}")
+    finally:
+        if not args.keep:
+            await cleanup_users(args.id_base)
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="chatbot.py database yuklama testi")
+    parser.add_argument('--users', type=int, default=1000, help="bir vaqtdagi talabalar soni")
+    parser.add_argument('--teachers', type=int, default=50, help="ustozlar soni")
+    parser.add_argument('--rounds', type=int, default=3, help="har bir foydalanuvchi necha marta xabar yozadi")
+    parser.add_argument('--think-time', type=float, default=0.5, help="harakatlar orasidagi maksimal pauza (s)")
+    parser.add_argument('--id-base', type=int, default=9_000_000_000_000,
+                        help="test foydalanuvchilarining telegram_id boshlanishi")
+    parser.add_argument('--keep', action='store_true', help="test ma'lumotlarini o'chirmaslik")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
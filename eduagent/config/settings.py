@@ -217,12 +217,108 @@ app.autodiscover_tasks()
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL')
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND')
 
+CELERY_BEAT_SCHEDULE = {
+    # O'chirilgan va eski AI chat sessiyalarini tozalash (chatai.retention)
+    'chatai-purge-sessions': {
+        'task': 'chatai.tasks.purge_chat_sessions',
+        'schedule': 60 * 60,
+    },
+    # Worker o'lgan va yangi job kelmayotgan bo'lsa ham osilib qolgan joblar qayta olinsin
+    # (oraliq CHATAI_JOBS['STALE_AFTER'] dan oshmasin)
+    'chatai-process-jobs': {
+        'task': 'chatai.tasks.process_chat_jobs',
+        'schedule': 60,
+    },
+}
+
 
 
 
 # ----------------------  GEMINI API KEY -------------------
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 
+# ----------------------  AI CHAT (chatai) -------------------
+CHATAI_MODEL = os.environ.get('CHATAI_MODEL', 'gemini-1.5-flash')
+# Fallback zanjiri: tartib bo'yicha, har bir model o'z timeouti (sekund) bilan
+CHATAI_MODELS = [
+    {'NAME': CHATAI_MODEL, 'TIMEOUT': float(os.environ.get('CHATAI_MODEL_TIMEOUT', 20))},
+    {
+        'NAME': os.environ.get('CHATAI_FALLBACK_MODEL', 'gemini-2.5-flash'),
+        'TIMEOUT': float(os.environ.get('CHATAI_FALLBACK_TIMEOUT', 30)),
+    },
+]
+# WINDOW sekundda FAILURE_THRESHOLD ta xato -> model RESET_TIMEOUT sekund o'tkazib yuboriladi
+CHATAI_CIRCUIT_BREAKER = {
+    'FAILURE_THRESHOLD': 3,
+    'WINDOW': 60,
+    'RESET_TIMEOUT': 30,
+}
+# Testlar va offline benchmark uchun: 'chatai.backends.StubBackend'
+CHATAI_MODEL_BACKEND = os.environ.get('CHATAI_MODEL_BACKEND', 'chatai.backends.GeminiBackend')
+# StubBackend javob berishdan oldin kutadigan vaqt (sekund)
+CHATAI_STUB_DELAY = float(os.environ.get('CHATAI_STUB_DELAY', 0.5))
+
+# Takroriy savollar uchun javob keshi
+CHATAI_RESPONSE_CACHE = {
+    # 'chatai.cache.LocMemResponseCache'      - jarayon ichida (TTL + LRU)
+    # 'chatai.cache.DjangoCacheResponseCache' - CACHES[CACHE_ALIAS] orqali (Redis - barcha workerlar uchun umumiy)
+    'BACKEND': os.environ.get('CHATAI_CACHE_BACKEND', 'chatai.cache.LocMemResponseCache'),
+    'CACHE_ALIAS': 'chatai',
+    'TTL': int(os.environ.get('CHATAI_CACHE_TTL', 60 * 60 * 24)),
+    'MAX_ENTRIES': int(os.environ.get('CHATAI_CACHE_MAX_ENTRIES', 1000)),
+}
+
+# Suhbat konteksti: oxirgi xabarlar token byudjetigacha + sessiyaning qisqa xulosasi
+CHATAI_CONTEXT = {
+    'TOKEN_BUDGET': int(os.environ.get('CHATAI_CONTEXT_TOKENS', 2000)),  # xulosa + oxirgi xabarlar
+    'CHARS_PER_TOKEN': 4,        # tokenizer chaqirmasdan taxminiy hisob
+    'MAX_TURNS': 20,             # bazadan olinadigan oxirgi xabarlar soni
+    'KEEP_RECENT_TURNS': 4,      # xulosaga qo'shilmay, to'liq yuboriladigan xabarlar
+    'SUMMARY_EVERY': 8,          # shuncha yangi xabar yig'ilganda xulosa yangilanadi
+    'SUMMARY_MAX_CHARS': 2000,
+}
+
+# Fon rejimi (/ai/jobs/): worker bir martada BATCH_SIZE ta job oladi,
+# STALE_AFTER sekund 'running' bo'lib qolgan job qayta bajariladi
+CHATAI_JOBS = {
+    'BATCH_SIZE': int(os.environ.get('CHATAI_JOB_BATCH_SIZE', 20)),
+    'STALE_AFTER': 5 * 60,
+}
+
+# Chat sessiyalarini saqlash muddati (manage.py chatai_purge va Celery beat)
+CHATAI_RETENTION = {
+    'IDLE_DAYS': int(os.environ.get('CHATAI_RETENTION_DAYS', 90)),  # shuncha kun yozilmagan sessiya o'chiriladi
+    'BATCH_SIZE': 500,           # bitta DELETE dagi sessiyalar
+    'MESSAGE_BATCH_SIZE': 5000,  # bitta DELETE dagi xabarlar
+}
+
+# Model chaqiruvlari uchun kirish nazorati (oshganlarga 429 + Retry-After)
+CHATAI_LIMITS = {
+    'SESSION_RATE': float(os.environ.get('CHATAI_SESSION_RATE', 0.5)),  # so'rov/sekund, bitta sessiya
+    'SESSION_BURST': int(os.environ.get('CHATAI_SESSION_BURST', 5)),
+    'MAX_CONCURRENT': int(os.environ.get('CHATAI_MAX_CONCURRENT', 20)),  # bir vaqtdagi model chaqiruvlari
+    'MAX_QUEUE': int(os.environ.get('CHATAI_MAX_QUEUE', 100)),
+    'QUEUE_TIMEOUT': float(os.environ.get('CHATAI_QUEUE_TIMEOUT', 10)),  # sekund
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'chatai': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'chatai',
+    },
+}
+
+# Redis bo'lsa AI javob keshi django-redis orqali ishlaydi
+if os.environ.get('CHATAI_REDIS_URL'):
+    CACHES['chatai'] = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get('CHATAI_REDIS_URL'),
+        'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
+    }
+
 # -----------------------------------------------------------------------
 # AI CHAT UCHUN API OLDIM
 
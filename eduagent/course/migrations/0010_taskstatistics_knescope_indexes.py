@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0009_remove_task_score_task_status_teachercomment_score_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_tasks', models.PositiveIntegerField(default=0, verbose_name='Jami vazifalar')),
+                ('reviewed_tasks', models.PositiveIntegerField(default=0, verbose_name='Baholangan vazifalar')),
+                ('pending_tasks', models.PositiveIntegerField(default=0, verbose_name='Kutilayotgan vazifalar')),
+                ('score_sum', models.PositiveBigIntegerField(default=0)),
+                ('score_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Vazifalar statistikasi',
+                'verbose_name_plural': 'Vazifalar statistikasi',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='knescopevideourl',
+            index=models.Index(fields=['group', '-created_at'], name='course_knes_group_i_dd1978_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='knescopevideourl',
+            index=models.Index(fields=['-created_at'], name='course_knes_created_5f7238_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0010_taskstatistics_knescope_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='description',
+            field=models.TextField(blank=True, verbose_name='Guruh haqida tavsifi'),
+        ),
+    ]
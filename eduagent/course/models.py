@@ -1,7 +1,9 @@
 from django.core.validators import MaxLengthValidator, URLValidator
 from django.db import models
+from django.db.models.functions import Greatest
 from django.core.validators import FileExtensionValidator
 from django.conf import settings
+from django.utils import timezone
 
 from authentication.models import CustomUser
 
@@ -97,6 +99,7 @@ class Assistant_Teacher(models.Model):
 class Group(models.Model):
 
     name = models.CharField(max_length=100, verbose_name="Guruh nomi")
+    description = models.TextField(blank=True, verbose_name="Guruh haqida tavsifi")
 
 
     course = models.ForeignKey(
@@ -154,6 +157,12 @@ class KnescopeVideoUrl(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True, blank=True)
     group = models.ForeignKey(Group, on_delete=models.CASCADE, null=True, blank=True)
 
+    class Meta:
+        # Dashboarddagi "oxirgi videolar" so'rovi uchun
+        indexes = [
+            models.Index(fields=['group', '-created_at']),
+            models.Index(fields=['-created_at']),
+        ]
 
     def __str__(self):
         return self.title
@@ -309,6 +318,93 @@ class TeacherComment(models.Model):
 
 
 
+# -----------------------  TASK STATISTIKASI (KESH JADVAL) ------------------------------------
+
+class TaskStatistics(models.Model):
+    """
+    Barcha vazifalar bo'yicha umumiy statistika - jadvalda faqat bitta qator bo'ladi.
+    Task va TeacherComment saqlanganda signal orqali qisman (delta) yangilanadi,
+    shuning uchun staff dashboardi Task jadvalini har safar sanab chiqmaydi.
+    """
+    SINGLETON_ID = 1
+
+    total_tasks = models.PositiveIntegerField(default=0, verbose_name='Jami vazifalar')
+    reviewed_tasks = models.PositiveIntegerField(default=0, verbose_name='Baholangan vazifalar')
+    pending_tasks = models.PositiveIntegerField(default=0, verbose_name='Kutilayotgan vazifalar')
+
+    # Baholangan vazifalardagi baholar yig'indisi va soni (o'rtacha baho uchun)
+    score_sum = models.PositiveBigIntegerField(default=0)
+    score_count = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Vazifalar statistikasi'
+        verbose_name_plural = 'Vazifalar statistikasi'
+
+    def __str__(self):
+        return f"Vazifalar: {self.total_tasks} (baholangan: {self.reviewed_tasks})"
+
+    @property
+    def average_score(self):
+        if not self.score_count:
+            return None
+        return self.score_sum / self.score_count
+
+    @classmethod
+    def load(cls):
+        """Statistika qatorini olish, agar hali yo'q bo'lsa noldan hisoblanadi"""
+        stats = cls.objects.filter(pk=cls.SINGLETON_ID).first()
+        return stats or cls.rebuild()
+
+    @classmethod
+    def rebuild(cls):
+        """Statistikani Task va TeacherComment jadvallaridan to'liq qayta hisoblash"""
+        totals = Task.objects.aggregate(
+            total_tasks=models.Count('id'),
+            reviewed_tasks=models.Count('id', filter=models.Q(status='baholandi')),
+            pending_tasks=models.Count('id', filter=models.Q(status='yuklandi')),
+        )
+        scores = TeacherComment.objects.filter(
+            task__status='baholandi',
+            score__isnull=False
+        ).aggregate(
+            score_sum=models.Sum('score'),
+            score_count=models.Count('id'),
+        )
+
+        stats, _ = cls.objects.update_or_create(
+            pk=cls.SINGLETON_ID,
+            defaults={
+                **totals,
+                'score_sum': scores['score_sum'] or 0,
+                'score_count': scores['score_count'],
+            }
+        )
+        return stats
+
+    @classmethod
+    def apply_delta(cls, **deltas):
+        """
+        Hisoblagichlarni F() orqali atomar o'zgartirish (masalan total_tasks=1).
+        Natija 0 dan pastga tushmaydi: update()/bulk_create signalsiz o'tgani uchun hisoblagich
+        siljigan bo'lishi mumkin va manfiy qiymat o'chirishning o'zini IntegrityError bilan yiqitadi.
+        Siljish rebuild() bilan tuzatiladi
+        """
+        deltas = {field: value for field, value in deltas.items() if value}
+        if not deltas:
+            return
+
+        updated = cls.objects.filter(pk=cls.SINGLETON_ID).update(
+            updated_at=timezone.now(),
+            **{field: Greatest(models.F(field) + value, 0) for field, value in deltas.items()}
+        )
+
+        # Qator hali yaratilmagan bo'lsa, hozirgi holatdan to'liq hisoblaymiz
+        if not updated:
+            cls.rebuild()
+
+
 #============================================================================
 #  BU SIFATCHI MODEL
 #============================================================================
@@ -92,23 +92,30 @@ from .serializers import HighTeacherSerializer, AssistantTeacherSerializer
 from student.serializers import StudentProfileSerializer
 
 class GroupSerializer(serializers.ModelSerializer):
-    main_teacher = HighTeacherSerializer(read_only=True)
+    """
+    Standart holatda bog'langan obyektlar faqat ID ko'rinishida qaytadi.
+    To'liq ma'lumot kerak bo'lsa ?expand=course,teachers,students orqali so'raladi
+    (GroupViewSet kerakli select_related/prefetch_related ni o'zi qo'shadi).
+    """
+    EXPANDABLE_FIELDS = ('course', 'teachers', 'students')
+
+    main_teacher = serializers.PrimaryKeyRelatedField(read_only=True)
     main_teacher_id = serializers.PrimaryKeyRelatedField(
         queryset=High_Teacher.objects.all(), write_only=True, required=False, allow_null=True
     )
 
-    assistant_teacher = AssistantTeacherSerializer(many=True, read_only=True)
+    assistant_teacher = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
     assistant_teacher_ids = serializers.PrimaryKeyRelatedField(
         many=True, queryset=Assistant_Teacher.objects.all(), write_only=True, required=False
     )
 
-    course = CourseSerializer(read_only=True)
+    course = serializers.PrimaryKeyRelatedField(read_only=True)
     course_id = serializers.PrimaryKeyRelatedField(
         queryset=Course.objects.all(), write_only=True
     )
 
-    # Talabalar nested
-    students = StudentProfileSerializer(source='group_students', many=True, read_only=True)
+    # Talabalar (standart - faqat ID lar)
+    students = serializers.PrimaryKeyRelatedField(source='group_students', many=True, read_only=True)
 
     class Meta:
         model = Group
@@ -120,12 +127,30 @@ class GroupSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at']
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = self.context.get('expand', ())
+
+        if 'course' in expand:
+            self.fields['course'] = CourseSerializer(read_only=True)
+
+        if 'teachers' in expand:
+            self.fields['main_teacher'] = HighTeacherSerializer(read_only=True)
+            self.fields['assistant_teacher'] = AssistantTeacherSerializer(many=True, read_only=True)
+
+        if 'students' in expand:
+            self.fields['students'] = StudentProfileSerializer(
+                source='group_students', many=True, read_only=True
+            )
+
 # -------------------------------------------------------------------------------------
 
 
 
 
 # -------------------------------  TASK SERIALIZERS -------------------------------------
+from django.db.models import Avg
+
 from .models import Task
 from student.models import Student
 
@@ -170,14 +195,20 @@ class TaskSerializer(serializers.ModelSerializer):
 
     def get_average_score(self, obj):
         """Vazifaning o'rtacha bahosini hisoblash"""
-        comments = obj.teacher_comments.filter(score__isnull=False)
-        if comments.exists():
-            total = sum(comment.score for comment in comments)
-            return round(total / comments.count(), 2)
-        return None
+        # TaskViewSet querysetida annotatsiya qilingan bo'lsa, qo'shimcha query yo'q
+        if hasattr(obj, 'comments_avg_score'):
+            average = obj.comments_avg_score
+        else:
+            average = obj.teacher_comments.aggregate(average=Avg('score'))['average']
+
+        if average is None:
+            return None
+        return round(average, 2)
 
     def get_total_comments(self, obj):
         """Vazifaga yozilgan kommentlar soni"""
+        if hasattr(obj, 'comments_count'):
+            return obj.comments_count
         return obj.teacher_comments.count()
 
 
@@ -56,3 +56,108 @@ def create_teacher_profiles(sender, instance: User, created, **kwargs):
 
             }
         )
+
+
+
+# -----------------------  TASK STATISTIKASINI YANGILASH ------------------------------------
+from django.db.models import Count, Sum
+from django.db.models.signals import post_delete, post_init
+
+from course.models import Task, TeacherComment, TaskStatistics
+
+REVIEWED = 'baholandi'
+PENDING = 'yuklandi'
+
+
+def _status_deltas(status, sign):
+    """Task statusiga qarab reviewed/pending hisoblagichlari uchun delta"""
+    return {
+        'reviewed_tasks': sign if status == REVIEWED else 0,
+        'pending_tasks': sign if status == PENDING else 0,
+    }
+
+
+@receiver(post_init, sender=Task)
+def remember_task_status(sender, instance, **kwargs):
+    # __dict__ orqali o'qiymiz - deferred maydon bo'lsa qo'shimcha query ketmasin
+    instance._stats_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Task)
+def update_stats_on_task_save(sender, instance, created, **kwargs):
+    old_status = instance._stats_status
+    instance._stats_status = instance.status
+
+    if created:
+        TaskStatistics.apply_delta(total_tasks=1, **_status_deltas(instance.status, 1))
+        return
+
+    if old_status == instance.status:
+        return
+
+    # Eski status noma'lum (masalan .only() bilan yuklangan) - to'liq qayta hisoblaymiz
+    if old_status is None:
+        TaskStatistics.rebuild()
+        return
+
+    deltas = _status_deltas(old_status, -1)
+    for field, value in _status_deltas(instance.status, 1).items():
+        deltas[field] += value
+
+    # Task baholangan holatga o'tsa (yoki chiqsa) uning baholari o'rtachaga qo'shiladi (ayiriladi)
+    if REVIEWED in (old_status, instance.status):
+        sign = 1 if instance.status == REVIEWED else -1
+        scores = instance.teacher_comments.filter(score__isnull=False).aggregate(
+            score_sum=Sum('score'),
+            score_count=Count('id'),
+        )
+        deltas['score_sum'] = sign * (scores['score_sum'] or 0)
+        deltas['score_count'] = sign * scores['score_count']
+
+    TaskStatistics.apply_delta(**deltas)
+
+
+@receiver(post_delete, sender=Task)
+def update_stats_on_task_delete(sender, instance, **kwargs):
+    # Baholar TeacherComment o'chirilganda (cascade) alohida ayiriladi
+    TaskStatistics.apply_delta(total_tasks=-1, **_status_deltas(instance.status, -1))
+
+
+@receiver(post_init, sender=TeacherComment)
+def remember_comment_score(sender, instance, **kwargs):
+    instance._stats_score = instance.__dict__.get('score')
+    instance._stats_task_id = instance.__dict__.get('task_id')
+
+
+def _task_is_reviewed(task_id):
+    return Task.objects.filter(pk=task_id, status=REVIEWED).exists()
+
+
+@receiver(post_save, sender=TeacherComment)
+def update_stats_on_comment_save(sender, instance, created, **kwargs):
+    old_score = None if created else instance._stats_score
+    old_task_id = instance._stats_task_id
+    instance._stats_score = instance.score
+    instance._stats_task_id = instance.task_id
+
+    # Komment boshqa taskka ko'chirilgan bo'lsa delta hisoblash ishonchsiz
+    if not created and old_task_id != instance.task_id:
+        TaskStatistics.rebuild()
+        return
+
+    if old_score == instance.score or not _task_is_reviewed(instance.task_id):
+        return
+
+    TaskStatistics.apply_delta(
+        score_sum=(instance.score or 0) - (old_score or 0),
+        score_count=(instance.score is not None) - (old_score is not None),
+    )
+
+
+@receiver(post_delete, sender=TeacherComment)
+def update_stats_on_comment_delete(sender, instance, **kwargs):
+    # Cascade paytida task qatori hali o'chirilmagan bo'ladi
+    if instance.score is None or not _task_is_reviewed(instance.task_id):
+        return
+
+    TaskStatistics.apply_delta(score_sum=-instance.score, score_count=-1)
@@ -1,3 +1,225 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from authentication.models import CustomUser
+from student.models import Student
+from .models import Course, Group, Task, TaskStatistics, TeacherComment
+
+
+class TaskFixtureMixin:
+    """Talaba, ikki yordamchi ustoz va baholangan kommentli tasklar"""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser('+998900000001', password='admin-pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+        self.student = Student.objects.create(
+            full_name='Test Talaba',
+            gender='Erkak',
+            profiency=Student.STUDY_BEFORE[0][0],
+            phone_number='+998900000002',
+            payment=Student.PAYMENT_CHOICES[0][0],
+        )
+        # Assistant_Teacher profili authentication signali orqali yaratiladi
+        self.assistants = [
+            CustomUser.objects.create_user(
+                f'+99890000001{i}', role=CustomUser.ROLE_ASSISTANT
+            ).assistant_teacher_profile
+            for i in range(2)
+        ]
+
+    def _create_tasks(self, count):
+        for i in range(count):
+            task = Task.objects.create(
+                student=self.student,
+                assistant_teacher=self.assistants[0],
+                title=f'Vazifa {i}',
+            )
+            for score, assistant in zip((4, 5), self.assistants):
+                TeacherComment.objects.create(
+                    task=task, assistant_teacher=assistant, comment='Yaxshi', score=score
+                )
+
+
+# ----------------------------- TASK LIST QUERY SONI -----------------------------
+class TaskListQueryCountTest(TaskFixtureMixin, TestCase):
+    """Task ro'yxati tasklar soniga qarab query soni oshmasligi kerak"""
+
+    def _count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('course:task-list'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def test_list_query_count_is_constant(self):
+        self._create_tasks(2)
+        small_count, _ = self._count_list_queries()
+
+        self._create_tasks(20)
+        large_count, data = self._count_list_queries()
+
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(data), 22)
+        self.assertEqual(data[0]['average_score'], 4.5)
+        self.assertEqual(data[0]['total_comments'], 2)
+
+    def test_group_tasks_query_count_is_constant(self):
+        url = reverse('course:task-group-tasks')
+
+        self._create_tasks(2)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+
+        self._create_tasks(20)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_serializer_falls_back_without_annotations(self):
+        from .serializers import TaskSerializer
+
+        self._create_tasks(1)
+        task = Task.objects.get()
+        data = TaskSerializer(task).data
+
+        self.assertEqual(data['average_score'], 4.5)
+        self.assertEqual(data['total_comments'], 2)
+
+
+# ----------------------------- TASK STATISTIKASI (KESH) -----------------------------
+class TaskStatisticsTest(TaskFixtureMixin, TestCase):
+    """Signal orqali yangilangan statistika to'liq qayta hisoblash bilan bir xil bo'lishi kerak"""
+
+    def _assert_matches_rebuild(self):
+        cached = TaskStatistics.load()
+        fields = ['total_tasks', 'reviewed_tasks', 'pending_tasks', 'score_sum', 'score_count']
+        incremental = {field: getattr(cached, field) for field in fields}
+        rebuilt = TaskStatistics.rebuild()
+        self.assertEqual(incremental, {field: getattr(rebuilt, field) for field in fields})
+
+    def test_incremental_updates_match_rebuild(self):
+        self._create_tasks(3)
+        tasks = list(Task.objects.order_by('id'))
+
+        tasks[0].status = 'baholandi'
+        tasks[0].save()
+        tasks[1].status = 'baholandi'
+        tasks[1].save()
+        self._assert_matches_rebuild()
+
+        comment = tasks[0].teacher_comments.first()
+        comment.score = 1
+        comment.save()
+        tasks[1].teacher_comments.first().delete()
+        self._assert_matches_rebuild()
+
+        tasks[0].delete()
+        tasks[1].status = 'yuklandi'
+        tasks[1].save()
+        self._assert_matches_rebuild()
+
+        stats = TaskStatistics.load()
+        self.assertEqual(stats.total_tasks, 2)
+        self.assertEqual(stats.reviewed_tasks, 0)
+        self.assertIsNone(stats.average_score)
+
+    def test_drifted_counters_do_not_break_delete(self):
+        self._create_tasks(2)
+        # update() signalsiz o'tadi - kesh haqiqiy holatdan orqada qoladi
+        TaskStatistics.objects.update(total_tasks=0, pending_tasks=0, score_sum=0, score_count=0)
+
+        Task.objects.order_by('id').first().delete()
+
+        stats = TaskStatistics.load()
+        self.assertEqual((stats.total_tasks, stats.pending_tasks), (0, 0))
+        self.assertEqual((stats.score_sum, stats.score_count), (0, 0))
+
+    def test_staff_dashboard_reads_cached_statistics(self):
+        self._create_tasks(2)
+        task = Task.objects.order_by('id').first()
+        task.status = 'baholandi'
+        task.save()
+
+        response = self.client.get(reverse('student:student-dashboard'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['statistics'], {
+            'total_tasks': 2,
+            'reviewed_tasks': 1,
+            'pending_tasks': 1,
+            'average_score': 4.5,
+        })
+
+
+# ----------------------------- GROUP EXPAND QUERY SONI -----------------------------
+class GroupExpandQueryCountTest(TestCase):
+    """?expand=... bilan ham guruhlar ro'yxati query soni o'zgarmas bo'lishi kerak"""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser('+998900000001', password='admin-pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+        self.course = Course.objects.create(name='Python')
+        self.teacher = CustomUser.objects.create_user(
+            '+998900000002', role=CustomUser.ROLE_HIGH
+        ).high_teacher_profile
+        self.assistant = CustomUser.objects.create_user(
+            '+998900000003', role=CustomUser.ROLE_ASSISTANT
+        ).assistant_teacher_profile
+        self.phone_counter = 100
+
+    def _create_groups(self, count):
+        for _ in range(count):
+            self.phone_counter += 1
+            group = Group.objects.create(
+                name=f'Guruh {self.phone_counter}', course=self.course, main_teacher=self.teacher
+            )
+            group.assistant_teacher.add(self.assistant)
+            for i in range(3):
+                Student.objects.create(
+                    full_name='Talaba',
+                    gender='Erkak',
+                    profiency=Student.STUDY_BEFORE[0][0],
+                    phone_number=f'+99891{self.phone_counter:04d}{i:03d}',
+                    payment=Student.PAYMENT_CHOICES[0][0],
+                    assigned_course=self.course,
+                    assigned_group=group,
+                    assigned_teacher=self.teacher,
+                    assigned_assistant_teacher=self.assistant,
+                )
+
+    def _count_queries(self, expand):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('course:group-list'), {'expand': expand})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def test_default_returns_ids_only(self):
+        self._create_groups(1)
+        _, data = self._count_queries('')
+
+        self.assertEqual(data[0]['course'], self.course.id)
+        self.assertEqual(data[0]['main_teacher'], self.teacher.id)
+        self.assertEqual(data[0]['assistant_teacher'], [self.assistant.id])
+        self.assertEqual(len(data[0]['students']), 3)
+        self.assertIsInstance(data[0]['students'][0], int)
+
+    def test_full_expansion_query_count_is_constant(self):
+        expand = 'course,teachers,students'
+
+        self._create_groups(2)
+        small_count, _ = self._count_queries(expand)
+
+        self._create_groups(6)
+        large_count, data = self._count_queries(expand)
+
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(data[0]['course']['name'], 'Python')
+        self.assertEqual(data[0]['students'][0]['assigned_teacher']['id'], self.teacher.id)
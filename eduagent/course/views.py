@@ -199,11 +199,13 @@ class DenyAllPermission(BasePermission):  # ✅ REUSABLE CLASS
     def has_permission(self, request, view):
         return False
 # ------------------------- ------------------------------------------
+from django.db.models import Prefetch
 from rest_framework.viewsets import ReadOnlyModelViewSet
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
-from .models import Group
+from .models import Group, Assistant_Teacher
 from .serializers import GroupSerializer
+from student.models import Student
 from .permissions import IsAuthenticatedReadOnly
 
 class GroupViewSet(ReadOnlyModelViewSet):
@@ -211,6 +213,8 @@ class GroupViewSet(ReadOnlyModelViewSet):
     Group API - faqat GET, faqat login foydalanuvchilar.
     Foydalanuvchi faqat o'ziga tegishli guruhlarni ko'radi.
     Admin panelda to'liq CRUD ishlaydi.
+
+    ?expand=course,teachers,students - bog'langan obyektlarni to'liq qaytarish.
     """
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
@@ -219,7 +223,43 @@ class GroupViewSet(ReadOnlyModelViewSet):
     search_fields = ['name']
     filterset_fields = ['course', 'is_active']
 
+    def get_expand(self):
+        """?expand= parametridan ruxsat etilgan qiymatlarni olish"""
+        raw = self.request.query_params.get('expand', '')
+        requested = {item.strip() for item in raw.split(',')}
+        return requested.intersection(GroupSerializer.EXPANDABLE_FIELDS)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expand()
+        return context
+
     def get_queryset(self):
+        expand = self.get_expand()
+        queryset = self._get_base_queryset()
+
+        if 'course' in expand:
+            queryset = queryset.select_related('course')
+
+        if 'teachers' in expand:
+            queryset = queryset.select_related('main_teacher').prefetch_related('assistant_teacher')
+        else:
+            queryset = queryset.prefetch_related(
+                Prefetch('assistant_teacher', queryset=Assistant_Teacher.objects.only('id'))
+            )
+
+        if 'students' in expand:
+            # StudentProfileSerializer kurs, guruh va ustozlarni o'qiydi
+            students = Student.objects.select_related(
+                'assigned_course', 'assigned_group',
+                'assigned_teacher', 'assigned_assistant_teacher'
+            )
+        else:
+            students = Student.objects.only('id', 'assigned_group')
+
+        return queryset.prefetch_related(Prefetch('group_students', queryset=students))
+
+    def _get_base_queryset(self):
         user = self.request.user
 
         # Superadmin va sifatchi → hamma guruhlarni ko'radi
@@ -260,12 +300,27 @@ from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import SAFE_METHODS
 
+from django.db.models import Avg, Count
+
 from .models import Task, KnescopeVideoUrl
 from student.models import Student
 from .serializers import TaskSerializer
 from .permissions import  CanReviewTask
 
 
+def annotate_task_stats(queryset):
+    """
+    Tasklarga o'rtacha baho va kommentlar sonini bitta so'rovda qo'shadi.
+    TaskSerializer shu annotatsiyalarni o'qiydi, har bir task uchun alohida query ketmaydi.
+    """
+    return queryset.select_related(
+        'student', 'kinescope_video', 'assistant_teacher'
+    ).annotate(
+        comments_avg_score=Avg('teacher_comments__score'),
+        comments_count=Count('teacher_comments'),
+    )
+
+
 
 # YANGI VAZIFALAR YARATISH UCHUN
 class TaskViewSet(viewsets.ModelViewSet):
@@ -291,6 +346,9 @@ class TaskViewSet(viewsets.ModelViewSet):
         return TaskSerializer
 
     def get_queryset(self):
+        return annotate_task_stats(self._get_base_queryset())
+
+    def _get_base_queryset(self):
         user = self.request.user
 
         # 🔹 Superadmin va staff barcha tasklarni ko'radi
@@ -354,6 +412,8 @@ class TaskViewSet(viewsets.ModelViewSet):
         else:
             raise PermissionDenied("Sizda bu sahifani ko‘rish huquqi yo‘q")
 
+        tasks = annotate_task_stats(tasks)
+
         page = self.paginate_queryset(tasks)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -1,3 +1,88 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from authentication.models import CustomUser
+from course.models import Course, Group, KnescopeVideoUrl, Task
+from .models import Student
+
+
+# ----------------------------- GROUP INFO QUERY BUDGET -----------------------------
+class StudentGroupInfoQueryBudgetTest(TestCase):
+    """500 ta guruh va 20 000 talaba bilan ham group-info query soni cheklangan bo'lishi kerak"""
+
+    GROUPS = 500
+    STUDENTS = 20_000
+    QUERY_BUDGET = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser('+998900000001', password='admin-pass')
+
+        courses = Course.objects.bulk_create(
+            Course(name=f'Kurs {i}') for i in range(10)
+        )
+        cls.groups = Group.objects.bulk_create(
+            Group(name=f'Guruh {i}', course=courses[i % len(courses)])
+            for i in range(cls.GROUPS)
+        )
+        students = Student.objects.bulk_create(
+            (
+                Student(
+                    full_name=f'Talaba {i}',
+                    gender='Erkak',
+                    profiency=Student.STUDY_BEFORE[0][0],
+                    phone_number=f'+99891{i:07d}',
+                    payment=Student.PAYMENT_CHOICES[0][0],
+                    assigned_group=cls.groups[i % cls.GROUPS],
+                )
+                for i in range(cls.STUDENTS)
+            ),
+            batch_size=2000,
+        )
+
+        group = cls.groups[0]
+        KnescopeVideoUrl.objects.create(
+            title='Dars 1', kinescope_video_link='https://kinescope.io/1', group=group
+        )
+        Task.objects.bulk_create(
+            Task(student=student, title='Vazifa')
+            for student in students if student.assigned_group_id == group.id
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        self.url = reverse('student:student-group-info')
+
+    def _get(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(ctx.captured_queries), self.QUERY_BUDGET)
+        return response.json()
+
+    def test_all_groups_listing_stays_under_budget(self):
+        data = self._get(self.url, {'page_size': 200})
+
+        self.assertEqual(len(data['all_groups']), 200)
+        self.assertEqual(data['total_groups'], self.GROUPS)
+        self.assertEqual(data['all_groups'][0]['total_students'], self.STUDENTS // self.GROUPS)
+
+        # Keyingi sahifa ham xuddi shu budjetda
+        next_page = self._get(data['next'])
+        self.assertEqual(len(next_page['all_groups']), 200)
+
+    def test_group_detail_stays_under_budget(self):
+        data = self._get(self.url, {'group_id': self.groups[0].id})
+
+        per_group = self.STUDENTS // self.GROUPS
+        self.assertEqual(data['group_info']['description'], '')
+        self.assertEqual(len(data['students']), per_group)
+        self.assertEqual(data['statistics'], {
+            'total_students': per_group,
+            'total_videos': 1,
+            'total_tasks': per_group,
+        })
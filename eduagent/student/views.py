@@ -57,10 +57,24 @@ class StudentProfileViewSet(viewsets.ModelViewSet):
 #  -------------------------------- NEW DASHBOARD ---------------------------------
 # ----------------------------- DASHBOARD (TO'G'RILANGAN) ---------------------
 
+from django.db.models import Avg, Count, Q
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from course.models import Task, TeacherComment
+from course.models import Task, TaskStatistics
+
+
+def get_task_statistics(tasks):
+    """
+    Vazifalar statistikasi bitta query'da (conditional aggregation).
+    teacher_comments JOIN qatorlarni ko'paytirgani uchun tasklar distinct sanaladi.
+    """
+    return tasks.aggregate(
+        total_tasks=Count('id', distinct=True),
+        reviewed_tasks=Count('id', distinct=True, filter=Q(status='baholandi')),
+        pending_tasks=Count('id', distinct=True, filter=Q(status='yuklandi')),
+        average_score=Avg('teacher_comments__score', filter=Q(status='baholandi')),
+    )
 
 
 class StudentDashboardView(APIView):
@@ -69,67 +83,37 @@ class StudentDashboardView(APIView):
 
     def get(self, request):
         user = request.user
-        student = getattr(user, 'student_profile', None)
+        student = Student.objects.select_related(
+            'assigned_group__course'
+        ).filter(user=user).first()
 
         recent_videos = []
         total_tasks = reviewed_tasks = pending_tasks = 0
         average_score = None
 
-        if student:
-            # Student bo'lsa
-            tasks = Task.objects.filter(student=student)
-            total_tasks = tasks.count()
-
-            # ✅ TO'G'RILASH: Status bo'yicha hisoblash
-            reviewed_tasks = tasks.filter(status='baholandi').count()
-            pending_tasks = tasks.filter(status='yuklandi').count()
-
-            # Baholangan vazifalarni olish
-            graded_tasks = tasks.filter(status='baholandi')
-
-            if graded_tasks.exists():
-                # ✅ TO'G'RILASH: TeacherComment orqali baholarni hisoblash
-                task_ids = graded_tasks.values_list('id', flat=True)
-                scored_comments = TeacherComment.objects.filter(
-                    task_id__in=task_ids,
-                    score__isnull=False
-                )
+        # Videolar serializerda course va group nomini o'qiydi
+        videos = KnescopeVideoUrl.objects.select_related('course', 'group').order_by('-created_at')
 
-                if scored_comments.exists():
-                    total_score = sum(comment.score for comment in scored_comments)
-                    average_score = total_score / scored_comments.count()
+        if student:
+            # Student bo'lsa - faqat o'z vazifalari, bitta query
+            statistics = get_task_statistics(Task.objects.filter(student=student))
+            total_tasks = statistics['total_tasks']
+            reviewed_tasks = statistics['reviewed_tasks']
+            pending_tasks = statistics['pending_tasks']
+            average_score = statistics['average_score']
 
-            if student.assigned_group:
-                recent_videos = KnescopeVideoUrl.objects.filter(
-                    group=student.assigned_group
-                ).order_by('-created_at')[:5]
+            if student.assigned_group_id:
+                recent_videos = videos.filter(group_id=student.assigned_group_id)[:5]
 
         elif user.role in ['staff', 'superadmin', 'teacher', 'head_teacher']:
-            # Admin, staff, teacher uchun
-            tasks = Task.objects.all()
-            total_tasks = tasks.count()
-
-            # ✅ TO'G'RILASH: Status bo'yicha hisoblash
-            reviewed_tasks = tasks.filter(status='baholandi').count()
-            pending_tasks = tasks.filter(status='yuklandi').count()
-
-            # Baholangan vazifalar
-            graded_tasks = tasks.filter(status='baholandi')
-
-            if graded_tasks.exists():
-                # ✅ TO'G'RILASH: Barcha TeacherComment lardan baholarni hisoblash
-                scored_comments = TeacherComment.objects.filter(
-                    task__in=graded_tasks,
-                    score__isnull=False
-                )
+            # Admin, staff, teacher uchun - kesh jadvaldan (bitta qator)
+            statistics = TaskStatistics.load()
+            total_tasks = statistics.total_tasks
+            reviewed_tasks = statistics.reviewed_tasks
+            pending_tasks = statistics.pending_tasks
+            average_score = statistics.average_score
 
-                if scored_comments.exists():
-                    total_score = sum(comment.score for comment in scored_comments)
-                    average_score = total_score / scored_comments.count()
-
-            recent_videos = KnescopeVideoUrl.objects.all().order_by('-created_at')[:5]
-        else:
-            tasks = Task.objects.none()
+            recent_videos = videos[:5]
 
         data = {
             'student': {
@@ -154,67 +138,69 @@ class StudentDashboardView(APIView):
 # -----------------------------------  STUDENT GROUP INFO VIEW ------------------------------------------
 
 # ------------------------ GROUP INFO (TO'G'RILANGAN) ------------------
+from rest_framework.pagination import CursorPagination
+
+
+class GroupCursorPagination(CursorPagination):
+    """Barcha guruhlar ro'yxati uchun cursor pagination (OFFSET ishlatilmaydi)"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = 'id'
+
 
 class StudentGroupInfoView(APIView):
     """Guruh ma'lumotlari - Student va Admin uchun"""
     permission_classes = [IsAuthenticated]
+    pagination_class = GroupCursorPagination
 
     def get(self, request):
         user = request.user
 
         if user.role == 'student':
-            try:
-                student = user.student_profile
-            except AttributeError:
+            student = Student.objects.filter(user=user).only('id', 'assigned_group_id').first()
+            if student is None:
                 return Response(
                     {"detail": "Student profili topilmadi."},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            if not student.assigned_group:
+            if not student.assigned_group_id:
                 return Response(
                     {"detail": "Siz hali guruhga qo'shilmagansiz."},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            group = student.assigned_group
-            group_id = group.id
+            group_id = student.assigned_group_id
 
         elif user.role in ['staff', 'superadmin', 'teacher', 'head_teacher']:
             group_id = request.query_params.get('group_id')
 
             if not group_id:
-                groups = Group.objects.all()
-                data = {
-                    'all_groups': [
-                        {
-                            'id': g.id,
-                            'name': g.name,
-                            'course': g.course.name if g.course else None,
-                            'main_teacher': g.main_teacher.full_name if g.main_teacher else None,
-                            'total_students': Student.objects.filter(assigned_group=g).count(),
-                        }
-                        for g in groups
-                    ],
-                    'total_groups': groups.count(),
-                    'user_role': user.role
-                }
-                return Response(data)
+                return self.list_groups(request)
 
-            try:
-                group = Group.objects.get(id=group_id)
-            except Group.DoesNotExist:
-                return Response(
-                    {"detail": "Guruh topilmadi."},
-                    status=status.HTTP_404_NOT_FOUND
-                )
         else:
             return Response(
                 {"detail": "Bu sahifaga kirish uchun ruxsat yo'q."},
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        students_in_group = Student.objects.filter(assigned_group=group)
+        # Guruh, kurs va katta ustoz - bitta query, yordamchi ustozlar - prefetch
+        group = Group.objects.select_related(
+            'course', 'main_teacher'
+        ).prefetch_related('assistant_teacher').filter(id=group_id).first()
+
+        if group is None:
+            return Response(
+                {"detail": "Guruh topilmadi."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        students_in_group = list(
+            Student.objects.filter(assigned_group=group).only(
+                'id', 'full_name', 'phone_number', 'email', 'created_at'
+            )
+        )
 
         # ✅ TO'G'RILASH: video_lesson emas, kinescope_video orqali
         total_tasks = Task.objects.filter(
@@ -227,19 +213,19 @@ class StudentGroupInfoView(APIView):
                 'name': group.name,
                 'description': group.description,
                 'course': {
-                    'id': group.course.id if group.course else None,
-                    'name': group.course.name if group.course else None,
+                    'id': group.course.id,
+                    'name': group.course.name,
                 } if group.course else None,
                 'main_teacher': {
-                    'id': group.main_teacher.id if group.main_teacher else None,
-                    'full_name': group.main_teacher.full_name if group.main_teacher else None,
-                    'phone': group.main_teacher.phone if group.main_teacher else None,
+                    'id': group.main_teacher.id,
+                    'full_name': group.main_teacher.full_name,
+                    'phone': group.main_teacher.phone_number,
                 } if group.main_teacher else None,
                 'assistant_teachers': [
                     {
                         'id': teacher.id,
                         'full_name': teacher.full_name,
-                        'phone': teacher.phone,
+                        'phone': teacher.phone_number,
                     }
                     for teacher in group.assistant_teacher.all()
                 ],
@@ -249,22 +235,53 @@ class StudentGroupInfoView(APIView):
                 {
                     'id': student.id,
                     'full_name': student.full_name,
-                    'phone': student.phone,
+                    'phone': student.phone_number,
                     'email': student.email,
                     'joined_at': student.created_at,
                 }
                 for student in students_in_group
             ],
             'statistics': {
-                'total_students': students_in_group.count(),
+                'total_students': len(students_in_group),
                 'total_videos': KnescopeVideoUrl.objects.filter(group=group).count(),
                 'total_tasks': total_tasks,  # ✅ TO'G'RILANDI
             },
             'user_info': {
                 'role': user.role,
-                'is_viewing_own_group': user.role == 'student' and hasattr(user, 'student_profile') and user.student_profile.assigned_group == group
+                # Talaba faqat o'z guruhini ko'ra oladi
+                'is_viewing_own_group': user.role == 'student'
             }
         }
 
         return Response(data)
+
+    def list_groups(self, request):
+        """Barcha guruhlar - bitta annotatsiyali query + cursor pagination"""
+        groups = Group.objects.select_related(
+            'course', 'main_teacher'
+        ).annotate(
+            total_students=Count('group_students')
+        )
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(groups, request, view=self)
+
+        data = {
+            # Guruhlar jadvali kichik - annotatsiyasiz bitta COUNT
+            'total_groups': Group.objects.count(),
+            'all_groups': [
+                {
+                    'id': g.id,
+                    'name': g.name,
+                    'course': g.course.name if g.course else None,
+                    'main_teacher': g.main_teacher.full_name if g.main_teacher else None,
+                    'total_students': g.total_students,
+                }
+                for g in page
+            ],
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'user_role': request.user.role
+        }
+        return Response(data)
 # -------------------------------------------------------------------------------------------------------
@@ -0,0 +1,160 @@
+"""
+chatbot.py outbox testlari (Telegram o'rniga FakeBot, navbat - MemoryOutbox).
+Bot bog'liqliklari (aiogram, asyncpg) o'rnatilmagan bo'lsa o'tkazib yuboriladi.
+"""
+import asyncio
+import unittest
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+try:
+    import chatbot
+    from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+    from aiogram.methods import SendMessage
+except ImportError:
+    chatbot = None
+
+
+class FakeBot:
+    """send_message ni yozib boradi; errors - matn bo'yicha navbatma-navbat ko'tariladigan xatolar"""
+
+    def __init__(self, errors=None):
+        self.sent = []
+        self.calls = 0
+        self.errors = errors or {}
+
+    async def send_message(self, chat_id, text, reply_markup=None, **kwargs):
+        self.calls += 1
+        errors = self.errors.get(text)
+        if errors:
+            raise errors.pop(0)
+        self.sent.append((chat_id, text))
+
+
+def retry_after(seconds):
+    return TelegramRetryAfter(
+        method=SendMessage(chat_id=1, text='x'), message='Too Many Requests', retry_after=seconds
+    )
+
+
+@unittest.skipIf(chatbot is None, "chatbot bog'liqliklari (aiogram, asyncpg) o'rnatilmagan")
+class TokenBucketTest(SimpleTestCase):
+
+    def test_burst_then_waits_in_reservation_order(self):
+        with mock.patch.object(chatbot.time, 'monotonic', return_value=100.0):
+            bucket = chatbot.TokenBucket(rate=2, burst=2)
+            waits = [bucket.reserve() for _ in range(4)]
+
+        self.assertEqual(waits, [0.0, 0.0, 0.5, 1.0])
+
+    def test_tokens_refill_up_to_burst(self):
+        clock = mock.Mock(return_value=100.0)
+        with mock.patch.object(chatbot.time, 'monotonic', clock):
+            bucket = chatbot.TokenBucket(rate=1, burst=2)
+            bucket.reserve()
+            bucket.reserve()
+            clock.return_value = 110.0
+
+            self.assertTrue(bucket.idle)
+            self.assertEqual([bucket.reserve() for _ in range(3)], [0.0, 0.0, 1.0])
+
+
+@unittest.skipIf(chatbot is None, "chatbot bog'liqliklari (aiogram, asyncpg) o'rnatilmagan")
+class SendQueueTest(SimpleTestCase):
+
+    def _queue(self, **options):
+        options = {'global_rate': 1000, 'chat_rate': 1000, 'chat_burst': 1000, 'retry_base_delay': 0, **options}
+        queue = chatbot.SendQueue(**options)
+        self.results = []
+        queue.add_result_handler(lambda job, error: self.results.append((job['text'], error)))
+        return queue
+
+    async def _run(self, queue, bot, messages, expected_results):
+        await queue.start(bot)
+        try:
+            for chat_id, text in messages:
+                await queue.enqueue(chat_id, text)
+            async with asyncio.timeout(5):
+                while len(self.results) < expected_results:
+                    await asyncio.sleep(0.01)
+        finally:
+            await queue.stop()
+
+    async def test_flood_limit_is_retried_without_counting_an_attempt(self):
+        queue = self._queue(max_attempts=1)
+        bot = FakeBot(errors={'a': [retry_after(0)]})
+
+        await self._run(queue, bot, [(1, 'a')], 1)
+
+        self.assertEqual(bot.sent, [(1, 'a')])
+        self.assertEqual(self.results, [('a', None)])
+        self.assertEqual((queue.sent, queue.retried, queue.failed), (1, 1, 0))
+
+    async def test_transient_errors_go_to_dead_letter_after_max_attempts(self):
+        queue = self._queue(max_attempts=3)
+        bot = FakeBot(errors={'a': [ConnectionError('down')] * 3})
+
+        await self._run(queue, bot, [(1, 'a')], 1)
+
+        self.assertEqual(bot.calls, 3)
+        self.assertEqual(self.results, [('a', 'down')])
+        self.assertEqual((queue.sent, queue.retried, queue.failed), (0, 2, 1))
+
+    async def test_forbidden_is_not_retried(self):
+        queue = self._queue()
+        forbidden = TelegramForbiddenError(method=SendMessage(chat_id=1, text='a'), message='bot was blocked')
+        bot = FakeBot(errors={'a': [forbidden]})
+
+        await self._run(queue, bot, [(1, 'a'), (1, 'b')], 2)
+
+        self.assertEqual(bot.calls, 2)
+        self.assertEqual(bot.sent, [(1, 'b')])
+        self.assertEqual(self.results[0][0], 'a')
+        self.assertIsNotNone(self.results[0][1])
+
+    async def test_retry_keeps_chat_order(self):
+        queue = self._queue()
+        bot = FakeBot(errors={'a': [ConnectionError('down'), retry_after(0)]})
+
+        await self._run(queue, bot, [(1, 'a'), (1, 'b'), (1, 'c')], 3)
+
+        self.assertEqual(bot.sent, [(1, 'a'), (1, 'b'), (1, 'c')])
+
+    async def test_busy_chat_does_not_stall_other_chats(self):
+        # Bitta slot, 1-chatga 10 xabar/s: uning navbati slotni band qilmasligi kerak
+        queue = self._queue(concurrency=1, chat_rate=10, chat_burst=1)
+        bot = FakeBot()
+
+        await self._run(queue, bot, [(1, f'm{i}') for i in range(5)] + [(2, 'other')], 6)
+
+        self.assertLess(bot.sent.index((2, 'other')), 2)
+        self.assertEqual([text for chat_id, text in bot.sent if chat_id == 1], [f'm{i}' for i in range(5)])
+
+
+@unittest.skipIf(chatbot is None, "chatbot bog'liqliklari (aiogram, asyncpg) o'rnatilmagan")
+class ChatCursorTest(SimpleTestCase):
+
+    def test_cursor_round_trip_fits_callback_data(self):
+        msg = {'id': 2_147_483_647, 'created_at': chatbot.datetime(2025, 3, 31, 23, 59, 59, 999999)}
+        cursor = chatbot.encode_chat_cursor(msg)
+
+        self.assertEqual(chatbot.decode_chat_cursor(cursor), (msg['created_at'], msg['id']))
+        callback_data = f"chat_page_{9_999_999_999}_{9_999_999_999}_b{cursor}"
+        self.assertLessEqual(len(callback_data.encode()), 64)
+
+    def test_legacy_id_only_cursor_is_rejected(self):
+        self.assertIsNone(chatbot.decode_chat_cursor('12345'))
+        self.assertIsNone(chatbot.decode_chat_cursor('zz.!!'))
+
+    async def test_page_query_bounds_partitions_by_cursor_time(self):
+        created_at = chatbot.datetime(2025, 3, 1, 12)
+        with mock.patch.object(chatbot.DatabaseManager, 'execute_query', return_value=[]) as execute:
+            await chatbot.DatabaseManager.get_chat_messages(1, 2, limit=11, before=(created_at, 42))
+
+        query, params = execute.call_args_list[0][0]
+        self.assertNotIn('WHERE id', query)
+        self.assertIn('m.created_at <= $3', query)
+        self.assertEqual(params, ('1:2', 11, created_at, 42))
+        # Kursordan eskilari arxivlangan - oxirgi sahifa so'raladi
+        self.assertEqual(execute.call_args_list[1][0][1], ('1:2', 11))